@@ -1,40 +1,145 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from functools import lru_cache
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
+import time
+import uuid
 import os
 
 load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Settings are read once at import instead of on every encode/decode
+SECRET_KEY = os.getenv("SECRET_KEY")
+ALGORITHM = os.getenv("ENC_ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "32"))
+# Self-registration may pick any role but ADMIN_USER_TYPE (DEFAULT_USER_TYPE when
+# blank); init_app.py grants ADMIN_USER_TYPE to the accounts in ADMIN_EMAILS.
+ADMIN_USER_TYPE = os.getenv("ADMIN_USER_TYPE", "admin")
+DEFAULT_USER_TYPE = os.getenv("DEFAULT_USER_TYPE", "Farmer")
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    # passlib is imported on first use to keep cold starts fast.
+    from passlib.context import CryptContext
+
+    # min == max rounds makes any stored hash with another cost "need update",
+    # so it is rehashed on the next successful login.
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=BCRYPT_ROUNDS,
+        bcrypt__min_rounds=BCRYPT_ROUNDS,
+        bcrypt__max_rounds=BCRYPT_ROUNDS,
+    )
+
+# bcrypt runs here rather than on the request threads, and at most
+# HASH_WORKERS + HASH_QUEUE_LIMIT hashes are in flight at once.
+_hash_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+class HashingBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    id: Optional[int] = None  # missing on tokens issued before claims were added
+    user_type: Optional[str] = None
+    jti: Optional[str] = None
+    exp: Optional[int] = None
+
+
+class TokenDenylist:
+    """
+    Revoked token IDs, kept only until the token would have expired anyway.
+
+    IDs are stored as 16 raw bytes. The list is per process, so a revocation
+    reaches other workers only if they share it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked: Dict[bytes, int] = {}
+
+    @staticmethod
+    def _key(jti: str) -> bytes:
+        return uuid.UUID(hex=jti).bytes
+
+    def revoke(self, jti: str, exp: int):
+        now = time.time()
+        with self._lock:
+            self._revoked = {k: e for k, e in self._revoked.items() if e > now}
+            self._revoked[self._key(jti)] = exp
+
+    def is_revoked(self, jti: str) -> bool:
+        try:
+            return self._key(jti) in self._revoked
+        except ValueError:
+            return True  # not an ID we issued
+
+
+denylist = TokenDenylist()
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+async def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HashingBusy()
+    # The slot is held until the hash finishes, even if the request is cancelled.
+    future = _hash_executor.submit(fn, *args)
+    future.add_done_callback(lambda _: _hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+async def verify_and_update_password(plain_password, hashed_password):
+    """(valid, new_hash); new_hash is set when the stored hash uses outdated settings."""
+    return await _run_hashing(get_pwd_context().verify_and_update, plain_password, hashed_password)
+
+async def hash_password(password):
+    return await _run_hashing(get_pwd_context().hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.now() + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now() + timedelta(minutes=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")))
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, os.getenv("SECRET_KEY"), algorithm=os.getenv("ENC_ALGORITHM"))
+        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str):
+    """Verify the signature, expiry and revocation of a token; no database access."""
+    from jose import JWTError, jwt
+
     try:
-        payload = jwt.decode(token, os.getenv("SECRET_KEY"), algorithms=[os.getenv("ENC_ALGORITHM")])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise JWTError
-        return TokenData(email=email)
+        jti = payload.get("jti")
+        if jti is not None and denylist.is_revoked(jti):
+            return None
+        return TokenData(
+            email=email,
+            id=payload.get("uid"),
+            user_type=payload.get("typ"),
+            jti=jti,
+            exp=payload.get("exp"),
+        )
     except JWTError:
-        return None
\ No newline at end of file
+        return None
@@ -1,77 +1,188 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from models import User
-from auth.auth import get_password_hash, verify_password, create_access_token, decode_access_token, TokenData
+from auth.auth import (
+    hash_password, verify_and_update_password, create_access_token, decode_access_token,
+    denylist, HashingBusy, TokenData, ADMIN_USER_TYPE, DEFAULT_USER_TYPE
+)
+from auth.limits import AttemptLimiter
 from db import get_session
+from typing import Dict, Optional, Tuple
+import threading
+import time
+import os
 
 router = APIRouter()
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+USER_CACHE_TTL_SECONDS = 60
+
+# Failed logins per account, and all password attempts (logins and
+# registrations) per client IP, per window.
+account_limiter = AttemptLimiter(int(os.getenv("LOGIN_MAX_FAILURES_PER_ACCOUNT", "5")), 15 * 60)
+ip_limiter = AttemptLimiter(int(os.getenv("LOGIN_MAX_ATTEMPTS_PER_IP", "30")), 60)
+
+_user_cache_lock = threading.Lock()
+_user_cache: Dict[int, Tuple[float, User]] = {}
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Invalid authentication credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def _load_user(session: Session, user_id: int):
+    """Full user record through a short-TTL in-process cache."""
+    now = time.monotonic()
+    cached = _user_cache.get(user_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    user = session.get(User, user_id)
+    if user is not None:
+        session.expunge(user)
+        with _user_cache_lock:
+            _user_cache[user_id] = (now + USER_CACHE_TTL_SECONDS, user)
+    return user
+
+def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)) -> TokenData:
+    """Claims of the signed token; verified without touching the database."""
     token_data = decode_access_token(token)
     if token_data is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    user = session.exec(select(User).where(User.email == token_data.email)).first()
+        raise credentials_exception
+    if token_data.id is None:
+        # Tokens issued before the uid/typ claims: resolve once, then cached.
+        user = session.exec(select(User.id).where(User.email == token_data.email)).first()
+        record = _load_user(session, user) if user is not None else None
+        if record is None:
+            raise credentials_exception
+        token_data.id, token_data.user_type = record.id, record.user_type
+    return token_data
+
+def get_current_user_record(
+    token_data: TokenData = Depends(get_current_user), session: Session = Depends(get_session)
+) -> User:
+    user = _load_user(session, token_data.id)
     if user is None:
+        raise credentials_exception
+    return user
+
+def is_admin(session: Session, token_data: Optional[TokenData]) -> bool:
+    """Admin per the stored role, not the token's claim, so a demotion takes effect at once."""
+    if token_data is None or token_data.id is None or token_data.user_type != ADMIN_USER_TYPE:
+        return False
+    return session.exec(select(User.user_type).where(User.id == token_data.id)).first() == ADMIN_USER_TYPE
+
+def require_admin(
+    token_data: TokenData = Depends(get_current_user), session: Session = Depends(get_session)
+) -> TokenData:
+    if not is_admin(session, token_data):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return token_data
+
+def _throttle(*checks):
+    """Reject with 429 before any database access or hashing."""
+    retry_after = max(limiter.retry_after(key) for limiter, key in checks)
+    if retry_after > 0:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)},
         )
+
+def _hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password checks in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+def _client_ip(request: Request):
+    return request.client.host if request.client else "unknown"
+
+def _find_user(session: Session, email: str):
+    return session.exec(select(User).where(User.email == email)).first()
+
+def _save_user(session: Session, user: User):
+    session.add(user)
+    session.commit()
+    session.refresh(user)
     return user
 
+def _issue_token(user: User):
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id, "typ": user.user_type})
+    return {"access_token": access_token, "token_type": "bearer"}
+
 @router.post("/token", response_model=dict)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if user is None or not verify_password(form_data.password, user.password):
+async def login_for_access_token(
+    request: Request, form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)
+):
+    ip, account = _client_ip(request), form_data.username.lower()
+    _throttle((ip_limiter, ip), (account_limiter, account))
+    ip_limiter.hit(ip)
+
+    user = await run_in_threadpool(_find_user, session, form_data.username)
+    try:
+        valid, new_hash = await verify_and_update_password(form_data.password, user.password) if user else (False, None)
+    except HashingBusy:
+        raise _hashing_busy()
+    if not valid:
+        account_limiter.hit(account)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    account_limiter.reset(account)
+    if new_hash:
+        # Stored with an outdated cost factor: upgrade it while we have the password.
+        user.password = new_hash
+        user = await run_in_threadpool(_save_user, session, user)
+    return _issue_token(user)
+
+@router.post("/logout")
+def logout(token_data: TokenData = Depends(get_current_user)):
+    if token_data.jti is not None:
+        denylist.revoke(token_data.jti, token_data.exp)
+    return {"detail": "Token revoked"}
 
 @router.get("/users/me")
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: User = Depends(get_current_user_record)):
     return current_user
 
 
 @router.post("/register", response_model=User)
-def register_user(user: User, session: Session = Depends(get_session)):
-    existing_user = session.exec(select(User).where(User.email == user.email)).first()
+async def register_user(request: Request, user: User, session: Session = Depends(get_session)):
+    ip = _client_ip(request)
+    _throttle((ip_limiter, ip))
+    ip_limiter.hit(ip)
+
+    # The body is a full User; never take the id from it, and admins are only made server-side.
+    user.id = None
+    user.user_type = (user.user_type or "").strip() or DEFAULT_USER_TYPE
+    if user.user_type.lower() == ADMIN_USER_TYPE.lower():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This role cannot be chosen at registration",
+        )
+
+    existing_user = await run_in_threadpool(_find_user, session, user.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
-    
-    user.password = get_password_hash(user.password)
 
-    session.add(user)
-    session.commit()
-    session.refresh(user)
-    return user
+    try:
+        user.password = await hash_password(user.password)
+    except HashingBusy:
+        raise _hashing_busy()
 
-@router.post("/token", response_model=dict)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    user = session.exec(select(User).where(User.email == form_data.username)).first()
-    if user is None or not verify_password(form_data.password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return await run_in_threadpool(_save_user, session, user)
 
 @router.get("/users", response_model=list[User])
 def get_all_users(session: Session = Depends(get_session)):
     users = session.exec(select(User)).all()
-    return users
\ No newline at end of file
+    return users
@@ -0,0 +1,45 @@
+from collections import deque
+from typing import Deque, Dict
+import threading
+import time
+
+
+class AttemptLimiter:
+    """
+    Sliding-window attempt counter per key (an account or a client IP).
+
+    Checked before any database access or hashing, so throttled requests
+    cost a dict lookup.
+    """
+
+    def __init__(self, max_attempts: int, window_seconds: float):
+        self.max_attempts = max_attempts
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, Deque[float]] = {}
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may try again; 0 when it is not throttled."""
+        attempts = self._attempts.get(key)
+        if attempts is None or len(attempts) < self.max_attempts:
+            return 0.0
+        return max(0.0, attempts[0] + self.window_seconds - time.monotonic())
+
+    def hit(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                if len(self._attempts) >= 10000:
+                    self._prune(now)
+                attempts = self._attempts[key] = deque(maxlen=self.max_attempts)
+            attempts.append(now)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def _prune(self, now: float):
+        expired = [k for k, a in self._attempts.items() if a[-1] + self.window_seconds <= now]
+        for key in expired:
+            del self._attempts[key]
@@ -0,0 +1,177 @@
+"""
+Batch least-cost formulation.
+
+Items that share a (category, age, ingredient set) share one constraint
+structure: the problem is loaded from the database once per group, and only
+the price vector changes from item to item. Groups are split into chunks and
+solved on a process pool, and each result is streamed back as one NDJSON line
+as soon as its chunk finishes. A failing item becomes an `error` line; the
+rest of the batch carries on.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlmodel import Session
+
+from db import get_read_session
+from auth.auth import TokenData
+from optimizer import DENSE_MAX_INGREDIENTS, FeedProblem, format_result, load_problem, solve_problems
+from run_log import record_run, request_user
+from serialization import dumps
+
+router = APIRouter()
+
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+_pool_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class BatchItem(BaseModel):
+    category: str
+    age: int
+    ingredient_ids: List[int]
+    prices: Dict[int, float] = {}  # price overrides by ingredient ID
+    amount: Optional[float] = None  # total kg to mix, scales total_cost
+
+
+def _executor() -> Optional[ProcessPoolExecutor]:
+    """The shared worker pool; None runs chunks on the default thread pool instead."""
+    global _pool
+    if BATCH_WORKERS <= 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: the server process has live threads and DB connections.
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def solve_chunk(problem: FeedProblem, items: List[Tuple[int, np.ndarray, Optional[float]]]) -> Tuple[List[dict], float]:
+    """Solve one problem for each (index, prices, amount); runs in a worker process. Returns the lines and solve seconds."""
+    lines = []
+    start = time.perf_counter()
+    solutions = solve_problems([replace(problem, prices=prices) for _, prices, _ in items])
+    seconds = time.perf_counter() - start
+    for (index, _, amount), (status, x) in zip(items, solutions):
+        if x is None:
+            lines.append({"index": index, "error": f"Could not find optimal solution. Status: {status}"})
+            continue
+        try:
+            lines.append({"index": index, "result": format_result(problem, status, x, amount).dict()})
+        except HTTPException as e:
+            lines.append({"index": index, "error": e.detail})
+    return lines, seconds
+
+
+def _item_prices(problem: FeedProblem, item: BatchItem) -> np.ndarray:
+    column = {ingredient_id: j for j, ingredient_id in enumerate(problem.ingredient_ids)}
+    prices = problem.prices.copy()
+    for ingredient_id, price in item.prices.items():
+        if ingredient_id not in column:
+            raise HTTPException(status_code=400, detail=f"Price override for ingredient {ingredient_id} not in ingredient_ids")
+        prices[column[ingredient_id]] = price
+    return prices
+
+
+def plan(session: Session, items: List[BatchItem]):
+    """
+    Group the items by constraint structure and load each group's problem.
+
+    Returns the error lines known up front and the (problem, chunk) jobs.
+    """
+    groups = defaultdict(list)
+    for index, item in enumerate(items):
+        groups[(item.category, item.age, tuple(sorted(set(item.ingredient_ids))))].append(index)
+
+    errors, jobs = [], []
+    for (category, age, ingredient_ids), indexes in groups.items():
+        try:
+            problem = load_problem(session, category, age, list(ingredient_ids))
+        except HTTPException as e:
+            errors.extend({"index": index, "error": e.detail} for index in indexes)
+            continue
+        variants = []
+        for index in indexes:
+            try:
+                variants.append((index, _item_prices(problem, items[index]), items[index].amount))
+            except HTTPException as e:
+                errors.append({"index": index, "error": e.detail})
+        for start in range(0, len(variants), BATCH_CHUNK_SIZE):
+            jobs.append((problem, variants[start:start + BATCH_CHUNK_SIZE]))
+    return errors, jobs
+
+
+def _log(user: Optional[TokenData], items: List[BatchItem], line: dict, backend: str, started: float,
+         solve_ms: Optional[float] = None):
+    item = items[line["index"]]
+    result = line.get("result")
+    record_run(
+        user, "/optimize-batch", backend, result["status"] if result else "Error",
+        (time.perf_counter() - started) * 1000, item.category, item.age,
+        {"ingredient_ids": item.ingredient_ids, "prices": item.prices, "amount": item.amount},
+        {"composition": result["composition"]} if result else {"detail": line["error"]},
+        result["cost_per_kg"] if result else None, solve_ms,
+    )
+
+
+async def _stream(items: List[BatchItem], errors: List[dict], jobs: list, user: Optional[TokenData], started: float):
+    for line in errors:
+        _log(user, items, line, "none", started)
+        yield dumps(line) + b"\n"
+    loop = asyncio.get_running_loop()
+    executor = _executor()
+    pending = {}
+    for problem, chunk in jobs:
+        future = loop.run_in_executor(executor, solve_chunk, problem, chunk)
+        backend = "dense" if len(problem.ingredient_ids) <= DENSE_MAX_INGREDIENTS else "highs"
+        pending[future] = ([index for index, _, _ in chunk], backend)
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                indexes, backend = pending.pop(future)
+                try:
+                    lines, seconds = future.result()
+                except Exception as e:  # a crashed worker fails its own chunk only
+                    lines, seconds = [{"index": index, "error": f"Worker failed: {e!r}"} for index in indexes], None
+                for line in lines:
+                    # Items of a chunk are solved together; each is logged with its share of the time.
+                    _log(user, items, line, backend, started, seconds * 1000 / len(lines) if seconds is not None else None)
+                yield b"".join(dumps(line) + b"\n" for line in lines)
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# 🔹 Optimize many formulations at once, streamed as NDJSON lines in completion order
+@router.post("/optimize-batch")
+def optimize_batch(items: List[BatchItem], request: Request, session: Session = Depends(get_read_session)):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch")
+    started = time.perf_counter()
+    # Problems are loaded here, while the request's session is open; the stream only solves.
+    errors, jobs = plan(session, items)
+    stream = _stream(items, errors, jobs, request_user(request), started)
+    return StreamingResponse(stream, media_type="application/x-ndjson")
@@ -0,0 +1,72 @@
+"""
+Cold-start benchmark: how long `import main` takes in a fresh interpreter.
+
+Runs `python -X importtime -c "import main"` a few times from the repo root
+and reports the median cumulative import time of main, of its direct
+imports, and of the heavy libraries (solvers, crypto, numpy, the web stack).
+Pass --warmup to also time `warmup.warm_up` for a WARMUP_IMPORTS list.
+
+    python benchmarks/bench_cold_start.py [--repeat 5] [--warmup pulp,scipy,jose,passlib]
+"""
+import argparse
+import ast
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["fastapi", "sqlmodel", "sqlalchemy", "numpy", "pulp", "scipy", "jose", "passlib", "ortools"]
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(code):
+    """({module: (depth, cumulative µs)}, stdout) for one fresh interpreter running `code`."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(result.stderr[-2000:])
+    times = {}
+    for match in LINE.finditer(result.stderr):
+        _, cumulative, indent, name = match.groups()
+        times.setdefault(name, (len(indent) // 2, int(cumulative)))
+    return times, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", default="", help="comma list passed to warmup.warm_up")
+    args = parser.parse_args()
+
+    code = "import main"
+    if args.warmup:
+        code += f"; import warmup; print(warmup.warm_up({args.warmup.split(',')!r}))"
+    results = [import_times(code) for _ in range(args.repeat)]
+    runs = [times for times, _ in results]
+
+    def median_ms(name):
+        values = [run[name][1] for run in runs if name in run]
+        return statistics.median(values) / 1000 if values else None
+
+    print(f"import main: {median_ms('main'):.0f} ms (median of {args.repeat})")
+    print("\ndirect imports of main:")
+    direct = [n for n, (depth, _) in runs[0].items() if depth == 1]
+    for name in sorted(direct, key=lambda n: -(median_ms(n) or 0))[:12]:
+        print(f"  {name:<28} {median_ms(name):8.1f} ms")
+    print("\nheavy libraries (not loaded = deferred to first use):")
+    for name in HEAVY:
+        ms = median_ms(name)
+        print(f"  {name:<28} " + (f"{ms:8.1f} ms" if ms is not None else "not loaded"))
+    if args.warmup:
+        warmups = [ast.literal_eval(stdout) for _, stdout in results]
+        print("\nwarm-up after import:")
+        for name in warmups[0]:
+            print(f"  {name:<28} {statistics.median(w[name] for w in warmups) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
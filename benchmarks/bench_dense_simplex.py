@@ -0,0 +1,115 @@
+"""
+Batched dense simplex against HiGHS and CBC on the seed data.
+
+Builds feed problems from the seeded database: every requirement row with
+random subsets of 10 or more of the ingredients that have a composition,
+each re-priced --sweeps times (a price scenario sweep). Every problem is solved with
+`optimizer.solve_problems` (batched dense simplex) and, one by one, with
+`optimizer.solve_problem` (HiGHS). A --validate sample is also solved with
+PuLP/CBC. Statuses must match, and objectives must agree within 1e-6
+relative. Reports problems per second for each solver.
+
+    python benchmarks/bench_dense_simplex.py [--subsets 10] [--sweeps 20] [--validate 200]
+"""
+import argparse
+import os
+import tempfile
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from seed import seed_database
+
+from sqlmodel import Session, create_engine, select
+from fastapi import HTTPException
+
+from models import NutrientComposition, NutritionalRequirement
+import optimizer
+
+
+def build_problems(session, args, rng):
+    ingredient_ids = sorted(set(session.exec(select(NutrientComposition.ingredient_id)).all()))
+    profiles = sorted(set(session.exec(select(NutritionalRequirement.category, NutritionalRequirement.age)).all()))
+    problems = []
+    for category, age in profiles:
+        for _ in range(args.subsets):
+            size = int(rng.integers(10, len(ingredient_ids) + 1))
+            subset = sorted(rng.choice(ingredient_ids, size=size, replace=False).tolist())
+            try:
+                problem = optimizer.load_problem(session, category, age, subset)
+            except HTTPException:
+                continue
+            for _ in range(args.sweeps):
+                problems.append(replace(problem, prices=problem.prices * rng.uniform(0.7, 1.3, len(subset))))
+    return problems
+
+
+def solve_cbc(problem):
+    import pulp
+
+    G, h = problem.inequalities()
+    G = G.toarray()
+    model = pulp.LpProblem("Feed", pulp.LpMinimize)
+    x = [pulp.LpVariable(f"x{j}", lowBound=float(lo), upBound=None if np.isinf(up) else float(up))
+         for j, (lo, up) in enumerate(zip(problem.lower, problem.upper))]
+    model += pulp.lpSum(float(p) * v for p, v in zip(problem.prices, x))
+    model += pulp.lpSum(x) == 1
+    for row, rhs in zip(G, h):
+        model += pulp.lpSum(float(a) * v for a, v in zip(row, x) if a) >= float(rhs)
+    status = pulp.LpStatus[model.solve(pulp.PULP_CBC_CMD(msg=False))]
+    return status, pulp.value(model.objective) if status == "Optimal" else None
+
+
+def agree(a, b):
+    return abs(a - b) <= 1e-6 * max(1.0, abs(b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subsets", type=int, default=10, help="random ingredient subsets per requirement row")
+    parser.add_argument("--sweeps", type=int, default=20, help="price scenarios per subset")
+    parser.add_argument("--validate", type=int, default=200, help="problems also solved with PuLP/CBC")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine = create_engine(seed_database(os.path.join(tempfile.mkdtemp(), "dense.db")))
+    rng = np.random.default_rng(args.seed)
+    with Session(engine) as session:
+        problems = build_problems(session, args, rng)
+    shapes = {(len(p.ingredient_ids), p.inequalities()[0].shape[0]) for p in problems}
+    print(f"{len(problems)} problems, {len(shapes)} shapes (ingredients x constraint rows)")
+
+    start = time.perf_counter()
+    dense = optimizer.solve_problems(problems)
+    dense_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    highs = [optimizer.solve_problem(p) for p in problems]
+    highs_seconds = time.perf_counter() - start
+
+    mismatches = 0
+    for p, (status, x), (expected, y) in zip(problems, dense, highs):
+        if status != expected or (x is not None and not agree(float(p.prices @ x), float(p.prices @ y))):
+            mismatches += 1
+
+    sample = rng.choice(len(problems), size=min(args.validate, len(problems)), replace=False)
+    start = time.perf_counter()
+    cbc = [solve_cbc(problems[k]) for k in sample]
+    cbc_seconds = time.perf_counter() - start
+    cbc_mismatches = 0
+    for k, (expected, objective) in zip(sample, cbc):
+        status, x = dense[k]
+        if status != expected or (x is not None and not agree(float(problems[k].prices @ x), objective)):
+            cbc_mismatches += 1
+
+    optimal = sum(status == "Optimal" for status, _ in dense)
+    print(f"  {optimal} optimal, {len(problems) - optimal} infeasible or unsolved")
+    print(f"  dense batch  {len(problems) / dense_seconds:10.0f} problems/s")
+    print(f"  HiGHS        {len(problems) / highs_seconds:10.0f} problems/s   mismatches {mismatches}/{len(problems)}")
+    print(f"  PuLP/CBC     {len(sample) / cbc_seconds:10.0f} problems/s   mismatches {cbc_mismatches}/{len(sample)}")
+    assert mismatches == 0 and cbc_mismatches == 0, "solvers disagree"
+
+
+if __name__ == "__main__":
+    main()
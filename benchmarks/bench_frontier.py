@@ -0,0 +1,84 @@
+"""
+Parametric cost frontier against a grid of cold solves on the seed data.
+
+For every requirement row and every constrained nutrient, sweeps its minimum
+from half to one and a half times its value with `frontier.cost_frontier`
+(one HiGHS solve, then parametric steps), and solves the same problem cold
+with `optimizer.solve_problem` at --grid evenly spaced targets. Each grid
+point must be feasible exactly when it lies inside the frontier's feasible
+range, and its cost must match the piecewise-linear curve within 1e-6
+relative. Reports the time of both.
+
+    python benchmarks/bench_frontier.py [--grid 25]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from seed import seed_database
+
+from sqlmodel import Session, create_engine, select
+from fastapi import HTTPException
+
+from models import NutrientComposition, NutritionalRequirement
+import frontier
+import optimizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--grid", type=int, default=25, help="cold solves per sweep")
+    args = parser.parse_args()
+
+    engine = create_engine(seed_database(os.path.join(tempfile.mkdtemp(), "frontier.db")))
+    with Session(engine) as session:
+        ingredient_ids = sorted(set(session.exec(select(NutrientComposition.ingredient_id)).all()))
+        profiles = sorted(set(session.exec(select(NutritionalRequirement.category, NutritionalRequirement.age)).all()))
+        problems = []
+        for category, age in profiles:
+            try:
+                problems.append(optimizer.load_problem(session, category, age, ingredient_ids))
+            except HTTPException:
+                continue
+
+    sweeps = breakpoints = pivots = mismatches = checked = 0
+    frontier_seconds = cold_seconds = 0.0
+    for problem in problems:
+        for k, value in enumerate(problem.minimums):
+            if not np.isfinite(value):
+                continue
+            start, end = 0.5 * value, 1.5 * value + 1
+            began = time.perf_counter()
+            curve = frontier.cost_frontier(problem, k, "min", start, end)
+            frontier_seconds += time.perf_counter() - began
+            sweeps += 1
+            breakpoints += len(curve.points)
+            pivots += curve.pivots
+
+            grid = np.linspace(start, end, args.grid)
+            began = time.perf_counter()
+            cold = [optimizer.solve_problem(frontier.with_target(problem, k, "min", t)) for t in grid]
+            cold_seconds += time.perf_counter() - began
+
+            targets = [p.target for p in curve.points]
+            costs = [p.cost_per_kg for p in curve.points]
+            for t, (_, x) in zip(grid, cold):
+                checked += 1
+                inside = bool(targets) and targets[0] - 1e-6 <= t <= targets[-1] + 1e-6
+                if (x is not None) != inside:
+                    mismatches += 1
+                elif x is not None:
+                    expected = float(problem.prices @ x)
+                    mismatches += abs(np.interp(t, targets, costs) - expected) > 1e-6 * max(1.0, abs(expected))
+
+    print(f"{sweeps} sweeps, {breakpoints} breakpoints, {pivots} pivots")
+    print(f"  frontier      {frontier_seconds * 1000 / sweeps:8.2f} ms per sweep")
+    print(f"  {args.grid} cold solves {cold_seconds * 1000 / sweeps:8.2f} ms per sweep   mismatches {mismatches}/{checked}")
+    assert mismatches == 0, "frontier disagrees with cold solves"
+
+
+if __name__ == "__main__":
+    main()
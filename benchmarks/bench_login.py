@@ -0,0 +1,102 @@
+"""
+Login storm benchmark.
+
+Fires concurrent POST /auth/token requests at the app (embedded SQLite mode,
+seeded database) while probing a cheap route, and reports login throughput
+and how the probe's latency holds up during the storm.
+
+    python benchmarks/bench_login.py [--logins 200] [--concurrency 50] [--rounds 12]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from seed import seed_database
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else float("nan")
+
+
+async def probe(client, stop, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+
+
+async def run(args):
+    import httpx
+    import db
+    import main
+
+    db.engine.echo = False
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        users = [f"user{i}@bench.local" for i in range(args.users)]
+        for email in users:
+            await client.post("/auth/register", json={
+                "email": email, "password": "secret", "fname": "Bench", "sname": "User", "user_type": "farmer",
+            })
+
+        idle = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, idle))
+        await asyncio.sleep(1)
+        stop.set()
+        await task
+
+        gate = asyncio.Semaphore(args.concurrency)
+        statuses, login_times, storm = [], [], []
+
+        async def login(i):
+            async with gate:
+                start = time.perf_counter()
+                response = await client.post("/auth/token", data={"username": users[i % len(users)], "password": "secret"})
+                login_times.append(time.perf_counter() - start)
+                statuses.append(response.status_code)
+
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, stop, storm))
+        start = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await task
+
+    ok = statuses.count(200)
+    print(f"{args.logins} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}")
+    print(f"  status counts        {dict((s, statuses.count(s)) for s in sorted(set(statuses)))}")
+    print(f"  successful logins/s  {ok / elapsed:8.1f}")
+    print(f"  login p50 / p99      {percentile(login_times, .5):8.1f} / {percentile(login_times, .99):.1f} ms")
+    print(f"  GET / idle p50 / p99 {percentile(idle, .5):8.2f} / {percentile(idle, .99):.2f} ms")
+    print(f"  GET / storm p50/p99  {percentile(storm, .5):8.2f} / {percentile(storm, .99):.2f} ms ({len(storm)} probes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=12)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    seed_database(path)
+    os.environ.update({
+        "DB_MODE": "embedded",
+        "SQLITE_PATH": path,
+        "BCRYPT_ROUNDS": str(args.rounds),
+        "LOGIN_MAX_ATTEMPTS_PER_IP": str(10 * args.logins),
+    })
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
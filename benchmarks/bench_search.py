@@ -0,0 +1,102 @@
+"""
+Ingredient search index on a large synthetic catalog.
+
+Builds a `ingredient_search.TrigramIndex` over --names distinct generated
+feed ingredient names (a base feedstuff, a processing form, a region and a
+made-up supplier or variety word, e.g. "Soybean Cake Expeller Mzuzu Kalimo"),
+then queries it with --queries of those names with one word left out and a
+typo in another. Reports build time, query latency percentiles, how often
+the source ingredient is among the first 10 matches (when the left-out
+word was the only one telling it apart from its neighbours, it ties with
+them), and the cost of incremental updates.
+
+    python benchmarks/bench_search.py [--names 50000] [--queries 2000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+import seed  # noqa: F401  (puts the repository root on sys.path)
+
+from ingredient_search import TrigramIndex
+
+BASES = [
+    "maize", "white maize", "yellow maize", "maize bran", "wheat bran", "rice bran", "rice polishings", "millet",
+    "sorghum", "soybean", "soya full fat", "soybean cake", "soybean meal", "sunflower", "sunflower cake",
+    "cottonseed cake", "groundnut cake", "fish meal", "blood meal", "bone meal", "black soldier fly larvae",
+    "cassava chips", "cassava leaf meal", "moringa leaf", "lime", "limestone", "dicalcium phosphate",
+    "monocalcium phosphate", "salt", "lysine", "methionine", "threonine", "premix", "copra cake", "palm kernel cake",
+]
+FORMS = ["", "expeller", "solvent extracted", "dehulled", "roasted", "raw", "fine", "coarse", "grade a", "grade b"]
+REGIONS = ["Lilongwe", "Blantyre", "Mzuzu", "Zomba", "Kasungu", "Mangochi", "Dedza", "Salima", "Karonga", "Nkhotakota"]
+
+
+SYLLABLES = ["ka", "li", "mo", "nga", "zi", "tu", "we", "chi", "ba", "ndo", "pe", "so", "ma", "ku", "la", "ne"]
+
+
+def catalog(rng, size):
+    words = sorted({"".join(rng.choice(SYLLABLES, size=int(rng.integers(2, 4)))) for _ in range(4 * size // 100)})
+    names = set()
+    while len(names) < size:
+        parts = [
+            BASES[rng.integers(len(BASES))], FORMS[rng.integers(len(FORMS))],
+            REGIONS[rng.integers(len(REGIONS))], words[rng.integers(len(words))],
+        ]
+        names.add(" ".join(p for p in parts if p).title())
+    return sorted(names)
+
+
+def typo(rng, word):
+    if len(word) < 4:
+        return word
+    i = int(rng.integers(1, len(word) - 1))
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--names", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    names = catalog(rng, args.names)
+    start = time.perf_counter()
+    index = TrigramIndex()
+    for ingredient_id, name in enumerate(names, 1):
+        index.set_name(ingredient_id, name)
+    print(f"{args.names} names indexed in {time.perf_counter() - start:.2f} s")
+
+    targets = rng.integers(len(names), size=args.queries)
+    queries = []
+    for k in targets:
+        words = names[k].split()
+        del words[int(rng.integers(len(words)))]
+        j = int(rng.integers(len(words)))
+        words[j] = typo(rng, words[j])
+        queries.append(" ".join(words).lower())
+
+    for query in queries[:50]:
+        index.search(query)  # warm the posting arrays
+    latencies, found = [], 0
+    for k, query in zip(targets, queries):
+        start = time.perf_counter()
+        matches = index.search(query, limit=10)
+        latencies.append(time.perf_counter() - start)
+        found += any(m["id"] == k + 1 for m in matches)
+    latencies = np.asarray(latencies) * 1e6
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"query latency  p50 {p50:.0f} us  p95 {p95:.0f} us  p99 {p99:.0f} us")
+    print(f"source name in top 10: {found / len(queries):.1%}")
+
+    start = time.perf_counter()
+    for ingredient_id in range(1, 1001):
+        index.set_name(ingredient_id, names[ingredient_id - 1] + " Renamed")
+        index.add_alias(ingredient_id, f"Local name {ingredient_id}")
+    print(f"incremental update  {(time.perf_counter() - start) * 1000:.3f} us per rename + alias")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Before/after benchmark for list serialization.
+
+Serves the nutritional requirements seed data scaled 1000x through two
+routes: the default `response_model=list[...]` path (validation +
+jsonable_encoder + json) and `serialization.fast_rows_response` (orjson
+over the raw column values).
+
+    python benchmarks/bench_serialization.py [--scale 1000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from seed import seed_database
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import Session, create_engine, select
+
+from models import NutritionalRequirement
+from serialization import fast_rows_response
+
+
+def build_app(rows):
+    app = FastAPI()
+
+    @app.get("/before", response_model=list[NutritionalRequirement])
+    def before():
+        return rows
+
+    @app.get("/after")
+    def after():
+        return fast_rows_response(rows)
+
+    return app
+
+
+def timed(client, path, repeat):
+    samples, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append(time.perf_counter() - start)
+        size = len(response.content)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(seed_database(path, args.scale))
+    with Session(engine) as session:
+        rows = session.exec(select(NutritionalRequirement)).all()
+        session.expunge_all()
+
+    client = TestClient(build_app(rows))
+    print(f"{len(rows)} nutritional requirement rows, median of {args.repeat} requests")
+    baseline = None
+    for label, route in (("response_model + json", "/before"), ("fast_rows_response", "/after")):
+        seconds, size = timed(client, route, args.repeat)
+        baseline = baseline or seconds
+        print(f"  {label:<24} {seconds * 1000:9.1f} ms  {size / 1e6:6.2f} MB  x{baseline / seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
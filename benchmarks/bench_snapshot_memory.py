@@ -0,0 +1,113 @@
+"""
+Memory of the catalog snapshot as workers are added.
+
+Writes a synthetic snapshot (--ingredients x --nutrients at --density) with
+`catalog_snapshot.write_snapshot`, then starts 1..--workers processes that
+each read every array of it, either mapped (`read_snapshot`) or copied into
+private memory the way a per-worker load would. Reports the PSS of all
+worker processes together from /proc/<pid>/smaps_rollup (Linux only), minus
+that of the same number of workers that import the same modules but load
+nothing. Mapped workers share one copy through the page cache, so their
+total stays flat; copied workers grow linearly.
+
+    python benchmarks/bench_snapshot_memory.py [--ingredients 20000] [--nutrients 300] [--workers 4]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from seed import ROOT
+
+from catalog_snapshot import CatalogSnapshot, write_snapshot
+
+WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+import numpy as np
+from scipy import sparse
+from catalog_snapshot import read_snapshot
+if {mode!r} != "baseline":
+    snapshot, _ = read_snapshot({path!r})
+    arrays = [snapshot.prices, snapshot.ingredient_ids, snapshot.matrix.data, snapshot.matrix.indices, snapshot.matrix.indptr]
+    if {mode!r} == "copied":
+        arrays = [np.array(a) for a in arrays]
+    total = sum(float(a.sum()) for a in arrays)  # touch every page
+print("ready", flush=True)
+sys.stdin.read()
+"""
+
+
+def synthetic(args) -> CatalogSnapshot:
+    from scipy import sparse
+
+    rng = np.random.default_rng(args.seed)
+    matrix = sparse.random(args.nutrients, args.ingredients, density=args.density, format="csr", random_state=rng)
+    return CatalogSnapshot(
+        version=1,
+        built_at=time.time(),
+        ingredient_ids=np.arange(1, args.ingredients + 1, dtype=np.int64),
+        names=[f"Ingredient {i}" for i in range(args.ingredients)],
+        prices=rng.uniform(100, 2000, args.ingredients),
+        has_composition=np.ones(args.ingredients, dtype=bool),
+        nutrients=[f"N{k}" for k in range(args.nutrients)],
+        matrix=matrix,
+    )
+
+
+def pss_kb(pid):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return fields["Pss"]
+
+
+def measure(path, workers, mode):
+    """Total PSS in kB of `workers` processes holding the snapshot the `mode` way."""
+    processes = []
+    try:
+        for _ in range(workers):
+            p = subprocess.Popen(
+                [sys.executable, "-c", WORKER.format(root=ROOT, path=path, mode=mode)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+            )
+            processes.append(p)
+        for p in processes:
+            p.stdout.readline()
+        return sum(pss_kb(p.pid) for p in processes)
+    finally:
+        for p in processes:
+            p.stdin.close()
+            p.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ingredients", type=int, default=20000)
+    parser.add_argument("--nutrients", type=int, default=300)
+    parser.add_argument("--density", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "catalog.bin")
+    write_snapshot(synthetic(args), path)
+    print(f"snapshot file {os.path.getsize(path) / 2**20:.1f} MiB")
+
+    print(f"{'workers':>7} {'mapped':>10} {'copied':>10}  (MiB of PSS above baseline, all workers)")
+    for workers in range(1, args.workers + 1):
+        baseline = measure(path, workers, "baseline")
+        mapped = measure(path, workers, "mapped") - baseline
+        copied = measure(path, workers, "copied") - baseline
+        print(f"{workers:>7} {mapped / 1024:>10.1f} {copied / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
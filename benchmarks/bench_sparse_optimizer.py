@@ -0,0 +1,139 @@
+"""
+Build and solve time of a large sparse feed LP.
+
+Seeds a SQLite database with --ingredients synthetic ingredients and
+--nutrients nutrients (the 8 fixed composition columns plus sparse
+NutrientValue rows at --density), a requirement with a minimum on every
+nutrient, maximums on some and Ca:P-style ratio constraints, then times
+`optimizer.load_problem` (database to CSR) and `optimizer.solve_problem`
+(HiGHS). For comparison the same problem is also built the dense way, one
+PuLP term per matrix cell, and solved with CBC; both objectives must agree.
+
+    python benchmarks/bench_sparse_optimizer.py [--ingredients 500] [--nutrients 150] [--density 0.1]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from seed import seed_database
+
+from sqlmodel import Session, create_engine
+
+from models import (
+    Category, Ingredient, NutrientBound, NutrientComposition, NutrientRatio, NutrientValue, NutritionalRequirement
+)
+import optimizer
+
+FIXED = optimizer.COMPOSITION_COLUMNS
+
+
+def build_catalog(session, args, rng):
+    """Synthetic catalog whose uniform mix satisfies every constraint, so the LP is feasible."""
+    extended = [f"N{k:03d}" for k in range(args.nutrients - len(FIXED))]
+    category = Category(name="Synthetic")
+    session.add(category)
+    session.flush()
+    ingredients = [Ingredient(name=f"Synthetic {i}", price=float(rng.uniform(100, 2000)), category_id=category.id)
+                   for i in range(args.ingredients)]
+    session.add_all(ingredients)
+    session.flush()
+    ids = [i.id for i in ingredients]
+
+    fixed = rng.uniform(0, 20, size=(len(ids), len(FIXED)))
+    session.add_all([
+        NutrientComposition(ingredient_id=i, **dict(zip(FIXED, map(float, row)))) for i, row in zip(ids, fixed)
+    ])
+    sparse_values = np.where(rng.random((len(ids), len(extended))) < args.density,
+                             rng.uniform(0.01, 5, size=(len(ids), len(extended))), 0.0)
+    rows, cols = np.nonzero(sparse_values)
+    session.add_all([
+        NutrientValue(ingredient_id=ids[r], nutrient=extended[c], value=float(sparse_values[r, c]))
+        for r, c in zip(rows, cols)
+    ])
+
+    average = dict(zip(FIXED + extended, np.concatenate([fixed, sparse_values], axis=1).mean(axis=0)))
+    requirement = NutritionalRequirement(feed_type="Synthetic", category="Synthetic", age=1)
+    session.add(requirement)
+    session.flush()
+    names = list(average)
+    session.add_all([
+        NutrientBound(requirement_id=requirement.id, nutrient=n, minimum=0.6 * average[n],
+                      maximum=1.6 * average[n] if k % 5 == 0 else None)
+        for k, n in enumerate(names)
+    ])
+    pairs = [("Ca", "P")] + [(names[k], names[k + 1]) for k in range(8, 8 + 2 * 9, 2)]
+    session.add_all([
+        NutrientRatio(requirement_id=requirement.id, numerator=a, denominator=b,
+                      minimum=0.8 * average[a] / average[b], maximum=1.25 * average[a] / average[b])
+        for a, b in pairs
+    ])
+    session.commit()
+    return ids, len(rows)
+
+
+def solve_dense_pulp(problem):
+    """The pre-sparse approach: dense matrix, one Python-level term per cell, CBC."""
+    import pulp
+
+    start = time.perf_counter()
+    G, h = problem.inequalities()
+    G = G.toarray()
+    model = pulp.LpProblem("Dense", pulp.LpMinimize)
+    x = [pulp.LpVariable(f"x{j}", lowBound=float(lo), upBound=None if np.isinf(up) else float(up))
+         for j, (lo, up) in enumerate(zip(problem.lower, problem.upper))]
+    model += pulp.lpSum(float(p) * v for p, v in zip(problem.prices, x))
+    model += pulp.lpSum(x) == 1
+    for row, rhs in zip(G, h):
+        model += pulp.lpSum(float(a) * v for a, v in zip(row, x)) >= float(rhs)
+    built = time.perf_counter()
+    model.solve(pulp.PULP_CBC_CMD(msg=False))
+    solved = time.perf_counter()
+    return built - start, solved - built, pulp.value(model.objective)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ingredients", type=int, default=500)
+    parser.add_argument("--nutrients", type=int, default=150)
+    parser.add_argument("--density", type=float, default=0.1, help="share of nonzero extended nutrient values")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "sparse.db")
+    engine = create_engine(seed_database(path))
+    rng = np.random.default_rng(args.seed)
+    with Session(engine) as session:
+        ids, nonzeros = build_catalog(session, args, rng)
+
+    loads, solves = [], []
+    with Session(engine) as session:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            problem = optimizer.load_problem(session, "Synthetic", 1, ids)
+            loaded = time.perf_counter()
+            status, x = optimizer.solve_problem(problem)
+            solves.append(time.perf_counter() - loaded)
+            loads.append(loaded - start)
+    if x is None:
+        raise SystemExit(f"synthetic problem not solved: {status}")
+    G, _ = problem.inequalities()
+    print(f"{len(ids)} ingredients x {len(problem.nutrients)} nutrients, {nonzeros} sparse values, "
+          f"{G.shape[0]} constraint rows, matrix density {problem.matrix.nnz / np.prod(problem.matrix.shape):.1%}")
+    print(f"  sparse  load (DB -> CSR)     {statistics.median(loads) * 1000:8.1f} ms")
+    print(f"  sparse  solve (HiGHS)        {statistics.median(solves) * 1000:8.1f} ms")
+
+    build, solve, objective = solve_dense_pulp(problem)
+    print(f"  dense   build (PuLP, cells)  {build * 1000:8.1f} ms")
+    print(f"  dense   solve (CBC)          {solve * 1000:8.1f} ms")
+    sparse_objective = float(problem.prices @ x)
+    print(f"  objective HiGHS {sparse_objective:.6f} / CBC {objective:.6f}")
+    assert abs(sparse_objective - objective) <= 1e-6 * max(1.0, abs(objective)), "solvers disagree"
+
+
+if __name__ == "__main__":
+    main()
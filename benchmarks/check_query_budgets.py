@@ -0,0 +1,128 @@
+"""
+Query budgets of the API routes on the seed data.
+
+Seeds a SQLite database (replicated --scale times), then calls every route
+in `query_budget.QUERY_BUDGETS` through a TestClient inside
+`assert_max_queries`, and fails listing the statements when a route runs
+more than its budget. Routes that take ingredient_ids are called with three
+ingredients and with all of them: the counts must be equal, so a query per
+ingredient fails even when it would fit the budget on small requests. The
+same goes for `optimizer.optimize_feed` called directly, and a token with
+uid/typ claims must authenticate without any statement.
+
+    python benchmarks/check_query_budgets.py [--scale 3]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+
+from seed import seed_database
+
+ADMIN = {"email": "budget@bench.local", "password": "secret", "fname": "Query", "sname": "Budget"}
+
+
+def calls(conn, token):
+    """(method, route path, url, keyword arguments for the client) per budgeted route."""
+    ingredient_id = conn.execute("SELECT min(ingredient_id) FROM nutrientcomposition").fetchone()[0]
+    category_id = conn.execute("SELECT min(id) FROM category").fetchone()[0]
+    category, age = conn.execute("SELECT category, age FROM nutritionalrequirement ORDER BY id").fetchone()
+    cp = conn.execute("SELECT CP FROM nutritionalrequirement ORDER BY id").fetchone()[0]
+    profile = {"category": category, "age": age}
+    admin = {"Authorization": f"Bearer {token}"}
+    return [
+        ("GET", "/categories/", "/categories/", {}),
+        ("GET", "/categories/{category_id}", f"/categories/{category_id}", {}),
+        ("GET", "/ingredients/", "/ingredients/", {}),
+        ("GET", "/ingredients/full", "/ingredients/full", {}),
+        ("GET", "/ingredients/{ingredient_id}", f"/ingredients/{ingredient_id}", {}),
+        ("GET", "/nutritional-requirements/", "/nutritional-requirements/", {}),
+        ("GET", "/nutritional-requirements/{category}/{age}", f"/nutritional-requirements/{category}/{age}", {}),
+        ("GET", "/nutrient-compositions/", "/nutrient-compositions/", {}),
+        ("GET", "/nutrient-compositions/{ingredient_id}", f"/nutrient-compositions/{ingredient_id}", {}),
+        ("GET", "/additive-requirements/", "/additive-requirements/", {}),
+        ("GET", "/optimizer/", "/optimizer/", {"params": profile}),
+        ("GET", "/optimize-robust", "/optimize-robust", {"params": profile}),
+        ("GET", "/cost-frontier", "/cost-frontier", {"params": dict(profile, nutrient="CP", start=cp, end=cp * 1.2 + 1)}),
+        ("GET", "/optimization-runs/", "/optimization-runs/", {"headers": admin}),
+        ("POST", "/auth/token", "/auth/token", {"data": {"username": ADMIN["email"], "password": ADMIN["password"]}}),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=int, default=3, help="copies of the seed rows")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "budgets.db")
+    seed_database(path, args.scale)
+    os.environ.update({"DB_MODE": "embedded", "SQLITE_PATH": path, "SQL_ECHO": "0", "BCRYPT_ROUNDS": "4"})
+
+    from fastapi import HTTPException
+    from fastapi.testclient import TestClient
+    from sqlmodel import Session
+
+    import optimizer
+    from db import engine
+    from main import app
+    from query_budget import QUERY_BUDGETS, assert_max_queries, count_queries
+
+    conn = sqlite3.connect(path)
+    all_ids = [r[0] for r in conn.execute("SELECT DISTINCT ingredient_id FROM nutrientcomposition ORDER BY 1")]
+    category, age = conn.execute("SELECT category, age FROM nutritionalrequirement ORDER BY id").fetchone()
+    failures = []
+    with TestClient(app) as client:
+        client.post("/auth/register", json=dict(ADMIN, user_type="Farmer"))
+        # Registration never grants a role; admins are made server-side (init_app.py, ADMIN_EMAILS).
+        conn.execute("UPDATE user SET user_type = ? WHERE email = ?", (os.getenv("ADMIN_USER_TYPE", "admin"), ADMIN["email"]))
+        conn.commit()
+        token = client.post("/auth/token", data={"username": ADMIN["email"], "password": ADMIN["password"]}).json()["access_token"]
+        todo = calls(conn, token)
+        missing = set(QUERY_BUDGETS) - {(method, route) for method, route, _, _ in todo}
+        assert not missing, f"no call for budgeted routes {sorted(missing)}"
+
+        for method, route, url, kwargs in todo:
+            budget = QUERY_BUDGETS[(method, route)]
+            sizes = [all_ids[:3], all_ids] if "params" in kwargs and route != "/optimizer/" else [None]
+            counts = []
+            for ids in sizes:
+                request = dict(kwargs)
+                if ids is not None:
+                    request["params"] = dict(kwargs["params"], ingredient_ids=ids)
+                try:
+                    with assert_max_queries(budget, f"{method} {route}") as stats:
+                        response = client.request(method, url, **request)
+                except AssertionError as e:
+                    failures.append(str(e))
+                    break
+                counts.append(stats.count)
+                print(f"{method:4} {route:45} {response.status_code}  {stats.count}/{budget} statements"
+                      + (f"  ({len(ids)} ingredients)" if ids is not None else ""))
+            if len(set(counts)) > 1:
+                failures.append(f"{method} {route} runs {counts[0]} statements for 3 ingredients, {counts[-1]} for {len(all_ids)}")
+
+        counts = []
+        for ids in (all_ids[:3], all_ids):
+            with Session(engine) as session, count_queries() as stats:
+                try:
+                    optimizer.optimize_feed(session, category, age, ids)
+                except HTTPException:
+                    pass  # infeasible with few ingredients; the statements are what counts
+            counts.append(stats.count)
+        print(f"optimizer.optimize_feed  {counts[0]} statements for 3 ingredients, {counts[1]} for {len(all_ids)}")
+        if counts[0] != counts[1]:
+            failures.append(f"optimizer.optimize_feed runs {counts[0]} statements for 3 ingredients, {counts[1]} for {len(all_ids)}")
+
+        with count_queries() as stats:
+            client.post("/auth/logout", headers={"Authorization": f"Bearer {token}"})
+        if stats.count:
+            failures.append(f"get_current_user ran {stats.count} statements for a token with uid/typ claims")
+
+    for failure in failures:
+        print(f"\nFAIL {failure}")
+    assert not failures, f"{len(failures)} routes over their query budget"
+    print("all routes within their query budgets")
+
+
+if __name__ == "__main__":
+    main()
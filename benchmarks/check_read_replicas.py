@@ -0,0 +1,85 @@
+"""
+Read-replica routing with read-your-writes, on two SQLite files.
+
+Seeds a primary and a replica file (the replica is a copy and is never
+written, so it stands for a replica that has not caught up), starts the app
+with READ_REPLICA_URLS pointing at the copy and a short
+READ_YOUR_WRITES_SECONDS, and asserts which engine each read hits:
+
+  - a client that just wrote reads its write from the primary,
+  - another client keeps reading the replica meanwhile,
+  - the cached category list reloads from the primary after the write,
+  - once the window has passed, the writer is back on the replica.
+
+    python benchmarks/check_read_replicas.py [--window 1]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from seed import seed_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--window", type=float, default=1.0, help="READ_YOUR_WRITES_SECONDS")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    primary, replica = os.path.join(directory, "primary.db"), os.path.join(directory, "replica.db")
+    seed_database(primary)
+    shutil.copy(primary, replica)
+    os.environ.update({
+        "DB_MODE": "embedded",
+        "SQLITE_PATH": primary,
+        "READ_REPLICA_URLS": f"sqlite:///{replica}",
+        "READ_YOUR_WRITES_SECONDS": str(args.window),
+        "SQL_ECHO": "0",
+        "PRECOMPUTE_DEFAULTS": "0",
+    })
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import db
+    from main import app
+
+    hits = []
+    for name, bind in (("primary", db.engine), ("replica", db.replica_engines[0])):
+        event.listen(bind, "before_cursor_execute", lambda *_, name=name: hits.append(name))
+
+    def read(client, url, expected_engine, expected_status):
+        hits.clear()
+        response = client.get(url)
+        engines = set(hits)
+        ok = engines == {expected_engine} and response.status_code == expected_status
+        print(f"{'ok  ' if ok else 'FAIL'} {client.label:7} GET {url:18} {response.status_code}  read {', '.join(sorted(engines)) or 'nothing'}")
+        return ok
+
+    results = []
+    with TestClient(app) as writer, TestClient(app) as other:
+        writer.label, other.label = "writer", "other"
+        writer.get("/categories/")  # fill the list cache before the write
+        other.get("/categories/")
+
+        created = writer.post("/categories/", json={"name": "Replica check"}).json()
+        url = f"/categories/{created['id']}"
+        results.append(read(writer, url, "primary", 200))
+        results.append(read(other, url, "replica", 404))  # the replica has not seen the write
+        hits.clear()
+        names = [c["name"] for c in other.get("/categories/").json()]
+        reloaded = set(hits) == {"primary"} and "Replica check" in names
+        print(f"{'ok  ' if reloaded else 'FAIL'} other   GET /categories/      list cache reloaded from {', '.join(sorted(set(hits))) or 'nothing'}")
+        results.append(reloaded)
+
+        time.sleep(args.window + 0.1)
+        results.append(read(writer, url, "replica", 404))
+
+    assert all(results), "read routing does not match read-your-writes"
+    print("read routing as expected")
+
+
+if __name__ == "__main__":
+    main()
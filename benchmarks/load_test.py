@@ -0,0 +1,273 @@
+"""
+Load-test harness for the API.
+
+Starts `uvicorn main:app` in embedded mode against a SQLite copy of the seed
+dumps (scaled up with --scale), drives a weighted mix of catalog reads,
+optimizer calls and logins from --concurrency concurrent clients, and reports
+requests per second and p50/p95/p99 latency per route. Results are written as
+JSON so runs can be diffed.
+
+    python benchmarks/load_test.py [--duration 30] [--concurrency 32] [--scale 10]
+        [--mix catalog=6,optimizer=3,login=1] [--workers 1] [--out load_test.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from seed import ROOT, seed_database
+
+USERS = 20
+PASSWORD = "secret"
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3) if ordered else None
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in WORKLOADS:
+            raise SystemExit(f"unknown workload '{name}', expected one of {sorted(WORKLOADS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Fixtures:
+    """Ids and parameters sampled by the workloads, read from the seeded database."""
+
+    def __init__(self, path):
+        conn = sqlite3.connect(path)
+        self.ingredient_ids = [r[0] for r in conn.execute("SELECT id FROM ingredient")]
+        self.profiles = sorted(set(conn.execute("SELECT category, age FROM nutritionalrequirement")))
+        conn.close()
+        self.users = [f"load{i}@bench.local" for i in range(USERS)]
+
+
+# Each workload picks one request: (route label, method, path, params, form data)
+def catalog(rng, fx):
+    choice = rng.random()
+    if choice < 0.3:
+        return "GET /ingredients/", "GET", "/ingredients/", None, None
+    if choice < 0.5:
+        return "GET /nutritional-requirements/", "GET", "/nutritional-requirements/", None, None
+    if choice < 0.6:
+        return "GET /categories/", "GET", "/categories/", None, None
+    if choice < 0.7:
+        return "GET /nutrient-compositions/", "GET", "/nutrient-compositions/", None, None
+    ingredient_id = rng.choice(fx.ingredient_ids)
+    return "GET /ingredients/{id}", "GET", f"/ingredients/{ingredient_id}", None, None
+
+
+def optimizer(rng, fx):
+    category, age = rng.choice(fx.profiles)
+    if rng.random() < 0.7:
+        return "GET /optimizer/", "GET", "/optimizer/", {"category": category, "age": age}, None
+    ids = rng.sample(range(12), rng.randint(3, 8))
+    params = {"category": category, "age": age, "ingredient_ids": ids}
+    return "GET /optimize-feed", "GET", "/optimize-feed", params, None
+
+
+def login(rng, fx):
+    form = {"username": rng.choice(fx.users), "password": PASSWORD}
+    return "POST /auth/token", "POST", "/auth/token", None, form
+
+
+WORKLOADS = {"catalog": catalog, "optimizer": optimizer, "login": login}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args, path, port):
+    env = dict(
+        os.environ,
+        DB_MODE="embedded",
+        SQLITE_PATH=path,
+        SQL_ECHO="0",
+        BCRYPT_ROUNDS=str(args.rounds),
+        LOGIN_MAX_ATTEMPTS_PER_IP="1000000000",
+        LOGIN_MAX_FAILURES_PER_ACCOUNT="1000000000",
+    )
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+async def wait_ready(client, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"server exited with code {server.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("server did not become ready")
+
+
+async def drive(args, base_url, fx):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for email in fx.users:
+            await client.post("/auth/register", json={
+                "email": email, "password": PASSWORD, "fname": "Load", "sname": "Test", "user_type": "farmer",
+            })
+
+        names = list(args.mix)
+        weights = [args.mix[n] for n in names]
+        samples = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+
+        async def client_loop(seed, stop_at):
+            rng = random.Random(seed)
+            while time.monotonic() < stop_at:
+                workload = WORKLOADS[rng.choices(names, weights)[0]]
+                route, method, path, params, form = workload(rng, fx)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, params=params, data=form)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - start
+                if time.monotonic() < stop_at:
+                    samples[route].append(elapsed)
+                    statuses[route][status] += 1
+
+        # Warm-up traffic is discarded, so lazy imports and caches do not skew the first seconds.
+        if args.warmup > 0:
+            await asyncio.gather(*(client_loop(-i - 1, time.monotonic() + args.warmup) for i in range(args.concurrency)))
+            samples.clear()
+            statuses.clear()
+
+        started = time.monotonic()
+        await asyncio.gather(*(client_loop(args.seed + i, started + args.duration) for i in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+    return samples, statuses, elapsed
+
+
+def summarize(samples, statuses, elapsed):
+    def stats(times, counts):
+        errors = sum(n for status, n in counts.items() if not (isinstance(status, int) and status < 400))
+        return {
+            "requests": len(times),
+            "errors": errors,
+            "rps": round(len(times) / elapsed, 2),
+            "p50_ms": percentile(times, 0.50),
+            "p95_ms": percentile(times, 0.95),
+            "p99_ms": percentile(times, 0.99),
+            "statuses": {str(status): n for status, n in sorted(counts.items(), key=str)},
+        }
+
+    routes = {route: stats(samples[route], statuses[route]) for route in sorted(samples)}
+    all_times = [t for times in samples.values() for t in times]
+    all_counts = defaultdict(int)
+    for counts in statuses.values():
+        for status, n in counts.items():
+            all_counts[status] += n
+    return {"total": stats(all_times, all_counts), "routes": routes}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report):
+    print(f"{'route':<34} {'req':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    rows = list(report["routes"].items()) + [("total", report["total"])]
+    for route, s in rows:
+        print(
+            f"{route:<34} {s['requests']:>7} {s['errors']:>5} {s['rps']:>8.1f} "
+            f"{s['p50_ms'] or 0:>8.1f} {s['p95_ms'] or 0:>8.1f} {s['p99_ms'] or 0:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scale", type=int, default=10, help="copies of the seed data")
+    parser.add_argument("--mix", type=parse_mix, default="catalog=6,optimizer=3,login=1")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--db", help="seeded SQLite file for --url (ids and profiles are sampled from it)")
+    parser.add_argument("--out", default="load_test.json")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.db:
+            raise SystemExit("--url needs --db to sample ids from")
+        path, base_url, server = args.db, args.url, None
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "load.db")
+        seed_database(path, args.scale)
+        base_url = f"http://127.0.0.1:{free_port()}"
+        server = start_server(args, path, base_url.rsplit(":", 1)[1])
+    fx = Fixtures(path)
+
+    async def run():
+        import httpx
+
+        if server is not None:
+            async with httpx.AsyncClient(base_url=base_url) as client:
+                await wait_ready(client, server)
+        return await drive(args, base_url, fx)
+
+    try:
+        samples, statuses, elapsed = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = {
+        "config": {
+            "duration": args.duration, "warmup": args.warmup, "concurrency": args.concurrency,
+            "scale": args.scale, "mix": args.mix, "workers": args.workers, "bcrypt_rounds": args.rounds,
+            "seed": args.seed, "url": args.url,
+        },
+        "environment": {
+            "revision": git_revision(), "python": platform.python_version(),
+            "cpus": os.cpu_count(), "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        **summarize(samples, statuses, elapsed),
+    }
+    print_report(report)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwritten to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
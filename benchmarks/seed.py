@@ -0,0 +1,72 @@
+"""
+Seed a SQLite database from the bundled .sql dumps, optionally scaled up.
+
+Used by the benchmark scripts in this directory; nothing here is imported
+by the application.
+"""
+import os
+import sqlite3
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+
+import models  # noqa: E402,F401  (registers the tables on SQLModel.metadata)
+
+SEED_FILES = ["category.sql", "ingredient.sql", "nutritionalrequirement.sql", "nutrientcomposition.sql"]
+
+# Columns copied when a table is replicated; "id" is offset per copy.
+_SCALED_TABLES = {
+    "ingredient": ["name", "price", "category_id"],
+    "nutrientcomposition": ["ingredient_id", "DM", "ME", "CP", "Ca", "P", "Mg", "Na", "K", "created_at", "updated_at"],
+    "nutritionalrequirement": [
+        "feed_type", "category", "age", "DM", "ME", "CP", "Ca", "P", "Mg", "Na", "K",
+        "premix", "toxicin", "lysine", "methionine", "threonine", "salt", "tyrosine", "mcp", "lime",
+        "created_at", "updated_at",
+    ],
+}
+
+
+def _scale(conn: sqlite3.Connection, scale: int):
+    base_ingredients = conn.execute("SELECT max(id) FROM ingredient").fetchone()[0]
+    for table, columns in _SCALED_TABLES.items():
+        base = conn.execute(f"SELECT max(id) FROM {table}").fetchone()[0]
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        for copy in range(1, scale):
+            select_cols = []
+            for c in columns:
+                if c == "name":
+                    select_cols.append(f"name || ' #{copy}'")
+                elif c == "price":
+                    # Spread prices a little so copies are not exact ties.
+                    select_cols.append(f"price * (1 + ((id * {copy}) % 17) / 100.0)")
+                elif c == "ingredient_id":
+                    select_cols.append(f"ingredient_id + {copy * base_ingredients}")
+                else:
+                    select_cols.append(f'"{c}"')
+            conn.execute(
+                f'INSERT INTO {table} (id, {quoted}) '
+                f'SELECT id + {copy * base}, {", ".join(select_cols)} FROM {table} WHERE id <= {base}'
+            )
+
+
+def seed_database(path: str, scale: int = 1) -> str:
+    """Create the schema at `path`, load the seed dumps and replicate them `scale` times."""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    for name in SEED_FILES:
+        with open(os.path.join(ROOT, name)) as f:
+            conn.executescript(f.read())
+    if scale > 1:
+        _scale(conn, scale)
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
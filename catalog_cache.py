@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Sequence, Set
+
+from fastapi import Request, Response
+from sqlmodel import Session
+
+from db import engine
+from serialization import dumps, row_dicts
+
+# Payloads are re-read from the database at most this often even without a
+# local write, so workers that did not see a write still converge.
+CACHE_TTL_SECONDS = float(os.getenv("CATALOG_CACHE_TTL", "30"))
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = defaultdict(int)
+_payloads: Dict[str, "CachedPayload"] = {}
+_listeners: List[Callable[[Set[str]], None]] = []
+
+
+@dataclass(frozen=True)
+class CachedPayload:
+    version: int
+    etag: str
+    body: bytes
+    gzipped: bytes
+    loaded_at: float
+
+    @property
+    def gzip_etag(self) -> str:
+        # The gzip body is different bytes, so it gets its own strong validator.
+        return self.etag[:-1] + '-gz"'
+
+
+def _table(model) -> str:
+    return model if isinstance(model, str) else model.__tablename__
+
+
+def bump_version(*models):
+    """Mark reference tables as changed. Call after the write is committed."""
+    with _lock:
+        for model in models:
+            _versions[_table(model)] += 1
+    tables = {_table(model) for model in models}
+    for listener in _listeners:
+        listener(tables)
+
+
+def on_version_change(listener: Callable[[Set[str]], None]):
+    """Call `listener(table_names)` after every bump_version; it must not block."""
+    _listeners.append(listener)
+
+
+def table_version(model) -> int:
+    return _versions[_table(model)]
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _accepts_gzip(header: str) -> bool:
+    """Whether an Accept-Encoding value allows gzip, honouring q-values (`gzip;q=0` refuses it)."""
+    weights = {}
+    for part in header.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.lower()] = q
+    return weights.get("gzip", weights.get("x-gzip", weights.get("*", 0.0))) > 0
+
+
+def _build_payload(version: int, rows: Sequence) -> CachedPayload:
+    body = dumps(row_dicts(rows))
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    return CachedPayload(version, etag, body, gzip.compress(body), time.monotonic())
+
+
+def cached_response(request: Request, model, load: Callable[[Session], Sequence]) -> Response:
+    """
+    Serve a reference table from its pre-serialized payload.
+
+    `load(session)` is only called when the table's version moved or the
+    payload expired, so a matching `If-None-Match` is answered with a 304
+    without touching the database. It reads the primary: a reload usually
+    follows a write, which a replica may not have yet.
+    """
+    table = _table(model)
+    version = _versions[table]
+    payload = _payloads.get(table)
+    if payload is None or payload.version != version or time.monotonic() - payload.loaded_at > CACHE_TTL_SECONDS:
+        with Session(engine) as session:
+            payload = _build_payload(version, load(session))
+        with _lock:
+            # A write that landed while loading leaves the version ahead of
+            # this payload, so the next request reloads it.
+            _payloads[table] = payload
+
+    gzipped = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    etag = payload.gzip_etag if gzipped else payload.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+        return Response(payload.gzipped, media_type="application/json", headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
@@ -0,0 +1,330 @@
+"""
+The ingredient catalog as arrays, shared by every worker on the host.
+
+The snapshot is published as one versioned binary file (CATALOG_SNAPSHOT_PATH;
+by default a file in the temp directory named after a hash of DATABASE_URL,
+so deployments, dev servers and benchmarks on one host never share it):
+
+    magic (8 bytes) | header length (uint64) | JSON header | arrays
+
+The header holds the format, the snapshot version, the build time, nutrient
+and ingredient names, and the dtype, shape and offset of each array. Each
+array starts on a 64-byte boundary. Workers mmap the file read-only and wrap
+the arrays with `np.frombuffer`, so every process reads the same page-cache
+pages instead of holding its own copy, and a worker can start from the file
+without a database round trip.
+
+A new snapshot is written next to the old one and swapped in with
+`os.replace`. Workers notice the new inode on their next read and remap it,
+while arrays still referencing the old mapping stay valid. A worker rebuilds
+from the database when it committed a catalog write itself, when no file
+exists yet, or when the file is older than the catalog cache TTL. Rebuilds
+are serialized by a lock file, so concurrent workers do not race.
+"""
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+from sqlmodel import Session, select
+
+from catalog_cache import CACHE_TTL_SECONDS, table_version
+from db import DATABASE_URL, engine
+from models import Ingredient, NutrientComposition, NutrientValue
+from optimizer import COMPOSITION_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: one process per host is assumed
+    fcntl = None
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+SNAPSHOT_TABLES = (Ingredient, NutrientComposition, NutrientValue)
+_DATABASE_KEY = hashlib.sha256(DATABASE_URL.encode()).hexdigest()[:16]
+SNAPSHOT_PATH = os.getenv(
+    "CATALOG_SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), f"optifeed-catalog-{_DATABASE_KEY}.bin")
+)
+
+MAGIC = b"OFCATLG\x00"
+FORMAT = 1
+ALIGNMENT = 64
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Prices and nutrient values of every ingredient, as arrays.
+
+    Columns of `matrix` follow the sorted `ingredient_ids`; rows follow
+    `nutrients` (the fixed composition columns, then every NutrientValue name).
+    """
+    version: int  # increases with every published file
+    built_at: float  # wall clock, comparable across processes
+    ingredient_ids: np.ndarray  # sorted
+    names: List[str]
+    prices: np.ndarray  # NaN where unknown
+    has_composition: np.ndarray  # bool per ingredient
+    nutrients: List[str]
+    matrix: "csr_matrix"  # nutrients x ingredients
+
+    def columns(self, ingredient_ids) -> np.ndarray:
+        """Column index of each ID, in the given order; 404 on unknown or composition-less ingredients."""
+        ids = np.asarray(ingredient_ids, dtype=np.int64)
+        index = np.searchsorted(self.ingredient_ids, ids).clip(max=len(self.ingredient_ids) - 1)
+        found = (self.ingredient_ids[index] == ids) if len(self.ingredient_ids) else np.zeros(len(ids), dtype=bool)
+        if not found.all():
+            raise HTTPException(status_code=404, detail=f"Ingredient with ID {int(ids[~found][0])} not found")
+        missing = ~self.has_composition[index]
+        if missing.any():
+            raise HTTPException(
+                status_code=404, detail=f"Nutrient composition for ingredient ID {int(ids[missing][0])} not found"
+            )
+        return index
+
+    def rows(self, nutrients: List[str]) -> np.ndarray:
+        row_of = {n: i for i, n in enumerate(self.nutrients)}
+        unknown = [n for n in nutrients if n not in row_of]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown nutrients: {', '.join(unknown)}")
+        return np.array([row_of[n] for n in nutrients], dtype=np.int64)
+
+
+def snapshot_version() -> int:
+    """Local write counter of the snapshot tables (this process only)."""
+    return sum(table_version(model) for model in SNAPSHOT_TABLES)
+
+
+def build_snapshot(session: Session, version: int) -> CatalogSnapshot:
+    from scipy import sparse
+
+    ingredients = session.exec(select(Ingredient.id, Ingredient.name, Ingredient.price).order_by(Ingredient.id)).all()
+    ids = np.array([i for i, _, _ in ingredients], dtype=np.int64)
+    prices = np.array([np.nan if p is None else p for _, _, p in ingredients], dtype=np.float64)
+
+    # Fixed columns, first composition row per ingredient
+    fixed = {}
+    for row in session.exec(
+        select(NutrientComposition.ingredient_id, *[getattr(NutrientComposition, n) for n in COMPOSITION_COLUMNS])
+        .order_by(NutrientComposition.id)
+    ).all():
+        fixed.setdefault(row[0], row[1:])
+    fixed_ids = np.array(list(fixed), dtype=np.int64)
+    fixed_values = np.nan_to_num(np.array(list(fixed.values()), dtype=np.float64).reshape(len(fixed), len(COMPOSITION_COLUMNS)))
+    has_composition = np.isin(ids, fixed_ids)
+
+    stored = session.exec(select(NutrientValue.ingredient_id, NutrientValue.nutrient, NutrientValue.value)).all()
+    extended = sorted({n for _, n, _ in stored} - set(COMPOSITION_COLUMNS))
+    nutrients = COMPOSITION_COLUMNS + extended
+
+    rows, cols, values = [], [], []
+    keep = np.isin(fixed_ids, ids)
+    ing, col = np.nonzero(fixed_values[keep])
+    rows.append(col)
+    cols.append(np.searchsorted(ids, fixed_ids[keep][ing]))
+    values.append(fixed_values[keep][ing, col])
+    if stored:
+        row_of = {n: i for i, n in enumerate(nutrients)}
+        stored = [s for s in stored if s[1] in row_of]
+        stored_ids = np.array([i for i, _, _ in stored], dtype=np.int64)
+        known = np.isin(stored_ids, ids)
+        rows.append(np.array([row_of[n] for _, n, _ in stored], dtype=np.int64)[known])
+        cols.append(np.searchsorted(ids, stored_ids[known]))
+        values.append(np.array([v for _, _, v in stored], dtype=np.float64)[known])
+
+    matrix = sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(len(nutrients), len(ids))
+    )
+    names = [name for _, name, _ in ingredients]
+    return CatalogSnapshot(version, time.time(), ids, names, prices, has_composition, nutrients, matrix)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(snapshot: CatalogSnapshot, path: str = SNAPSHOT_PATH):
+    """Write the snapshot file and swap it in atomically."""
+    arrays = {
+        "ingredient_ids": snapshot.ingredient_ids,
+        "prices": snapshot.prices,
+        "has_composition": snapshot.has_composition,
+        "data": snapshot.matrix.data,
+        "indices": snapshot.matrix.indices,
+        "indptr": snapshot.matrix.indptr,
+    }
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({
+        "format": FORMAT,
+        "version": snapshot.version,
+        "built_at": snapshot.built_at,
+        "nutrients": snapshot.nutrients,
+        "names": snapshot.names,
+        "matrix_shape": list(snapshot.matrix.shape),
+        "arrays": layout,
+    }).encode()
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".catalog-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+            for name, array in arrays.items():
+                f.seek(start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_snapshot(path: str = SNAPSHOT_PATH) -> Tuple[CatalogSnapshot, tuple]:
+    """Map the snapshot file; returns the snapshot and the file identity it was read from."""
+    from scipy import sparse
+
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a catalog snapshot")
+    length = int.from_bytes(buffer[len(MAGIC):len(MAGIC) + 8], "little")
+    header = json.loads(buffer[len(MAGIC) + 8:len(MAGIC) + 8 + length])
+    if header["format"] != FORMAT:
+        raise ValueError(f"{path} has snapshot format {header['format']}, expected {FORMAT}")
+    start = _align(len(MAGIC) + 8 + length)
+
+    def array(name):
+        spec = header["arrays"][name]
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=start + spec["offset"]).reshape(spec["shape"])
+
+    matrix = sparse.csr_matrix(
+        (array("data"), array("indices"), array("indptr")), shape=tuple(header["matrix_shape"]), copy=False
+    )
+    snapshot = CatalogSnapshot(
+        version=header["version"],
+        built_at=header["built_at"],
+        ingredient_ids=array("ingredient_ids"),
+        names=header["names"],
+        prices=array("prices"),
+        has_composition=array("has_composition"),
+        nutrients=header["nutrients"],
+        matrix=matrix,
+    )
+    return snapshot, (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+
+def _file_identity(path: str = SNAPSHOT_PATH) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_dev, stat.st_ino, stat.st_mtime_ns
+
+
+@contextmanager
+def _publish_lock(path: str = SNAPSHOT_PATH):
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _try_read(path: str = SNAPSHOT_PATH) -> Tuple[Optional[CatalogSnapshot], Optional[tuple]]:
+    try:
+        return read_snapshot(path)
+    except (FileNotFoundError, ValueError):
+        return None, None
+
+
+def _write_next(session: Session, path: str = SNAPSHOT_PATH):
+    previous, _ = _try_read(path)
+    write_snapshot(build_snapshot(session, (previous.version if previous else 0) + 1), path)
+
+
+def publish(session: Session, path: str = SNAPSHOT_PATH) -> CatalogSnapshot:
+    """Rebuild the snapshot from the database as the next version of the file."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with _publish_lock(path):
+        _write_next(session, path)
+    return read_snapshot(path)[0]
+
+
+_lock = threading.Lock()
+_snapshot: Optional[CatalogSnapshot] = None
+_identity: Optional[tuple] = None  # file the current snapshot was mapped from
+_tables = 0  # local table versions when it was mapped
+
+
+def _expired(snapshot: CatalogSnapshot) -> bool:
+    return time.time() - snapshot.built_at > CACHE_TTL_SECONDS
+
+
+def load_published() -> Optional[CatalogSnapshot]:
+    """Map the published file if there is one (worker startup, no database access)."""
+    global _snapshot, _identity, _tables
+    with _lock:
+        snapshot, identity = _try_read()
+        if snapshot is not None:
+            _snapshot, _identity, _tables = snapshot, identity, snapshot_version()
+        return snapshot
+
+
+def current_snapshot() -> CatalogSnapshot:
+    """
+    The catalog as arrays: the mapped file, remapped when another worker
+    swapped in a newer one, and rebuilt from the primary after a local write
+    or once the file is older than the catalog cache TTL.
+    """
+    global _snapshot, _identity, _tables
+    tables = snapshot_version()
+    snapshot = _snapshot
+    if snapshot is not None and _tables == tables and _identity == _file_identity() and not _expired(snapshot):
+        return snapshot
+    with _lock:
+        identity = _file_identity()
+        if _snapshot is not None and _tables == tables and _identity == identity and not _expired(_snapshot):
+            return _snapshot
+        local_write = _tables != tables
+        snapshot = None
+        if not local_write and identity is not None:
+            snapshot, identity = _try_read()
+            if snapshot is not None and _expired(snapshot):
+                snapshot = None
+        if snapshot is None:
+            os.makedirs(os.path.dirname(os.path.abspath(SNAPSHOT_PATH)), exist_ok=True)
+            with _publish_lock():
+                # Another worker may have swapped in a fresh file while we waited for the lock.
+                latest = None
+                if not local_write and _file_identity() not in (None, identity):
+                    latest, _ = _try_read()
+                if latest is None or _expired(latest):
+                    with Session(engine) as session:
+                        _write_next(session)
+            snapshot, identity = read_snapshot()
+        _snapshot, _identity, _tables = snapshot, identity, tables
+        return snapshot
@@ -3,20 +3,31 @@ from models import (
     Category, Ingredient, NutritionalRequirement,
     NutrientComposition, AdditiveRequirement
 )
+from pricing import record_price
+from catalog_cache import bump_version
+from price_events import hub as price_events
+from formulations import recost_formulations
+from ingredient_search import search as ingredient_search
 
 # ✅ CREATE functions
 def create_category(session: Session, name: str):
     category = Category(name=name)
     session.add(category)
     session.commit()
+    bump_version(Category)
     session.refresh(category)
     return category
 
 def create_ingredient(session: Session, name: str, price: float, category_id: int):
     ingredient = Ingredient(name=name, price=price, category_id=category_id)
     session.add(ingredient)
+    if price is not None:
+        session.flush()
+        record_price(session, ingredient.id, price)
     session.commit()
+    bump_version(Ingredient)
     session.refresh(ingredient)
+    ingredient_search.ingredient_saved(ingredient.id, ingredient.name)
     return ingredient
 
 # ✅ READ functions
@@ -33,8 +44,15 @@ def get_nutritional_requirements(session: Session):
 def update_ingredient_price(session: Session, ingredient_id: int, new_price: float):
     ingredient = session.get(Ingredient, ingredient_id)
     if ingredient:
+        price_changed = new_price != ingredient.price
+        if price_changed:
+            record_price(session, ingredient.id, new_price)
+            recost_formulations(session, ingredient.id, ingredient.price, new_price)
         ingredient.price = new_price
         session.commit()
+        bump_version(Ingredient)
+        if price_changed:
+            price_events.publish_price_change(ingredient_id, new_price)
         session.refresh(ingredient)
     return ingredient
 
@@ -44,5 +62,7 @@ def delete_ingredient(session: Session, ingredient_id: int):
     if ingredient:
         session.delete(ingredient)
         session.commit()
+        bump_version(Ingredient)
+        ingredient_search.ingredient_removed(ingredient_id)
         return True
     return False
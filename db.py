@@ -1,25 +1,233 @@
 from sqlmodel import SQLModel, Session, create_engine
+from sqlalchemy import event, inspect
 from dotenv import load_dotenv
+from collections import deque
+from fastapi import Request
+import itertools
+import threading
+import time
 import os
 
 load_dotenv()
 
+# "mysql" (default) or "embedded" for offline installs backed by the bundled SQLite file
+DB_MODE = os.getenv("DB_MODE", "mysql")
+
 MYSQL_HOST = os.getenv("MYSQL_HOST")
 MYSQL_USER = os.getenv("MYSQL_USER")
 MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 MYSQL_DATABASE = os.getenv("MYSQL_DATABASE")
 MYSQL_PORT = os.getenv("MYSQL_PORT", 3306)
 
-DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
-#DATABASE_URL="sqlite:///database.db"
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db"))
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "32"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+# Longest a write transaction waits for its turn in the writer queue, in seconds.
+SQLITE_WRITER_TIMEOUT = float(os.getenv("SQLITE_WRITER_TIMEOUT", "30"))
+SQL_ECHO = os.getenv("SQL_ECHO", "1") == "1"  # log every statement
+
+# Comma-separated SQLAlchemy URLs of read replicas; without any, reads go to the primary.
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+# After a write, the writing client's reads (cookie) stay on the primary for this long.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+READ_YOUR_WRITES_COOKIE = "read_primary_until"
+
+if DB_MODE == "embedded":
+    DATABASE_URL = f"sqlite:///{SQLITE_PATH}"
+else:
+    DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}"
+
+
+class WriterBusy(Exception):
+    """Raised when a write transaction waits longer than SQLITE_WRITER_TIMEOUT for its turn."""
+
+
+class WriterQueue:
+    """
+    FIFO lock that lets one write transaction at a time into SQLite.
+
+    Writers queue up in-process instead of racing for SQLite's file lock and
+    failing with "database is locked"; busy_timeout still covers other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self._busy = False
+
+    def acquire(self, timeout: float = SQLITE_WRITER_TIMEOUT):
+        with self._lock:
+            if not self._busy:
+                self._busy = True
+                return
+            waiter = threading.Lock()
+            waiter.acquire()
+            self._waiters.append(waiter)
+        # Ownership is handed over directly by release(), in arrival order.
+        if waiter.acquire(timeout=timeout):
+            return
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                raise WriterBusy(f"no turn to write within {timeout:g} s")
+        # release() handed over between the timeout and taking the lock.
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().release()
+            else:
+                self._busy = False
+
+
+writer_queue = WriterQueue()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, safe with WAL
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")  # negative = KiB
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _enter_write(session):
+    # Only sessions on the embedded engine queue; replica and other binds pass through.
+    if session.bind is engine and not session.info.get("holds_writer"):
+        writer_queue.acquire()
+        session.info["holds_writer"] = True
+
+
+def _before_flush(session, flush_context, instances):
+    _enter_write(session)
+
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _enter_write(orm_execute_state.session)
+
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None and session.info.pop("holds_writer", False):
+        writer_queue.release()
+
 
-print(f"Connecting to database: {DATABASE_URL}")
+if DB_MODE == "embedded":
+    engine = create_engine(DATABASE_URL, echo=SQL_ECHO, connect_args={"check_same_thread": False, "timeout": 5})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(Session, "before_flush", _before_flush)
+    event.listen(Session, "do_orm_execute", _do_orm_execute)
+    event.listen(Session, "after_transaction_end", _after_transaction_end)
+else:
+    engine = create_engine(DATABASE_URL, echo=SQL_ECHO)
 
-engine = create_engine(DATABASE_URL, echo=True)
+
+def _replica_engine(url: str):
+    if url.startswith("sqlite"):
+        replica = create_engine(url, echo=SQL_ECHO, connect_args={"check_same_thread": False, "timeout": 5})
+        event.listen(replica, "connect", _set_sqlite_pragmas)
+        return replica
+    return create_engine(url, echo=SQL_ECHO, pool_pre_ping=True)
+
+
+replica_engines = [_replica_engine(url) for url in READ_REPLICA_URLS]
+_next_replica = itertools.cycle(replica_engines)
 
 def create_db_and_tables():
+    import models  # noqa: F401  (registers every table on SQLModel.metadata)
+
     SQLModel.metadata.create_all(engine)
 
-def get_session():
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+def check_schema(bind=None):
+    """List the tables, columns and indexes declared in models.py that the database lacks."""
+    import models  # noqa: F401  (registers every table on SQLModel.metadata)
+
+    inspector = inspect(bind if bind is not None else engine)
+    existing = set(inspector.get_table_names())
+    problems = []
+    for table in SQLModel.metadata.sorted_tables:
+        if table.name not in existing:
+            problems.append(f"missing table {table.name}")
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        problems += [f"missing column {table.name}.{c.name}" for c in table.columns if c.name not in columns]
+        indexed = {tuple(ix["column_names"]) for ix in inspector.get_indexes(table.name)}
+        indexed |= {tuple(uc["column_names"]) for uc in inspector.get_unique_constraints(table.name)}
+        for index in table.indexes:
+            if tuple(c.name for c in index.columns) not in indexed:
+                problems.append(f"missing index {index.name} on {table.name}")
+    return problems
+
+def verify_schema():
+    problems = check_schema()
+    if problems:
+        raise RuntimeError("Database schema does not match models.py:\n  " + "\n  ".join(problems))
+
+def _committed(session):
+    request = session.info.get("request")
+    if session.info.pop("wrote", False) and request is not None:
+        request.state.committed_write = True
+
+
+def _dml_executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+
+
+def _rolled_back(session, previous_transaction):
+    session.info.pop("wrote", None)
+
+
+event.listen(Session, "do_orm_execute", _dml_executed)
+event.listen(Session, "after_flush", _flushed)
+event.listen(Session, "after_commit", _committed)
+event.listen(Session, "after_soft_rollback", _rolled_back)
+
+
+def get_session(request: Request):
+    """Session on the primary, for handlers that write."""
+    with Session(engine, info={"request": request}) as session:
+        yield session
+
+
+def read_engine(request: Request = None):
+    """
+    Engine for a read-only handler: a replica, round-robin, unless the
+    client wrote within READ_YOUR_WRITES_SECONDS. Caches that reload after a
+    write (catalog_cache, catalog_snapshot, default formulations) read the
+    primary themselves, so other clients keep reading replicas.
+    """
+    if not replica_engines:
+        return engine
+    if request is not None:
+        try:
+            if float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time():
+                return engine
+        except ValueError:
+            pass
+    return next(_next_replica)
+
+
+def get_read_session(request: Request):
+    """Session for handlers that only read; see read_engine."""
+    with Session(read_engine(request)) as session:
+        yield session
+
+
+async def read_your_writes(request: Request, call_next):
+    """Middleware: after a committed write, pin the client's reads to the primary for a while."""
+    response = await call_next(request)
+    if getattr(request.state, "committed_write", False):
+        response.set_cookie(
+            READ_YOUR_WRITES_COOKIE, f"{time.time() + READ_YOUR_WRITES_SECONDS:.3f}",
+            max_age=max(1, int(READ_YOUR_WRITES_SECONDS + 0.999)), httponly=True, samesite="lax",
+        )
+    return response
@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple, Union
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlmodel import Session, select
+
+from catalog_cache import CACHE_TTL_SECONDS, on_version_change, table_version
+from db import engine
+from models import Ingredient, NutrientComposition, NutritionalRequirement
+from run_log import logged_run
+from single_flight import group
+
+router = APIRouter()
+
+# Precompute the default formulations in the background (set to 0 on
+# serverless hosts, where work outside a request may be frozen; vercel.json
+# does).
+PRECOMPUTE_DEFAULTS = os.getenv("PRECOMPUTE_DEFAULTS", "1") == "1"
+
+CATALOG_TABLES = (Ingredient, NutrientComposition, NutritionalRequirement)
+
+# Default ingredient set: price per kg
+ingredients = {
+    'Maize_bran': 300,
+    'White_maize': 1200,
+    'Wheat_bran': 300,
+    'Rice_Bran': 300,
+    'Millet': 300,
+    'Sorghum': 300,
+    'Soya_full_fat': 1500,
+    'Soy_cake': 300,
+    'Sunflower': 300,
+    'Sunflower_Cake': 450,
+    'Fish_meal': 300,
+    'BSF': 300,
+    'Premix': 1500,
+    'Toxicin': 2000,
+    'Lysine': 4500,
+    'Methionine': 3000,
+    'Threonine': 2500,
+    'Salt': 800,
+    'Tyrosine': 4500,
+    'MCP': 4500,
+    'Lime': 200
+}
+
+# Nutrient composition data (per kg)
+nutrient_composition = {
+    'ME': {
+        'Maize_bran': 8.8, 'White_maize': 14.8, 'Wheat_bran': 7.4,
+        'Rice_Bran': 10.6, 'Millet': 13.3, 'Sorghum': 16.0,
+        'Soya_full_fat': 15.7, 'Soy_cake': 12.8, 'Sunflower': 19.7,
+        'Sunflower_Cake': 10.8, 'Fish_meal': 12.0, 'BSF': 12.0
+    },
+    'CP': {
+        'Maize_bran': 11.9, 'White_maize': 8.0, 'Wheat_bran': 17.3,
+        'Rice_Bran': 12.7, 'Millet': 12.5, 'Sorghum': 10.8,
+        'Soya_full_fat': 39.5, 'Soy_cake': 47.0, 'Sunflower': 16.0,
+        'Sunflower_Cake': 27.9, 'Fish_meal': 48.4, 'BSF': 42.1
+    },
+    'Ca': {
+        'Maize_bran': 0.47, 'White_maize': 0.04, 'Wheat_bran': 0.14,
+        'Rice_Bran': 0.07, 'Millet': 0.05, 'Sorghum': 0.03,
+        'Soya_full_fat': 0.34, 'Soy_cake': 0.37, 'Sunflower': 0.27,
+        'Sunflower_Cake': 0.39, 'Fish_meal': 7.93, 'BSF': 7.56
+    },
+    'P': {
+        'Maize_bran': 0.34, 'White_maize': 0.29, 'Wheat_bran': 1.11,
+        'Rice_Bran': 1.38, 'Millet': 0.33, 'Sorghum': 0.33,
+        'Soya_full_fat': 0.59, 'Soy_cake': 0.69, 'Sunflower': 0.57,
+        'Sunflower_Cake': 0.92, 'Fish_meal': 3.98, 'BSF': 0.90
+    },
+    'Na': {
+        'Maize_bran': 0.08, 'White_maize': 0.05, 'Wheat_bran': 0.01,
+        'Rice_Bran': 0.02, 'Millet': 0.009, 'Sorghum': 0.02,
+        'Soya_full_fat': 0.0, 'Soy_cake': 0.011, 'Sunflower': 0.007,
+        'Sunflower_Cake': 0.01, 'Fish_meal': 2.84, 'BSF': 0.13
+    }
+}
+
+# Fixed inclusion rates for additives
+additives = {
+    'Premix': 0.0025,
+    'Toxicin': 0.001,
+    'Lysine': 0.001,
+    'Methionine': 0.001,
+    'Threonine': 0.001,
+    'Salt': 0.0025,
+    'Tyrosine': 0.001,
+    'MCP': 0.005,
+    'Lime': 0.025
+}
+
+
+class OptimizationResult(BaseModel):
+    status: str
+    composition: Dict[str, float]
+    total_cost: float
+    nutrient_values: Dict[str, float]
+    catalog_version: Optional[int] = None  # catalog version the result was computed at
+    precomputed: bool = False
+
+
+def catalog_version() -> int:
+    """Changes whenever any table the default formulations depend on is written."""
+    return sum(table_version(model) for model in CATALOG_TABLES)
+
+
+def requirement_values(requirement: NutritionalRequirement) -> Dict[str, float]:
+    return {
+        k: v for k, v in requirement.dict().items()
+        if v is not None and k not in ['id', 'feed_type', 'category', 'age', 'created_at', 'updated_at']
+    }
+
+
+def solve_default(requirements: Dict[str, float]) -> OptimizationResult:
+    """Least-cost mix of the default ingredient set for one requirement row."""
+    import pulp  # imported on first solve to keep cold starts fast
+
+    # Create the model
+    model = pulp.LpProblem("Feed_Optimization", pulp.LpMinimize)
+
+    # Create variables for each ingredient
+    x = pulp.LpVariable.dicts("ingr", ingredients.keys(), lowBound=0, upBound=1)
+
+    # Objective function: Minimize cost
+    model += pulp.lpSum([x[i] * cost for i, cost in ingredients.items()])
+
+    # Add nutrient constraints (requirements without composition data are skipped)
+    for nutrient, min_value in requirements.items():
+        if nutrient in nutrient_composition:
+            nutrient_sum = pulp.lpSum([x[i] * nutrient_composition[nutrient].get(i, 0) for i in ingredients.keys()])
+            model += nutrient_sum >= min_value
+
+    # Constraint: sum of ingredients = 100%
+    model += pulp.lpSum([x[i] for i in ingredients.keys()]) == 1
+
+    # Maximum inclusion rates
+    model += x['Maize_bran'] <= 0.05  # Max 5%
+    model += x['Fish_meal'] <= 0.05   # Max 5%
+
+    for additive, rate in additives.items():
+        model += x[additive] == rate
+
+    # Solve the model
+    status = model.solve(pulp.PULP_CBC_CMD(msg=False))
+
+    # Check if solution is optimal
+    if pulp.LpStatus[status] != 'Optimal':
+        raise HTTPException(status_code=400, detail="Could not find optimal solution")
+
+    # Prepare results
+    composition = {}
+    total_cost = 0
+
+    # Collect results directly from the solved variables
+    for ingredient in ingredients.keys():
+        value = x[ingredient].value()
+        if value is not None and value > 0.0001:
+            composition[ingredient.replace('_', ' ')] = round(value * 100, 2)
+            total_cost += value * ingredients[ingredient]
+
+    # Calculate actual nutrient values
+    nutrient_values = {}
+    for nutrient in requirements.keys():
+        if nutrient in nutrient_composition:
+            value = sum(x[i].value() * nutrient_composition[nutrient].get(i, 0)
+                       for i in ingredients.keys()
+                       if x[i].value() is not None)
+            nutrient_values[nutrient] = round(value, 2)
+
+    # Verify solution
+    total_percentage = sum(composition.values())
+    if not (99.9 <= total_percentage <= 100.1):  # Allow for small numerical errors
+        raise HTTPException(status_code=400, detail=f"Invalid solution: total percentage is {total_percentage}%")
+
+    return OptimizationResult(
+        status=pulp.LpStatus[status],
+        composition=composition,
+        total_cost=round(total_cost, 2),
+        nutrient_values=nutrient_values
+    )
+
+
+@dataclass(frozen=True)
+class DefaultTable:
+    version: int
+    computed_at: float
+    # (category, age) -> result, or the HTTPException a live solve would raise
+    results: Dict[Tuple[str, int], Union[OptimizationResult, HTTPException]] = field(default_factory=dict)
+
+
+class DefaultFormulations:
+    """
+    Default-ingredient-set formulations for every (category, age) requirement row.
+
+    The whole table is re-solved on a background thread whenever the catalog
+    version moves, and swapped in at once. Lookups against a missing table or
+    one from an older version return None and the caller solves live. A table
+    older than the catalog cache TTL is still served but rebuilt, so workers
+    that did not see a write converge.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._table: Optional[DefaultTable] = None
+        self._pending = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="default-formulations")
+
+    def refresh(self):
+        """Schedule a rebuild unless one is already queued."""
+        if not PRECOMPUTE_DEFAULTS:
+            return
+        with self._lock:
+            if self._pending:
+                return
+            self._pending = True
+        self._executor.submit(self._rebuild)
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = False
+        version = catalog_version()
+        with Session(engine) as session:
+            rows = session.exec(select(NutritionalRequirement).order_by(NutritionalRequirement.id)).all()
+            requirements = {}
+            for row in rows:
+                # Same row a live lookup's .first() returns
+                requirements.setdefault((row.category, row.age), requirement_values(row))
+        results = {}
+        for key, values in requirements.items():
+            try:
+                results[key] = solve_default(values)
+            except HTTPException as e:
+                results[key] = e
+        # A write during the rebuild leaves the version ahead of this table,
+        # so lookups keep falling back until the next rebuild lands.
+        self._table = DefaultTable(version, time.monotonic(), results)
+
+    def lookup(self, category: str, age: int) -> Optional[OptimizationResult]:
+        table = self._table
+        if table is None or table.version != catalog_version():
+            self.refresh()
+            return None
+        if time.monotonic() - table.computed_at > CACHE_TTL_SECONDS:
+            self.refresh()  # served meanwhile: nothing changed in this process
+        result = table.results.get((category, age))
+        if result is None:
+            raise HTTPException(status_code=404, detail="No nutritional requirements found for the given parameters.")
+        if isinstance(result, HTTPException):
+            raise HTTPException(status_code=result.status_code, detail=result.detail)
+        return result.copy(update={"catalog_version": table.version, "precomputed": True})
+
+
+defaults = DefaultFormulations()
+live_solves = group("optimizer")
+on_version_change(lambda tables: defaults.refresh() if {m.__tablename__ for m in CATALOG_TABLES} & tables else None)
+
+
+# 🔹 Least-cost mix of the default ingredient set, served from the precomputed table when current
+@router.get("/optimizer/", response_model=OptimizationResult)
+def optimize_feed(request: Request,
+                  category: str = Query(..., description="Category of chicken (Layers or Broilers)"),
+                  age: int = Query(..., description="Age of the chicken in weeks")):
+    with logged_run(request, "/optimizer/", "cbc", category, age) as run:
+        result = defaults.lookup(category, age)
+        if result is not None:
+            run.backend = "precomputed"
+        else:
+            version = catalog_version()
+            # Identical requests arriving while this one solves share its result
+            result = live_solves.do((category, age, version), lambda: run.timed(_solve_live, category, age, version))
+        run.status, run.cost_per_kg, run.result = result.status, result.total_cost, {"composition": result.composition}
+    return result
+
+
+def _solve_live(category: str, age: int, version: int) -> OptimizationResult:
+    # Fetch nutritional requirements from the database
+    with Session(engine) as session:
+        statement = select(NutritionalRequirement).where(
+            (NutritionalRequirement.category == category) & (NutritionalRequirement.age == age)
+        )
+        requirement = session.exec(statement).first()
+
+        if not requirement:
+            raise HTTPException(status_code=404, detail="No nutritional requirements found for the given parameters.")
+
+        requirements = requirement_values(requirement)
+
+    result = solve_default(requirements)
+    result.catalog_version = version
+    return result
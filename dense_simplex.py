@@ -0,0 +1,143 @@
+"""
+Batched dense simplex for small feed LPs.
+
+Solves B problems of the same shape at once, stacked along the leading axis:
+
+    minimize    prices[b] @ x
+    subject to  G[b] @ x >= h[b]
+                sum(x) == 1
+                lower[b] <= x <= upper[b]
+
+Every pivot is a handful of NumPy operations over the whole stack, so a batch
+of tiny problems (tens of ingredients, a few dozen rows) costs about as much
+as a few solver calls. Bounds are shifted away (y = x - lower) and upper
+bounds become rows. Because lower >= 0 and the shares sum to 1, an upper
+bound of at least 1 - sum(lower) can never bind; those get no row, so the
+usual feed problem (caps only on a few ingredients) keeps a small tableau.
+Large stacks are solved in cache-sized chunks. Phase 1 and phase 2 run
+together on a lexicographic objective (infeasibility first, then cost), with
+Dantzig's rule and a switch to Bland's rule against cycling on degenerate
+problems.
+
+Status codes follow scipy.optimize.linprog (see optimizer.LINPROG_STATUS).
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+OPTIMAL, NOT_SOLVED, INFEASIBLE, UNBOUNDED = 0, 1, 2, 3
+
+
+def solve_batch(
+    prices: np.ndarray,
+    G: np.ndarray,
+    h: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    max_iter: Optional[int] = None,
+    tol: float = 1e-9,
+    chunk_size: int = 256,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solve a stack of problems; returns (status per problem, x per problem).
+
+    Shapes: prices, lower, upper (B, n); G (B, m, n); h (B, m). Rows of x are
+    NaN unless the status is OPTIMAL. Optimal solutions are basic (vertices).
+    """
+    prices, G, h, lower, upper = (np.asarray(a, dtype=np.float64) for a in (prices, G, h, lower, upper))
+    B, m, n = G.shape
+    if B > chunk_size:
+        parts = [
+            solve_batch(*(a[start:start + chunk_size] for a in (prices, G, h, lower, upper)), max_iter, tol, chunk_size)
+            for start in range(0, B, chunk_size)
+        ]
+        return np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+    if (lower < 0).any():
+        raise ValueError("lower bounds must be >= 0")
+    status = np.full(B, NOT_SOLVED)
+    X = np.full((B, n), np.nan)
+
+    span = upper - lower
+    status[(span < -tol).any(axis=1)] = INFEASIBLE
+    # Upper bounds that can bind in at least one problem of the stack
+    capped = np.flatnonzero((span < 1 - lower.sum(axis=1, keepdims=True)).any(axis=0))
+    k = len(capped)
+    span = np.clip(span[:, capped], 0, 1)
+
+    # Columns: y (n) | surplus s (m) | upper slack t (k) | artificials (m + 1)
+    # Rows:    G y - s = h - G lower | sum(y) = 1 - sum(lower) | y + t = span | cost | infeasibility
+    R, E = m + 1 + k, n + m + k
+    N = E + m + 1
+    T = np.zeros((B, R + 2, N + 1))
+    b = h - np.einsum("bmn,bn->bm", G, lower)
+    sign = np.where(b < 0, -1.0, 1.0)
+    T[:, :m, :n] = G * sign[:, :, None]
+    T[:, :m, n:n + m] = -np.eye(m) * sign[:, :, None]
+    T[:, :m, E:E + m] = np.eye(m)
+    T[:, :m, N] = np.abs(b)
+    total = 1 - lower.sum(axis=1)
+    T[:, m, :n] = np.where(total < 0, -1.0, 1.0)[:, None]
+    T[:, m, E + m] = 1
+    T[:, m, N] = np.abs(total)
+    T[:, m + 1 + np.arange(k), capped] = 1
+    T[:, m + 1:R, n + m:E] = np.eye(k)
+    T[:, m + 1:R, N] = span
+    T[:, R, :n] = prices
+    T[:, R + 1] = -T[:, :m + 1].sum(axis=1)
+    T[:, R + 1, E:N] = 0
+    basis = np.tile(np.concatenate([np.arange(E, N), np.arange(n + m, E)]), (B, 1))
+
+    max_iter = max_iter if max_iter is not None else 50 * R
+    bland_after = 5 * R
+    active = np.flatnonzero(status == NOT_SOLVED)
+    T, basis = T[active], basis[active]
+
+    for iteration in range(max_iter + 1):
+        if not len(active):
+            break
+        dc, dw = T[:, R, :E], T[:, R + 1, :E]
+        phase1 = (dw < -tol).any(axis=1)
+        score = np.where(phase1[:, None], dw, np.where(np.abs(dw) <= tol, dc, np.inf))
+        candidates = score < -tol
+        finished = ~candidates.any(axis=1)
+        if iteration == max_iter:
+            finished[:] = True
+        q = candidates.argmax(axis=1) if iteration >= bland_after else score.argmin(axis=1)
+
+        rows = np.arange(len(active))
+        column = T[rows, :R, q]
+        rhs = T[:, :R, N]
+        positive = column > tol
+        ratio = np.where(positive, rhs / np.where(positive, column, 1), np.inf)
+        unbounded = ~finished & ~positive.any(axis=1)
+        best = ratio.min(axis=1, keepdims=True)
+        ties = ratio <= best + tol * (1 + np.abs(best))
+        r = np.where(ties, basis, np.iinfo(basis.dtype).max).argmin(axis=1)
+
+        done = finished | unbounded
+        if done.any():
+            converged = ~candidates.any(axis=1)
+            infeasible = -T[:, R + 1, N] > 1e-7 * (1 + np.abs(T[:, :m + 1, N]).sum(axis=1))
+            codes = np.select(
+                [unbounded, converged & infeasible, converged], [UNBOUNDED, INFEASIBLE, OPTIMAL], NOT_SOLVED
+            )
+            for row in np.flatnonzero(done):
+                problem = active[row]
+                status[problem] = codes[row]
+                if codes[row] == OPTIMAL:
+                    values = np.zeros(N)
+                    values[basis[row]] = T[row, :R, N]
+                    X[problem] = lower[problem] + np.clip(values[:n], 0, None)
+            keep = ~done
+            active, T, basis, q, r = active[keep], T[keep], basis[keep], q[keep], r[keep]
+            if not len(active):
+                break
+            rows = np.arange(len(active))
+
+        pivot = T[rows, r] / T[rows, r, q][:, None]
+        column = T[rows, :, q].copy()
+        column[rows, r] = 0
+        T -= column[:, :, None] * pivot[:, None, :]
+        T[rows, r] = pivot
+        basis[rows, r] = q
+    return status, X
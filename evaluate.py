@@ -0,0 +1,122 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from sqlmodel import Session, select
+
+from catalog_snapshot import current_snapshot
+from db import get_read_session
+from models import NutritionalRequirement
+from optimizer import COMPOSITION_COLUMNS, constrained_nutrients, requirement_constraints
+
+router = APIRouter()
+
+MAX_RECIPES = int(os.getenv("EVALUATE_MAX_RECIPES", "10000"))
+TOLERANCE = 1e-9
+
+
+class EvaluateRequest(BaseModel):
+    # The requirement to check against: by ID, or the first row for category and age
+    requirement_id: Optional[int] = None
+    category: Optional[str] = None
+    age: Optional[int] = None
+    ingredient_ids: List[int]
+    # recipes x ingredient_ids amounts in any unit; each recipe is scaled to 1 kg
+    recipes: List[List[float]]
+    nutrients: Optional[List[str]] = None  # reported nutrients; default: composition columns + constrained ones
+
+
+def _requirement(session: Session, request: EvaluateRequest) -> NutritionalRequirement:
+    if request.requirement_id is not None:
+        requirement = session.get(NutritionalRequirement, request.requirement_id)
+    elif request.category is not None and request.age is not None:
+        requirement = session.exec(
+            select(NutritionalRequirement).where(
+                (NutritionalRequirement.category == request.category) & (NutritionalRequirement.age == request.age)
+            )
+        ).first()
+    else:
+        raise HTTPException(status_code=400, detail="Give requirement_id, or category and age")
+    if not requirement:
+        raise HTTPException(status_code=404, detail="No nutritional requirements found for the given parameters.")
+    return requirement
+
+
+def _shares(request: EvaluateRequest):
+    if not request.recipes:
+        raise HTTPException(status_code=400, detail="No recipes given")
+    if len(request.recipes) > MAX_RECIPES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RECIPES} recipes per request")
+    width = len(request.ingredient_ids)
+    if any(len(recipe) != width for recipe in request.recipes):
+        raise HTTPException(status_code=400, detail=f"Every recipe needs one amount per ingredient ({width})")
+    amounts = np.asarray(request.recipes, dtype=np.float64).reshape(len(request.recipes), width)
+    if (amounts < 0).any():
+        raise HTTPException(status_code=400, detail="Amounts must not be negative")
+    totals = amounts.sum(axis=1)
+    empty = np.flatnonzero(totals <= 0)
+    if empty.size:
+        raise HTTPException(status_code=400, detail=f"Recipe {int(empty[0])} has no ingredients")
+    return amounts / totals[:, None], totals
+
+
+def _columns(names: List[str], matrix: np.ndarray) -> dict:
+    """{name: contiguous column} from a (names x recipes) array."""
+    return {name: row for name, row in zip(names, np.ascontiguousarray(matrix))}
+
+
+# 🔹 Evaluate many recipes at once: nutrient totals, cost and deficits, as columns
+@router.post("/evaluate", response_class=ORJSONResponse)
+def evaluate_recipes(request: EvaluateRequest, session: Session = Depends(get_read_session)):
+    shares, totals = _shares(request)
+    requirement = _requirement(session, request)
+    minimums, maximums, ratios = requirement_constraints(session, requirement)
+    snapshot = current_snapshot()
+
+    reported = request.nutrients or list(dict.fromkeys(
+        COMPOSITION_COLUMNS + constrained_nutrients(minimums, maximums, ratios)
+    ))
+    needed = list(dict.fromkeys(reported + constrained_nutrients(minimums, maximums, ratios)))
+    position = {n: i for i, n in enumerate(needed)}
+    columns = snapshot.columns(request.ingredient_ids)
+
+    # One sparse (nutrients x ingredients) by (ingredients x recipes) product
+    sub = snapshot.matrix[snapshot.rows(needed)][:, columns]
+    values = np.asarray(sub @ shares.T)  # nutrients x recipes
+    cost_per_kg = shares @ snapshot.prices[columns]
+
+    min_names, max_names = list(minimums), list(maximums)
+    deficits = np.maximum(
+        np.array([minimums[n] for n in min_names]).reshape(-1, 1) - values[[position[n] for n in min_names]], 0
+    )
+    excesses = np.maximum(
+        values[[position[n] for n in max_names]] - np.array([maximums[n] for n in max_names]).reshape(-1, 1), 0
+    )
+    ratio_names = [f"{r.numerator}/{r.denominator}" for r in ratios]
+    numerators = values[[position[r.numerator] for r in ratios]]
+    denominators = values[[position[r.denominator] for r in ratios]]
+    ratio_values = np.divide(numerators, denominators, out=np.full_like(numerators, np.nan), where=denominators != 0)
+    ratio_low = np.array([-np.inf if r.minimum is None else r.minimum for r in ratios]).reshape(-1, 1)
+    ratio_high = np.array([np.inf if r.maximum is None else r.maximum for r in ratios]).reshape(-1, 1)
+    ratio_ok = (ratio_values >= ratio_low - TOLERANCE) & (ratio_values <= ratio_high + TOLERANCE)
+
+    meets = (
+        (deficits <= TOLERANCE).all(axis=0)
+        & (excesses <= TOLERANCE).all(axis=0)
+        & ratio_ok.all(axis=0)
+    )
+    return ORJSONResponse({
+        "requirement_id": requirement.id,
+        "catalog_version": snapshot.version,
+        "recipes": len(totals),
+        "amount": totals,
+        "cost_per_kg": cost_per_kg.round(4),
+        "values": _columns(reported, values[[position[n] for n in reported]].round(4)),
+        "deficits": _columns(min_names, deficits.round(4)),
+        "excesses": _columns(max_names, excesses.round(4)),
+        "ratios": _columns(ratio_names, ratio_values.round(4)),
+        "meets_requirements": meets,
+    })
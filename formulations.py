@@ -0,0 +1,207 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlalchemy import and_, delete, or_, update
+from sqlmodel import Session, select
+
+from db import get_read_session, get_session
+from models import Formulation, FormulationIngredient
+from optimizer import FeedProblem, cost_ranges, load_problem, solve_problem
+from pricing import PriceHistory, RecostResult, recost
+from run_log import Run, logged_run
+from serialization import fast_rows_response
+
+router = APIRouter()
+
+
+class FormulationCreate(BaseModel):
+    name: Optional[str] = None
+    category: str
+    age: int
+    ingredient_ids: List[int]
+    amount: Optional[float] = None
+
+
+class FormulationRead(BaseModel):
+    id: int
+    name: Optional[str]
+    category: str
+    age: int
+    amount: Optional[float]
+    cost_per_kg: float
+    total_cost: Optional[float]
+    possibly_suboptimal: bool
+    composition: Dict[int, float]  # ingredient_id -> % of the mix
+
+
+def _bound(value: float) -> Optional[float]:
+    return float(value) if np.isfinite(value) else None
+
+
+def _store_solution(session: Session, formulation: Formulation, problem: FeedProblem, x: np.ndarray):
+    low, high = cost_ranges(problem, x)
+    formulation.cost_per_kg = float(problem.prices @ x)
+    formulation.possibly_suboptimal = False
+    formulation.updated_at = datetime.utcnow()
+    session.add(formulation)
+    session.flush()
+
+    session.exec(delete(FormulationIngredient).where(FormulationIngredient.formulation_id == formulation.id))
+    session.add_all([
+        FormulationIngredient(
+            formulation_id=formulation.id,
+            ingredient_id=ingredient_id,
+            fraction=float(fraction),
+            price_low=_bound(lo),
+            price_high=_bound(hi),
+        )
+        for ingredient_id, fraction, lo, hi in zip(problem.ingredient_ids, x, low, high)
+    ])
+
+
+def _solve(session: Session, category: str, age: int, ingredient_ids: List[int], run: Run):
+    problem = load_problem(session, category, age, ingredient_ids)
+    status, x = run.timed(solve_problem, problem)
+    if x is None:
+        raise HTTPException(status_code=400, detail=f"Could not find optimal solution. Status: {status}")
+    run.cost_per_kg = float(problem.prices @ x)
+    run.result = {"composition": dict(zip(problem.ingredient_ids, x))}
+    return problem, x
+
+
+def _read(session: Session, formulation: Formulation) -> FormulationRead:
+    parts = session.exec(
+        select(FormulationIngredient).where(FormulationIngredient.formulation_id == formulation.id)
+    ).all()
+    return FormulationRead(
+        id=formulation.id,
+        name=formulation.name,
+        category=formulation.category,
+        age=formulation.age,
+        amount=formulation.amount,
+        cost_per_kg=round(formulation.cost_per_kg, 2),
+        total_cost=round(formulation.cost_per_kg * formulation.amount, 2) if formulation.amount else None,
+        possibly_suboptimal=formulation.possibly_suboptimal,
+        composition={p.ingredient_id: round(p.fraction * 100, 2) for p in parts if p.fraction > 0.0001},
+    )
+
+
+def recost_formulations(session: Session, ingredient_id: int, old_price: Optional[float], new_price: Optional[float]):
+    """
+    Apply a price change to every saved formulation that uses the ingredient.
+
+    Costs move by `fraction * (new - old)` in one set-based UPDATE instead of a
+    re-solve, and formulations whose optimality range the new price leaves are
+    flagged. Runs inside the caller's transaction, before its commit.
+    """
+    if old_price is None or new_price is None or old_price == new_price:
+        return
+    parts = FormulationIngredient
+    fraction = (
+        select(parts.fraction)
+        .where(parts.formulation_id == Formulation.id, parts.ingredient_id == ingredient_id)
+        .scalar_subquery()
+    )
+    session.exec(
+        update(Formulation)
+        .where(Formulation.id.in_(
+            select(parts.formulation_id).where(parts.ingredient_id == ingredient_id, parts.fraction > 0)
+        ))
+        .values(cost_per_kg=Formulation.cost_per_kg + (new_price - old_price) * fraction)
+        .execution_options(synchronize_session=False)
+    )
+    session.exec(
+        update(Formulation)
+        .where(Formulation.id.in_(
+            select(parts.formulation_id).where(
+                parts.ingredient_id == ingredient_id,
+                or_(
+                    and_(parts.price_low.is_not(None), parts.price_low > new_price),
+                    and_(parts.price_high.is_not(None), parts.price_high < new_price),
+                ),
+            )
+        ))
+        .values(possibly_suboptimal=True)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# 🔹 CREATE (solve and save) a formulation
+@router.post("/formulations/", response_model=FormulationRead)
+def create_formulation(request: FormulationCreate, http_request: Request, session: Session = Depends(get_session)):
+    with logged_run(http_request, "/formulations/", "highs", request.category, request.age,
+                    ingredient_ids=request.ingredient_ids) as run:
+        problem, x = _solve(session, request.category, request.age, request.ingredient_ids, run)
+    formulation = Formulation(
+        name=request.name, category=request.category, age=request.age, amount=request.amount, cost_per_kg=0
+    )
+    _store_solution(session, formulation, problem, x)
+    session.commit()
+    session.refresh(formulation)
+    return _read(session, formulation)
+
+
+# 🔹 GET all formulations with their current costs
+@router.get("/formulations/", response_model=List[Formulation])
+def get_formulations(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    possibly_suboptimal: Optional[bool] = Query(None, description="Only flagged (true) or unflagged (false) formulations"),
+    session: Session = Depends(get_session),
+):
+    statement = select(Formulation)
+    if possibly_suboptimal is not None:
+        statement = statement.where(Formulation.possibly_suboptimal == possibly_suboptimal)
+    return fast_rows_response(session.exec(statement.order_by(Formulation.id).offset(offset).limit(limit)).all())
+
+
+# 🔹 GET a single formulation with its composition
+@router.get("/formulations/{formulation_id}", response_model=FormulationRead)
+def get_formulation(formulation_id: int, session: Session = Depends(get_read_session)):
+    formulation = session.get(Formulation, formulation_id)
+    if not formulation:
+        raise HTTPException(status_code=404, detail="Formulation not found")
+    return _read(session, formulation)
+
+
+# 🔹 Re-solve a formulation against current prices and clear its flag
+@router.post("/formulations/{formulation_id}/resolve", response_model=FormulationRead)
+def resolve_formulation(formulation_id: int, http_request: Request, session: Session = Depends(get_session)):
+    formulation = session.get(Formulation, formulation_id)
+    if not formulation:
+        raise HTTPException(status_code=404, detail="Formulation not found")
+    ingredient_ids = session.exec(
+        select(FormulationIngredient.ingredient_id)
+        .where(FormulationIngredient.formulation_id == formulation_id)
+        .order_by(FormulationIngredient.id)
+    ).all()
+    with logged_run(http_request, "/formulations/{id}/resolve", "highs", formulation.category, formulation.age,
+                    ingredient_ids=list(ingredient_ids), formulation_id=formulation_id) as run:
+        problem, x = _solve(session, formulation.category, formulation.age, list(ingredient_ids), run)
+    _store_solution(session, formulation, problem, x)
+    session.commit()
+    session.refresh(formulation)
+    return _read(session, formulation)
+
+
+# 🔹 Re-cost a saved formulation at every price change in a date range
+@router.get("/formulations/{formulation_id}/cost-history", response_model=RecostResult)
+def get_formulation_cost_history(
+    formulation_id: int, start: datetime, end: datetime, session: Session = Depends(get_read_session)
+):
+    formulation = session.get(Formulation, formulation_id)
+    if not formulation:
+        raise HTTPException(status_code=404, detail="Formulation not found")
+    if end < start:
+        raise HTTPException(status_code=400, detail="End date is before start date")
+    parts = session.exec(
+        select(FormulationIngredient)
+        .where(FormulationIngredient.formulation_id == formulation_id, FormulationIngredient.fraction > 0)
+    ).all()
+    composition = {p.ingredient_id: p.fraction * 100 for p in parts}
+    history = PriceHistory.load(session, ingredient_ids=composition.keys(), until=end)
+    dates, costs = recost(history, composition, start, end)
+    return RecostResult(dates=dates, cost_per_kg=[None if np.isnan(c) else round(float(c), 2) for c in costs])
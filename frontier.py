@@ -0,0 +1,267 @@
+"""
+Least-cost frontier of one nutrient bound.
+
+How the cost of the cheapest mix moves as a nutrient target moves, e.g. the
+CP minimum from 16 to 22, is a convex piecewise-linear curve. It is traced
+with one cold HiGHS solve at one end of the range followed by parametric
+right-hand-side steps on that optimal basis: the basis stays optimal while
+its basic variables stay within their bounds, so each step moves the target
+to the next point where one of them hits a bound, and a dual simplex pivot
+there swaps it out of the basis. Between breakpoints the cost is linear in
+the target with slope equal to the bound's shadow price.
+"""
+from dataclasses import replace
+from typing import List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel
+from sqlmodel import Session
+
+from db import get_read_session
+from optimizer import FeedProblem, StandardForm, load_problem, solve_problem, standard_form, vertex_basis
+from run_log import logged_run
+
+router = APIRouter()
+
+TOLERANCE = 1e-9
+
+
+class FrontierPoint(BaseModel):
+    target: float
+    cost_per_kg: float
+    composition: dict  # ingredient name -> % of the mix
+
+
+class FrontierSegment(BaseModel):
+    start: float
+    end: float
+    marginal_cost: float  # cost per kg for one more unit of the target (shadow price)
+
+
+class BasisChange(BaseModel):
+    target: float
+    entering: str
+    leaving: str
+
+
+class CostFrontier(BaseModel):
+    nutrient: str
+    bound: str
+    feasible_from: Optional[float]  # None when no target in the range is feasible
+    feasible_to: Optional[float]
+    points: List[FrontierPoint]  # breakpoints of the curve, in increasing target order
+    segments: List[FrontierSegment]
+    basis_changes: List[BasisChange]
+    pivots: int
+
+
+def with_target(problem: FeedProblem, nutrient: int, bound: str, target: float) -> FeedProblem:
+    if bound == "min":
+        minimums = problem.minimums.copy()
+        minimums[nutrient] = target
+        return replace(problem, minimums=minimums)
+    maximums = problem.maximums.copy()
+    maximums[nutrient] = target
+    return replace(problem, maximums=maximums)
+
+
+def _target_row(problem: FeedProblem, nutrient: int, bound: str) -> Tuple[int, float]:
+    """Row of G (see FeedProblem.inequalities) holding the bound, and d(rhs)/d(target)."""
+    has_min, has_max = np.isfinite(problem.minimums), np.isfinite(problem.maximums)
+    if bound == "min":
+        return int(has_min[:nutrient].sum()), 1.0
+    return int(has_min.sum() + has_max[:nutrient].sum()), -1.0
+
+
+def _variable_names(problem: FeedProblem) -> List[str]:
+    has_min, has_max = np.isfinite(problem.minimums), np.isfinite(problem.maximums)
+    names = list(problem.names)
+    names += [f"{n} minimum surplus" for n, b in zip(problem.nutrients, has_min) if b]
+    names += [f"{n} maximum surplus" for n, b in zip(problem.nutrients, has_max) if b]
+    ratios = 0 if problem.ratios is None else problem.ratios.shape[0]
+    return names + [f"ratio row {i} surplus" for i in range(ratios)]
+
+
+def _basic_values(form: StandardForm, basic: List[int], values: np.ndarray, b: np.ndarray):
+    nonbasic = np.ones(len(values), dtype=bool)
+    nonbasic[basic] = False
+    values[basic] = np.linalg.solve(form.A[:, basic], b - form.A[:, nonbasic] @ values[nonbasic])
+
+
+def _reduced_costs(form: StandardForm, basic: List[int]) -> np.ndarray:
+    y = np.linalg.solve(form.A[:, basic].T, form.c[basic])
+    return form.c - form.A.T @ y
+
+
+def _make_optimal(form: StandardForm, basic: List[int], at_upper: np.ndarray, values: np.ndarray, max_pivots: int) -> int:
+    """
+    Primal simplex pivots (Bland's rule) from a primal feasible basis until it
+    is also dual feasible. Starting from an optimal vertex these are the
+    degenerate pivots that fix a completed basis. Returns the pivots made.
+    """
+    fixed = form.lower == form.upper
+    for pivots in range(max_pivots):
+        reduced = _reduced_costs(form, basic)
+        nonbasic = np.ones(len(values), dtype=bool)
+        nonbasic[basic] = False
+        improving = nonbasic & ~fixed & np.where(at_upper, reduced > TOLERANCE, reduced < -TOLERANCE)
+        if not improving.any():
+            return pivots
+        j = int(np.flatnonzero(improving)[0])
+        direction = -1.0 if at_upper[j] else 1.0
+        rate = -direction * np.linalg.solve(form.A[:, basic], form.A[:, j])
+        current = values[basic]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            limits = np.where(
+                rate < -TOLERANCE, (current - form.lower[basic]) / -rate,
+                np.where(rate > TOLERANCE, (form.upper[basic] - current) / rate, np.inf),
+            )
+        limits = np.maximum(limits, 0)
+        step = min(limits.min(initial=np.inf), form.upper[j] - form.lower[j])
+        if not np.isfinite(step):
+            raise HTTPException(status_code=400, detail="Problem is unbounded")
+        values[basic] = current + step * rate
+        values[j] += direction * step
+        if step == form.upper[j] - form.lower[j] and step < limits.min(initial=np.inf):
+            at_upper[j] = not at_upper[j]
+            continue
+        ties = np.flatnonzero(limits <= step + TOLERANCE)
+        r = int(ties[np.argmin(np.asarray(basic)[ties])])
+        leaving = basic[r]
+        at_upper[leaving] = rate[r] > 0
+        values[leaving] = form.upper[leaving] if at_upper[leaving] else form.lower[leaving]
+        basic[r] = j
+        at_upper[j] = False
+    raise HTTPException(status_code=400, detail="Could not establish an optimal basis")
+
+
+def cost_frontier(problem: FeedProblem, nutrient: int, bound: str, start: float, end: float) -> CostFrontier:
+    """Trace the least-cost curve of `bound` on `problem.nutrients[nutrient]` over [start, end]."""
+    # Anchor on a feasible end of the range, then walk towards the other end.
+    anchor, target, direction = start, end, 1.0
+    anchored = with_target(problem, nutrient, bound, start)
+    status, x = solve_problem(anchored)
+    if x is None:
+        anchor, target, direction = end, start, -1.0
+        anchored = with_target(problem, nutrient, bound, end)
+        status, x = solve_problem(anchored)
+    name = problem.nutrients[nutrient]
+    if x is None:
+        # The feasible targets form an interval; both ends infeasible means it is empty here
+        # (or lies strictly inside the range, which the endpoints cannot tell apart).
+        return CostFrontier(nutrient=name, bound=bound, feasible_from=None, feasible_to=None,
+                            points=[], segments=[], basis_changes=[], pivots=0)
+
+    form = standard_form(anchored)
+    n, rows = len(x), form.A.shape[0]
+    values = np.concatenate([x, form.A[:rows - 1, :n] @ x - form.b[:rows - 1]])
+    basic = vertex_basis(form, values, n)
+    if basic is None:
+        raise HTTPException(status_code=400, detail="Solver did not return a vertex solution")
+    at_upper = form.upper - values < values - form.lower
+    at_upper[basic] = False
+    max_pivots = 50 * (rows + len(values))
+    pivots = _make_optimal(form, basic, at_upper, values, max_pivots)
+
+    row, coefficient = _target_row(anchored, nutrient, bound)
+    rhs = np.zeros(rows)
+    rhs[row] = coefficient
+    names = _variable_names(anchored)
+    fixed = form.lower == form.upper
+
+    def point(theta: float) -> FrontierPoint:
+        shares = values[:n]
+        composition = {nm: round(float(s) * 100, 2) for nm, s in zip(problem.names, shares) if s > 0.0001}
+        return FrontierPoint(target=theta, cost_per_kg=float(form.c @ values), composition=composition)
+
+    theta = anchor
+    points, changes = [point(theta)], []
+    while (target - theta) * direction > TOLERANCE and pivots < max_pivots:
+        B = form.A[:, basic]
+        d = np.linalg.solve(B, rhs * direction)  # change of the basic values per unit of target
+        current = values[basic]
+        lower, upper = form.lower[basic], form.upper[basic]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            limits = np.where(d < -TOLERANCE, (current - lower) / -d, np.where(d > TOLERANCE, (upper - current) / d, np.inf))
+        limits = np.maximum(limits, 0)
+        step = min(limits.min(initial=np.inf), abs(target - theta))
+        theta = target if step == abs(target - theta) else theta + direction * step
+        _basic_values(form, basic, values, form.b + (theta - anchor) * rhs)
+        if step > TOLERANCE:
+            points.append(point(theta))
+        if theta == target:
+            break
+
+        # Dual simplex pivot: the basic variable at its bound leaves.
+        ties = np.flatnonzero(limits <= step + TOLERANCE)
+        r = int(ties[np.argmin(np.asarray(basic)[ties])])
+        leaving = basic[r]
+        e = np.zeros(rows)
+        e[r] = 1
+        alpha = np.linalg.solve(B.T, e) @ form.A
+        reduced = _reduced_costs(form, basic)
+        nonbasic = np.ones(len(values), dtype=bool)
+        nonbasic[basic] = False
+        # The entering variable must move off its bound in a feasible direction.
+        eligible = nonbasic & ~fixed & np.where(at_upper, alpha * d[r] < -TOLERANCE, alpha * d[r] > TOLERANCE)
+        if not eligible.any():
+            break  # no mix reaches targets beyond theta
+        ratios = np.where(eligible, np.abs(reduced) / np.where(eligible, np.abs(alpha), 1), np.inf)
+        j = int(np.argmin(ratios))
+        at_upper[leaving] = d[r] > 0
+        values[leaving] = form.upper[leaving] if at_upper[leaving] else form.lower[leaving]
+        basic[r] = j
+        at_upper[j] = False
+        _basic_values(form, basic, values, form.b + (theta - anchor) * rhs)
+        pivots += 1
+        changes.append(BasisChange(target=theta, entering=names[j], leaving=names[leaving]))
+
+    if direction < 0:
+        points.reverse()
+        changes.reverse()
+    segments = [
+        FrontierSegment(start=a.target, end=b.target, marginal_cost=(b.cost_per_kg - a.cost_per_kg) / (b.target - a.target))
+        for a, b in zip(points, points[1:])
+    ]
+    return CostFrontier(
+        nutrient=name,
+        bound=bound,
+        feasible_from=points[0].target,
+        feasible_to=points[-1].target,
+        points=points,
+        segments=segments,
+        basis_changes=changes,
+        pivots=pivots,
+    )
+
+
+# 🔹 Least-cost curve as one nutrient bound sweeps a range (parametric analysis)
+@router.get("/cost-frontier", response_model=CostFrontier)
+def get_cost_frontier(
+    request: Request,
+    category: str = Query(..., description="Category of chicken (Layers or Broilers)"),
+    age: int = Query(..., description="Age of the chicken in weeks"),
+    ingredient_ids: List[int] = Query(..., description="List of ingredient IDs to use in the optimization process"),
+    nutrient: str = Query(..., description="Nutrient whose bound is swept, e.g. CP"),
+    start: float = Query(..., description="First value of the bound"),
+    end: float = Query(..., description="Last value of the bound"),
+    bound: str = Query("min", pattern="^(min|max)$", description="Sweep the nutrient's minimum or maximum"),
+    session: Session = Depends(get_read_session),
+):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+    with logged_run(
+        request, "/cost-frontier", "parametric", category, age,
+        ingredient_ids=ingredient_ids, nutrient=nutrient, bound=bound, start=start, end=end,
+    ) as run:
+        problem = load_problem(session, category, age, ingredient_ids)
+        if nutrient not in problem.nutrients:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{nutrient} is not constrained for {category} at {age} weeks; add a nutrient bound for it first",
+            )
+        frontier = run.timed(cost_frontier, problem, problem.nutrients.index(nutrient), bound, start, end)
+        run.status = "Optimal" if frontier.points else "Infeasible"
+        run.result = {"points": len(frontier.points), "pivots": frontier.pivots}
+    return frontier
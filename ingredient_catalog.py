@@ -0,0 +1,66 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import joinedload, selectinload
+from sqlmodel import Session, select
+
+from db import get_read_session
+from models import Ingredient
+from optimizer import COMPOSITION_COLUMNS
+from serialization import row_dicts
+
+router = APIRouter()
+
+
+def load_ingredients(session: Session, ids: Optional[List[int]] = None) -> List[Ingredient]:
+    """
+    Ingredients with their category and nutrient compositions.
+
+    Two queries whatever the number of ingredients: ingredients JOINed to
+    their category, then one SELECT ... IN for all their compositions.
+    """
+    statement = select(Ingredient).options(
+        joinedload(Ingredient.category), selectinload(Ingredient.nutrient_compositions)
+    )
+    if ids is not None:
+        statement = statement.where(Ingredient.id.in_(ids))
+    return session.exec(statement.order_by(Ingredient.id)).unique().all()
+
+
+def _rows(ingredients: List[Ingredient]) -> List[dict]:
+    result = []
+    for ingredient, row in zip(ingredients, row_dicts(ingredients)):
+        row["category"] = ingredient.category.name if ingredient.category else None
+        row["nutrient_compositions"] = row_dicts(sorted(ingredient.nutrient_compositions, key=lambda c: c.id))
+        result.append(row)
+    return result
+
+
+def _columns(ingredients: List[Ingredient]) -> dict:
+    # One list per field; ingredients without a composition have nulls in the
+    # nutrient columns. Like GET /nutrient-compositions/{id}, the first
+    # composition row of an ingredient is the one reported.
+    compositions = [min(i.nutrient_compositions, key=lambda c: c.id, default=None) for i in ingredients]
+    return {
+        "id": [i.id for i in ingredients],
+        "name": [i.name for i in ingredients],
+        "price": [i.price for i in ingredients],
+        "category_id": [i.category_id for i in ingredients],
+        "category": [i.category.name if i.category else None for i in ingredients],
+        "nutrients": {
+            column: [getattr(c, column) if c is not None else None for c in compositions]
+            for column in COMPOSITION_COLUMNS
+        },
+    }
+
+
+# 🔹 GET ingredients with their category, current price and nutrient compositions in one call
+@router.get("/ingredients/full", response_class=ORJSONResponse)
+def get_ingredients_full(
+    ids: Optional[List[int]] = Query(None, description="Only these ingredient IDs"),
+    layout: str = Query("rows", pattern="^(rows|columns)$", description="One object per ingredient, or one list per field"),
+    session: Session = Depends(get_read_session),
+):
+    ingredients = load_ingredients(session, ids)
+    return ORJSONResponse(_columns(ingredients) if layout == "columns" else _rows(ingredients))
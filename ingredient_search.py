@@ -0,0 +1,399 @@
+"""
+Fuzzy ingredient search over names and aliases.
+
+Each name or alias is a term made of words. Words are matched by trigrams
+the way PostgreSQL's pg_trgm does it (lowercased, padded with two spaces in
+front and one behind, accents and punctuation dropped), against the
+vocabulary of distinct words rather than against every term, which keeps a
+50k-name catalog at a few thousand words. Each query word is scored against
+the vocabulary (mean of trigram Jaccard similarity and the share of the
+query word's trigrams found, so prefixes and typos both match), and the
+posting lists of its best matches give every term its best similarity for
+that word. A term's score is the same blend at the word level: how much of
+the query it covers and how close its length is. "soybean cake" therefore
+ranks "Soybean Cake Expeller" above "Soybean".
+
+The index lives in memory per process. Ingredient and alias writes made
+through this process update it in place; it is rebuilt from the database
+in the background every SEARCH_INDEX_TTL seconds so writes from other
+workers show up too.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from catalog_cache import bump_version
+from db import engine, get_read_session, get_session
+from models import Ingredient, IngredientAlias
+
+router = APIRouter()
+
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "300"))
+
+_separators = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _separators.sub(" ", text.lower()).strip()
+
+
+def trigrams(text: str) -> Set[str]:
+    grams = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _similarity(shared: np.ndarray, query_size: int, sizes: np.ndarray) -> np.ndarray:
+    """Mean of the Jaccard similarity and the share of the query covered."""
+    return (shared / (query_size + sizes - shared) + shared / query_size) / 2
+
+
+class _Postings:
+    """Growable lists of ints keyed by str or int, handed out as cached arrays."""
+
+    def __init__(self):
+        self._lists: Dict = defaultdict(list)
+        self._arrays: Dict = {}
+
+    def add(self, key, value: int):
+        self._lists[key].append(value)
+        self._arrays.pop(key, None)
+
+    def array(self, key) -> Optional[np.ndarray]:
+        array = self._arrays.get(key)
+        if array is None:
+            values = self._lists.get(key)
+            if values is None:
+                return None
+            array = self._arrays[key] = np.array(values, dtype=np.intp)
+        return array
+
+
+class _Column:
+    """Growable NumPy array indexed by term or word id."""
+
+    def __init__(self, dtype):
+        self.values = np.zeros(1024, dtype=dtype)
+
+    def set(self, index: int, value):
+        if index == len(self.values):
+            self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+        self.values[index] = value
+
+
+class TrigramIndex:
+    """In-memory search index of terms, each owned by an ingredient; safe to share between threads."""
+
+    # A query word matches at most this many vocabulary words, each at least this similar.
+    WORD_MATCHES = 8
+    WORD_MIN_SCORE = 0.35
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names: Dict[int, str] = {}
+        self._reset()
+
+    def _reset(self):
+        self._words: Dict[str, int] = {}
+        self._word_grams = _Postings()  # trigram -> words
+        self._word_sizes = _Column(np.int32)  # trigrams per word
+        self._word_terms = _Postings()  # word -> terms
+        self._term_sizes = _Column(np.int32)  # words per term
+        self._owners = _Column(np.int64)  # ingredient per term, -1 once removed
+        self._texts: List[str] = []
+        self._name_terms: Dict[int, int] = {}
+        self._alias_terms: Dict[Tuple[int, str], int] = {}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._texts) - self._dead
+
+    def _word(self, word: str) -> int:
+        word_id = self._words.get(word)
+        if word_id is None:
+            word_id = self._words[word] = len(self._words)
+            grams = trigrams(word)
+            self._word_sizes.set(word_id, len(grams))
+            for gram in grams:
+                self._word_grams.add(gram, word_id)
+        return word_id
+
+    def _add_term(self, ingredient_id: int, text: str) -> Optional[int]:
+        words = set(normalize(text).split())
+        if not words:
+            return None
+        term = len(self._texts)
+        self._texts.append(text)
+        self._term_sizes.set(term, len(words))
+        self._owners.set(term, ingredient_id)
+        for word in words:
+            self._word_terms.add(self._word(word), term)
+        return term
+
+    def _drop_term(self, term: Optional[int]):
+        if term is not None and self._owners.values[term] >= 0:
+            self._owners.values[term] = -1
+            self._dead += 1
+
+    def set_name(self, ingredient_id: int, name: str):
+        with self._lock:
+            self._drop_term(self._name_terms.pop(ingredient_id, None))
+            self._names[ingredient_id] = name
+            term = self._add_term(ingredient_id, name)
+            if term is not None:
+                self._name_terms[ingredient_id] = term
+            self._maybe_compact()
+
+    def add_alias(self, ingredient_id: int, alias: str):
+        with self._lock:
+            if (ingredient_id, alias) not in self._alias_terms:
+                term = self._add_term(ingredient_id, alias)
+                if term is not None:
+                    self._alias_terms[(ingredient_id, alias)] = term
+
+    def remove_alias(self, ingredient_id: int, alias: str):
+        with self._lock:
+            self._drop_term(self._alias_terms.pop((ingredient_id, alias), None))
+            self._maybe_compact()
+
+    def remove_ingredient(self, ingredient_id: int):
+        """Tombstone the ingredient's name and aliases."""
+        with self._lock:
+            self._names.pop(ingredient_id, None)
+            self._drop_term(self._name_terms.pop(ingredient_id, None))
+            for key in [key for key in self._alias_terms if key[0] == ingredient_id]:
+                self._drop_term(self._alias_terms.pop(key))
+            self._maybe_compact()
+
+    def _maybe_compact(self):
+        # Removed terms stay in the posting lists until they outnumber live ones.
+        if self._dead < 1000 or self._dead < len(self._texts) // 2:
+            return
+        aliases = list(self._alias_terms)
+        self._reset()
+        for ingredient_id, name in self._names.items():
+            term = self._add_term(ingredient_id, name)
+            if term is not None:
+                self._name_terms[ingredient_id] = term
+        for ingredient_id, alias in aliases:
+            term = self._add_term(ingredient_id, alias)
+            if term is not None:
+                self._alias_terms[(ingredient_id, alias)] = term
+
+    def _similar_words(self, word: str) -> List[Tuple[int, float]]:
+        grams = trigrams(word)
+        arrays = [a for a in (self._word_grams.array(g) for g in grams) if a is not None]
+        if not arrays:
+            return []
+        shared = np.bincount(np.concatenate(arrays), minlength=len(self._words))
+        words = np.flatnonzero(shared)
+        score = _similarity(shared[words], len(grams), self._word_sizes.values[words])
+        keep = score >= self.WORD_MIN_SCORE
+        words, score = words[keep], score[keep]
+        if len(words) > self.WORD_MATCHES:
+            top = np.argpartition(-score, self.WORD_MATCHES)[:self.WORD_MATCHES]
+            words, score = words[top], score[top]
+        return list(zip(words.tolist(), score.tolist()))
+
+    def search(self, query: str, limit: int = 10, min_score: float = 0.3) -> List[dict]:
+        """Best-scoring ingredients for `query`, one entry each, best first."""
+        query_words = list(dict.fromkeys(normalize(query).split()))
+        if not query_words:
+            return []
+        with self._lock:
+            count = len(self._texts)
+            covered = np.zeros(count, dtype=np.float32)  # sum over query words of the best match in each term
+            for word in query_words:
+                similar = self._similar_words(word)
+                if len(similar) == 1:
+                    word_id, score = similar[0]
+                    covered[self._word_terms.array(word_id)] += score
+                elif similar:
+                    # A term may hold several of the similar words; it counts its best one.
+                    match = np.zeros(count, dtype=np.float32)
+                    for word_id, score in similar:
+                        terms = self._word_terms.array(word_id)
+                        match[terms] = np.maximum(match[terms], score)
+                    covered += match
+
+            # A term's score is at most its coverage of the query, so weaker terms are skipped early.
+            terms = np.flatnonzero(covered >= min_score * len(query_words) - 1e-6)
+            if not len(terms):
+                return []
+            owners = self._owners.values[terms]
+            score = _similarity(covered[terms].astype(np.float64), len(query_words), self._term_sizes.values[terms])
+            keep = (owners >= 0) & (score >= min_score) & (score > 0)
+            terms, owners, score = terms[keep], owners[keep], score[keep]
+            if len(terms) > 4 * limit:
+                # Enough candidates for `limit` distinct ingredients unless most share one owner.
+                top = np.argpartition(-score, 4 * limit)[:4 * limit]
+                terms, owners, score = terms[top], owners[top], score[top]
+            order = np.lexsort((terms, -score))
+            matches, seen = [], set()
+            for k in order:
+                owner = int(owners[k])
+                if owner in seen:
+                    continue
+                seen.add(owner)
+                matches.append({
+                    "id": owner,
+                    "name": self._names.get(owner),
+                    "matched": self._texts[terms[k]],
+                    "score": round(float(score[k]), 4),
+                })
+                if len(matches) == limit:
+                    break
+            return matches
+
+
+def build_index(names: List[Tuple[int, str]], aliases: List[Tuple[int, str]]) -> TrigramIndex:
+    index = TrigramIndex()
+    for ingredient_id, name in names:
+        index.set_name(ingredient_id, name)
+    for ingredient_id, alias in aliases:
+        index.add_alias(ingredient_id, alias)
+    return index
+
+
+class IngredientSearch:
+    """
+    The process's index: built on first use, rebuilt in the background once
+    older than SEARCH_INDEX_TTL. Updates that arrive during a rebuild are
+    replayed on the new index before it replaces the old one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._index: Optional[TrigramIndex] = None
+        self._built_at = 0.0
+        self._rebuilding = False
+        self._pending: List[Callable[[TrigramIndex], None]] = []
+
+    def _load(self) -> TrigramIndex:
+        with Session(engine) as session:
+            names = session.exec(select(Ingredient.id, Ingredient.name)).all()
+            aliases = session.exec(select(IngredientAlias.ingredient_id, IngredientAlias.alias)).all()
+        return build_index(names, aliases)
+
+    def _rebuild(self):
+        try:
+            index = self._load()
+        except Exception:
+            with self._lock:
+                self._rebuilding, self._pending = False, []
+            raise
+        with self._lock:
+            for update in self._pending:
+                update(index)
+            self._index, self._built_at = index, time.monotonic()
+            self._rebuilding, self._pending = False, []
+
+    def index(self) -> TrigramIndex:
+        index = self._index
+        if index is None:
+            with self._build_lock:
+                if self._index is None:
+                    with self._lock:
+                        self._rebuilding = True
+                    self._rebuild()
+            return self._index
+        if time.monotonic() - self._built_at > SEARCH_INDEX_TTL:
+            with self._lock:
+                start, self._rebuilding = not self._rebuilding, True
+            if start:
+                threading.Thread(target=self._rebuild, name="ingredient-search", daemon=True).start()
+        return index
+
+    def _apply(self, update: Callable[[TrigramIndex], None]):
+        with self._lock:
+            if self._index is not None:
+                update(self._index)
+            if self._rebuilding:
+                self._pending.append(update)
+
+    def ingredient_saved(self, ingredient_id: int, name: str):
+        """Call after an ingredient is created or renamed and committed."""
+        self._apply(lambda index: index.set_name(ingredient_id, name))
+
+    def ingredient_removed(self, ingredient_id: int):
+        """Call after an ingredient is deleted and committed."""
+        self._apply(lambda index: index.remove_ingredient(ingredient_id))
+
+    def alias_added(self, ingredient_id: int, alias: str):
+        self._apply(lambda index: index.add_alias(ingredient_id, alias))
+
+    def alias_removed(self, ingredient_id: int, alias: str):
+        self._apply(lambda index: index.remove_alias(ingredient_id, alias))
+
+
+search = IngredientSearch()
+
+
+class AliasCreate(BaseModel):
+    alias: str
+
+
+# 🔹 Fuzzy search of ingredient names and aliases
+@router.get("/ingredients/search")
+def search_ingredients(
+    q: str = Query(..., min_length=1, description="Name or part of a name, typos allowed"),
+    limit: int = Query(10, ge=1, le=100),
+    min_score: float = Query(0.3, ge=0, le=1),
+):
+    return {"query": q, "matches": search.index().search(q, limit, min_score)}
+
+
+# 🔹 GET the aliases of an ingredient
+@router.get("/ingredients/{ingredient_id}/aliases", response_model=List[IngredientAlias])
+def get_ingredient_aliases(ingredient_id: int, session: Session = Depends(get_read_session)):
+    return session.exec(select(IngredientAlias).where(IngredientAlias.ingredient_id == ingredient_id)).all()
+
+
+# 🔹 ADD an alias (local or trade name) to an ingredient
+@router.post("/ingredients/{ingredient_id}/aliases", response_model=IngredientAlias)
+def create_ingredient_alias(ingredient_id: int, body: AliasCreate, session: Session = Depends(get_session)):
+    alias = body.alias.strip()
+    if not alias:
+        raise HTTPException(status_code=400, detail="Alias cannot be empty")
+    if session.get(Ingredient, ingredient_id) is None:
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+    row = IngredientAlias(ingredient_id=ingredient_id, alias=alias)
+    session.add(row)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail="Ingredient already has this alias")
+    bump_version(IngredientAlias)
+    search.alias_added(ingredient_id, alias)
+    session.refresh(row)
+    return row
+
+
+# 🔹 DELETE an alias
+@router.delete("/ingredient-aliases/{alias_id}")
+def delete_ingredient_alias(alias_id: int, session: Session = Depends(get_session)):
+    row = session.get(IngredientAlias, alias_id)
+    if not row:
+        raise HTTPException(status_code=404, detail="Alias not found")
+    ingredient_id, alias = row.ingredient_id, row.alias
+    session.delete(row)
+    session.commit()
+    bump_version(IngredientAlias)
+    search.alias_removed(ingredient_id, alias)
+    return {"message": "Alias deleted successfully"}
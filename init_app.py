@@ -1,5 +1,44 @@
-from db import create_db_and_tables
+# Migration step: run `python init_app.py` once per deploy, before the new app
+# version takes traffic. render.yaml does this in its start command. Vercel has
+# no such hook, so there it runs as a separate job against the production
+# DATABASE_URL (from CI or a shell) before the deploy is promoted.
+from sqlalchemy import func, update
+from sqlmodel import Session
 
-if __name__ == "__main__":
+from auth.auth import ADMIN_EMAILS, ADMIN_USER_TYPE, DEFAULT_USER_TYPE
+from catalog_snapshot import SNAPSHOT_PATH, publish
+from db import create_db_and_tables, engine, verify_schema
+from models import User
+from pricing import backfill_prices
+
+
+def grant_admins(session: Session) -> int:
+    """Make exactly the ADMIN_EMAILS accounts admins; a no-op when ADMIN_EMAILS is unset."""
+    if not ADMIN_EMAILS:
+        return 0
+    email = func.lower(User.email)
+    session.exec(
+        update(User).where(User.user_type == ADMIN_USER_TYPE, email.not_in(sorted(ADMIN_EMAILS))).values(user_type=DEFAULT_USER_TYPE)
+    )
+    granted = session.exec(update(User).where(email.in_(sorted(ADMIN_EMAILS))).values(user_type=ADMIN_USER_TYPE)).rowcount
+    session.commit()
+    return granted
+
+
+def migrate():
+    """Create missing tables, check the schema and apply the data steps; safe to repeat."""
     create_db_and_tables()
+    verify_schema()
+    with Session(engine) as session:
+        return grant_admins(session), backfill_prices(session)
+
+
+if __name__ == "__main__":
+    admins, priced = migrate()
     print("✅ Database tables created successfully!")
+    print(f"✅ {admins} admin accounts from ADMIN_EMAILS")
+    print(f"✅ Price history started for {priced} ingredients")
+    # Workers map this file at startup instead of each loading the catalog
+    with Session(engine) as session:
+        snapshot = publish(session)
+    print(f"✅ Catalog snapshot v{snapshot.version} written to {SNAPSHOT_PATH}")
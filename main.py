@@ -1,23 +1,55 @@
-from fastapi import FastAPI, Depends, APIRouter, HTTPException
+from fastapi import FastAPI, Depends, APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
-from db import create_db_and_tables, get_session
+from db import get_read_session, get_session, read_your_writes, DB_MODE, WriterBusy
+from warmup import warm_up
 from models import (
     Category, Ingredient, NutritionalRequirement,
     NutrientComposition, AdditiveRequirement
 )
 
 from auth.auth_endpoints import router as auth_router
+from pricing import record_price
+from catalog_cache import bump_version, cached_response
+from serialization import fast_rows_response
+from price_events import hub as price_events
+from formulations import recost_formulations
+from default_formulations import defaults as default_formulations
+from catalog_snapshot import load_published as load_catalog_snapshot
 
 from optimizer import optimize_feed, OptimizationResult
 from typing import List
 
 app = FastAPI()
+app.middleware("http")(read_your_writes)
+
+
+# 🔹 A write that waited too long for the SQLite writer queue
+@app.exception_handler(WriterBusy)
+def writer_busy(request: Request, exc: WriterBusy):
+    return JSONResponse(status_code=503, content={"detail": "Too many writes in progress, try again shortly"},
+                        headers={"Retry-After": "1"})
 
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 
+# Registered before GET /ingredients/{ingredient_id} so "full" and "search" are not read as IDs.
+from ingredient_catalog import router as ingredient_catalog_router
+app.include_router(ingredient_catalog_router, tags=["ingredients"])
+
+from ingredient_search import router as ingredient_search_router, search as ingredient_search
+app.include_router(ingredient_search_router, tags=["ingredients"])
+
 @app.on_event("startup")
 def on_startup():
-    create_db_and_tables()
+    # Server deployments create tables in the migration step (`python init_app.py`),
+    # not on every cold start; embedded installs migrate their local file here.
+    if DB_MODE == "embedded":
+        from init_app import migrate
+
+        migrate()
+    warm_up()
+    load_catalog_snapshot()
+    default_formulations.refresh()
 
 @app.get("/")
 def read_root():
@@ -26,7 +58,7 @@ def read_root():
 
 # 🔹 GET a single category by ID
 @app.get("/categories/{category_id}", response_model=Category)
-def get_category(category_id: int, session: Session = Depends(get_session)):
+def get_category(category_id: int, session: Session = Depends(get_read_session)):
     category = session.get(Category, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
@@ -35,7 +67,7 @@ def get_category(category_id: int, session: Session = Depends(get_session)):
 
 # 🔹 GET a single ingredient by ID
 @app.get("/ingredients/{ingredient_id}", response_model=Ingredient)
-def get_ingredient(ingredient_id: int, session: Session = Depends(get_session)):
+def get_ingredient(ingredient_id: int, session: Session = Depends(get_read_session)):
     ingredient = session.get(Ingredient, ingredient_id)
     if not ingredient:
         raise HTTPException(status_code=404, detail="Ingredient not found")
@@ -44,7 +76,7 @@ def get_ingredient(ingredient_id: int, session: Session = Depends(get_session)):
 
 # 🔹 GET a nutritional requirement by Age and Category
 @app.get("/nutritional-requirements/{category}/{age}", response_model=NutritionalRequirement)
-def get_nutritional_requirement(category: str, age: int, session: Session = Depends(get_session)):
+def get_nutritional_requirement(category: str, age: int, session: Session = Depends(get_read_session)):
     requirement = session.exec(
         select(NutritionalRequirement)
         .where(NutritionalRequirement.category == category)
@@ -59,7 +91,7 @@ def get_nutritional_requirement(category: str, age: int, session: Session = Depe
 
 # 🔹 GET nutrient composition for a specific ingredient
 @app.get("/nutrient-compositions/{ingredient_id}", response_model=NutrientComposition)
-def get_nutrient_composition(ingredient_id: int, session: Session = Depends(get_session)):
+def get_nutrient_composition(ingredient_id: int, session: Session = Depends(get_read_session)):
     composition = session.exec(
         select(NutrientComposition)
         .where(NutrientComposition.ingredient_id == ingredient_id)
@@ -73,9 +105,8 @@ def get_nutrient_composition(ingredient_id: int, session: Session = Depends(get_
 
 # 🔹 GET all categories
 @app.get("/categories/", response_model=list[Category])
-def get_categories(session: Session = Depends(get_session)):
-    with session:
-        return session.exec(select(Category)).all()
+def get_categories(request: Request):
+    return cached_response(request, Category, lambda session: session.exec(select(Category)).all())
 
 # 🔹 CREATE a new category
 @app.post("/categories/", response_model=Category)
@@ -83,23 +114,28 @@ def create_category(category: Category, session: Session = Depends(get_session))
     with session:
         session.add(category)
         session.commit()
+        bump_version(Category)
         session.refresh(category)
         return category
 
 
 # 🔹 GET all ingredients
 @app.get("/ingredients/", response_model=list[Ingredient])
-def get_ingredients(session: Session = Depends(get_session)):
-    with session:
-        return session.exec(select(Ingredient)).all()
+def get_ingredients(request: Request):
+    return cached_response(request, Ingredient, lambda session: session.exec(select(Ingredient)).all())
 
 # 🔹 CREATE a new ingredient
 @app.post("/ingredients/", response_model=Ingredient)
 def create_ingredient(ingredient: Ingredient, session: Session = Depends(get_session)):
     with session:
         session.add(ingredient)
+        if ingredient.price is not None:
+            session.flush()
+            record_price(session, ingredient.id, ingredient.price)
         session.commit()
+        bump_version(Ingredient)
         session.refresh(ingredient)
+        ingredient_search.ingredient_saved(ingredient.id, ingredient.name)
         return ingredient
 
 
@@ -113,19 +149,28 @@ def update_ingredient(ingredient_id: int, updated_data: Ingredient, session: Ses
 
         # Update fields
         ingredient.name = updated_data.name
-        ingredient.categoryId = updated_data.categoryId
+        ingredient.category_id = updated_data.category_id
+        price_changed = updated_data.price is not None and updated_data.price != ingredient.price
+        if price_changed:
+            record_price(session, ingredient.id, updated_data.price)
+            recost_formulations(session, ingredient.id, ingredient.price, updated_data.price)
         ingredient.price = updated_data.price  # Allow updating price
 
         session.commit()
+        bump_version(Ingredient)
+        if price_changed:
+            price_events.publish_price_change(ingredient_id, updated_data.price)
         session.refresh(ingredient)
+        ingredient_search.ingredient_saved(ingredient.id, ingredient.name)
         return ingredient
 
 
 # 🔹 GET all nutritional requirements
 @app.get("/nutritional-requirements/", response_model=list[NutritionalRequirement])
-def get_nutritional_requirements(session: Session = Depends(get_session)):
-    with session:
-        return session.exec(select(NutritionalRequirement)).all()
+def get_nutritional_requirements(request: Request):
+    return cached_response(
+        request, NutritionalRequirement, lambda session: session.exec(select(NutritionalRequirement)).all()
+    )
 
 # 🔹 CREATE a new nutritional requirement
 @app.post("/nutritional-requirements/", response_model=NutritionalRequirement)
@@ -135,14 +180,15 @@ def create_nutritional_requirement(
     with session:
         session.add(nutritional_requirement)
         session.commit()
+        bump_version(NutritionalRequirement)
         session.refresh(nutritional_requirement)
         return nutritional_requirement
 
 # 🔹 GET all nutrient compositions
 @app.get("/nutrient-compositions/", response_model=list[NutrientComposition])
-def get_nutrient_compositions(session: Session = Depends(get_session)):
+def get_nutrient_compositions(session: Session = Depends(get_read_session)):
     with session:
-        return session.exec(select(NutrientComposition)).all()
+        return fast_rows_response(session.exec(select(NutrientComposition)).all())
 
 # 🔹 CREATE a new nutrient composition
 @app.post("/nutrient-compositions/", response_model=NutrientComposition)
@@ -152,14 +198,15 @@ def create_nutrient_composition(
     with session:
         session.add(nutrient_composition)
         session.commit()
+        bump_version(NutrientComposition)
         session.refresh(nutrient_composition)
         return nutrient_composition
 
 # 🔹 GET all additive requirements
 @app.get("/additive-requirements/", response_model=list[AdditiveRequirement])
-def get_additive_requirements(session: Session = Depends(get_session)):
+def get_additive_requirements(session: Session = Depends(get_read_session)):
     with session:
-        return session.exec(select(AdditiveRequirement)).all()
+        return fast_rows_response(session.exec(select(AdditiveRequirement)).all())
 
 # 🔹 CREATE a new additive requirement
 @app.post("/additive-requirements/", response_model=AdditiveRequirement)
@@ -173,175 +220,52 @@ def create_additive_requirement(
         return additive_requirement
         
 
-# Optimizer
-from typing import Dict
-from fastapi import FastAPI, HTTPException, Query
-from pydantic import BaseModel
-import pulp
-from sqlmodel import Session, select
-from models import NutritionalRequirement
-from db import engine
-
-class OptimizationResult(BaseModel):
-    status: str
-    composition: Dict[str, float]
-    total_cost: float
-    nutrient_values: Dict[str, float]
-
-@app.get("/optimizer/", response_model=OptimizationResult)
-def optimize_feed(category: str = Query(..., description="Category of chicken (Layers or Broilers)"),
-                  age: int = Query(..., description="Age of the chicken in weeks")):
-    # Fetch nutritional requirements from the database
-    with Session(engine) as session:
-        statement = select(NutritionalRequirement).where(
-            (NutritionalRequirement.category == category) & (NutritionalRequirement.age == age)
-        )
-        requirement = session.exec(statement).first()
-
-        if not requirement:
-            raise HTTPException(status_code=404, detail="No nutritional requirements found for the given parameters.")
-
-        # Create requirements dictionary
-        requirements = {k: v for k, v in requirement.dict().items() if v is not None and k not in ['id', 'feed_type', 'category', 'age', 'created_at', 'updated_at']}
-
-    # Create the model
-    model = pulp.LpProblem("Feed_Optimization", pulp.LpMinimize)
-
-    # Define ingredients and their costs
-    ingredients = {
-        'Maize_bran': 300,
-        'White_maize': 1200,
-        'Wheat_bran': 300,
-        'Rice_Bran': 300,
-        'Millet': 300,
-        'Sorghum': 300,
-        'Soya_full_fat': 1500,
-        'Soy_cake': 300,
-        'Sunflower': 300,
-        'Sunflower_Cake': 450,
-        'Fish_meal': 300,
-        'BSF': 300,
-        'Premix': 1500,
-        'Toxicin': 2000,
-        'Lysine': 4500,
-        'Methionine': 3000,
-        'Threonine': 2500,
-        'Salt': 800,
-        'Tyrosine': 4500,
-        'MCP': 4500,
-        'Lime': 200
-    }
-
-    # Create variables for each ingredient
-    x = pulp.LpVariable.dicts("ingr", ingredients.keys(), lowBound=0, upBound=1)
-
-    # Objective function: Minimize cost
-    model += pulp.lpSum([x[i] * cost for i, cost in ingredients.items()])
-
-    # Nutrient composition data (per kg)
-    nutrient_composition = {
-        'ME': {
-            'Maize_bran': 8.8, 'White_maize': 14.8, 'Wheat_bran': 7.4, 
-            'Rice_Bran': 10.6, 'Millet': 13.3, 'Sorghum': 16.0,
-            'Soya_full_fat': 15.7, 'Soy_cake': 12.8, 'Sunflower': 19.7,
-            'Sunflower_Cake': 10.8, 'Fish_meal': 12.0, 'BSF': 12.0
-        },
-        'CP': {
-            'Maize_bran': 11.9, 'White_maize': 8.0, 'Wheat_bran': 17.3,
-            'Rice_Bran': 12.7, 'Millet': 12.5, 'Sorghum': 10.8,
-            'Soya_full_fat': 39.5, 'Soy_cake': 47.0, 'Sunflower': 16.0,
-            'Sunflower_Cake': 27.9, 'Fish_meal': 48.4, 'BSF': 42.1
-        },
-        'Ca': {
-            'Maize_bran': 0.47, 'White_maize': 0.04, 'Wheat_bran': 0.14,
-            'Rice_Bran': 0.07, 'Millet': 0.05, 'Sorghum': 0.03,
-            'Soya_full_fat': 0.34, 'Soy_cake': 0.37, 'Sunflower': 0.27,
-            'Sunflower_Cake': 0.39, 'Fish_meal': 7.93, 'BSF': 7.56
-        },
-        'P': {
-            'Maize_bran': 0.34, 'White_maize': 0.29, 'Wheat_bran': 1.11,
-            'Rice_Bran': 1.38, 'Millet': 0.33, 'Sorghum': 0.33,
-            'Soya_full_fat': 0.59, 'Soy_cake': 0.69, 'Sunflower': 0.57,
-            'Sunflower_Cake': 0.92, 'Fish_meal': 3.98, 'BSF': 0.90
-        },
-        'Na': {
-            'Maize_bran': 0.08, 'White_maize': 0.05, 'Wheat_bran': 0.01,
-            'Rice_Bran': 0.02, 'Millet': 0.009, 'Sorghum': 0.02,
-            'Soya_full_fat': 0.0, 'Soy_cake': 0.011, 'Sunflower': 0.007,
-            'Sunflower_Cake': 0.01, 'Fish_meal': 2.84, 'BSF': 0.13
-        }
-    }
-
-    # Add nutrient constraints
-    for nutrient, min_value in requirements.items():
-        if nutrient in nutrient_composition:  # Ensure nutrient is supported
-            nutrient_sum = pulp.lpSum([x[i] * nutrient_composition[nutrient].get(i, 0) for i in ingredients.keys()])
-            model += nutrient_sum >= min_value
-        else:
-            print(f"Skipping unsupported nutrient: {nutrient}")
-
-    # Constraint: sum of ingredients = 100%
-    model += pulp.lpSum([x[i] for i in ingredients.keys()]) == 1
-
-    # Maximum inclusion rates
-    model += x['Maize_bran'] <= 0.05  # Max 5%
-    model += x['Fish_meal'] <= 0.05   # Max 5%
-
-    # Fixed inclusion rates for additives
-    additives = {
-        'Premix': 0.0025,
-        'Toxicin': 0.001,
-        'Lysine': 0.001,
-        'Methionine': 0.001,
-        'Threonine': 0.001,
-        'Salt': 0.0025,
-        'Tyrosine': 0.001,
-        'MCP': 0.005,
-        'Lime': 0.025
-    }
-
-    for additive, rate in additives.items():
-        model += x[additive] == rate
-
-    # Solve the model
-    status = model.solve()
-
-    # Check if solution is optimal
-    if pulp.LpStatus[status] != 'Optimal':
-        raise HTTPException(status_code=400, detail="Could not find optimal solution")
-
-    # Prepare results
-    composition = {}
-    total_cost = 0
-    
-    # Collect results directly from the solved variables
-    for ingredient in ingredients.keys():
-        value = x[ingredient].value()
-        if value is not None and value > 0.0001:
-            composition[ingredient.replace('_', ' ')] = round(value * 100, 2)
-            total_cost += value * ingredients[ingredient]
-
-    # Calculate actual nutrient values
-    nutrient_values = {}
-    for nutrient in requirements.keys():
-        if nutrient in nutrient_composition:  # Ensure nutrient is supported
-            value = sum(x[i].value() * nutrient_composition[nutrient].get(i, 0)
-                       for i in ingredients.keys()
-                       if x[i].value() is not None)
-            nutrient_values[nutrient] = round(value, 2)
-
-    # Verify solution
-    total_percentage = sum(composition.values())
-    if not (99.9 <= total_percentage <= 100.1):  # Allow for small numerical errors
-        raise HTTPException(status_code=400, detail=f"Invalid solution: total percentage is {total_percentage}%")
-
-    return OptimizationResult(
-        status=pulp.LpStatus[status],
-        composition=composition,
-        total_cost=round(total_cost, 2),
-        nutrient_values=nutrient_values
-    )
+from optimization.or_optimizer import router as optimizer_router
+app.include_router(optimizer_router, tags=["optimizer"])
 
+from pricing import router as pricing_router
+app.include_router(pricing_router, tags=["pricing"])
 
-from optimization.or_optimizer import router as optimizer_router
-app.include_router(optimizer_router, tags=["optimizer"])
\ No newline at end of file
+from price_events import router as price_events_router
+app.include_router(price_events_router, tags=["events"])
+
+from formulations import router as formulations_router
+app.include_router(formulations_router, tags=["formulations"])
+
+from default_formulations import router as default_formulations_router
+app.include_router(default_formulations_router, tags=["optimizer"])
+
+from single_flight import router as single_flight_router
+app.include_router(single_flight_router, tags=["metrics"])
+
+from nutrients import router as nutrients_router
+app.include_router(nutrients_router, tags=["nutrients"])
+
+from evaluate import router as evaluate_router
+app.include_router(evaluate_router, tags=["evaluate"])
+
+from batch_optimizer import router as batch_optimizer_router, shutdown as shutdown_batch_pool
+app.include_router(batch_optimizer_router, tags=["optimizer"])
+
+from robust import router as robust_router
+app.include_router(robust_router, tags=["optimizer"])
+
+from frontier import router as frontier_router
+app.include_router(frontier_router, tags=["optimizer"])
+
+from run_log import router as run_log_router, runs as optimization_runs
+app.include_router(run_log_router, tags=["metrics"])
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_batch_pool()
+    optimization_runs.close()  # write the buffered runs before the process exits
+
+from query_budget import install as install_query_budget
+install_query_budget(app)
+
+from profiling import router as profiling_router, install as install_profiling
+app.include_router(profiling_router, tags=["profiling"])
+
+# Last: wraps every endpoint registered above
+install_profiling(app)
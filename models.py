@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import JSON, Column, Index, UniqueConstraint
 from typing import Optional, List
 from datetime import datetime
 
@@ -28,6 +29,32 @@ class Ingredient(SQLModel, table=True):
     category: Optional[Category] = Relationship(back_populates="ingredients")
     nutrient_compositions: List["NutrientComposition"] = Relationship(back_populates="ingredient")
     additive_requirements: List["AdditiveRequirement"] = Relationship(back_populates="ingredient")
+    costs: List["IngredientCost"] = Relationship(back_populates="ingredient")
+    aliases: List["IngredientAlias"] = Relationship(back_populates="ingredient")
+
+
+class IngredientAlias(SQLModel, table=True):
+    # Other names an ingredient is known by (local names, trade names), for search.
+    __table_args__ = (UniqueConstraint("ingredient_id", "alias"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id", index=True)
+    alias: str
+
+    ingredient: Optional[Ingredient] = Relationship(back_populates="aliases")
+
+
+class IngredientCost(SQLModel, table=True):
+    # Price history: one row per price change. The composite index serves
+    # "latest price on or before date D" lookups per ingredient.
+    __table_args__ = (Index("ix_ingredientcost_ingredient_id_date", "ingredient_id", "date"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id")
+    cost: float
+    date: datetime = Field(default_factory=datetime.utcnow)
+
+    ingredient: Optional[Ingredient] = Relationship(back_populates="costs")
 
 
 class NutritionalRequirement(SQLModel, table=True):
@@ -76,6 +103,48 @@ class NutrientComposition(SQLModel, table=True):
     ingredient: Optional[Ingredient] = Relationship(back_populates="nutrient_compositions")
 
 
+class NutrientValue(SQLModel, table=True):
+    # Sparse nutrient store for everything beyond the fixed NutrientComposition
+    # columns (amino acids, vitamins, trace minerals): one row per nonzero value.
+    __table_args__ = (UniqueConstraint("ingredient_id", "nutrient"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id", index=True)
+    nutrient: str = Field(index=True)
+    value: float  # per kg, in the nutrient's usual unit
+
+
+class NutrientDeviation(SQLModel, table=True):
+    # Batch-to-batch standard deviation of an ingredient's nutrient level, for
+    # the chance-constrained optimizer; no row means the level is taken as exact.
+    __table_args__ = (UniqueConstraint("ingredient_id", "nutrient"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id", index=True)
+    nutrient: str = Field(index=True)
+    sd: float  # same unit as the nutrient's value
+
+
+class NutrientBound(SQLModel, table=True):
+    # Extra min/max constraints of a requirement row; for a fixed column
+    # (ME, CP, ...) the minimum overrides the requirement's own value.
+    id: Optional[int] = Field(default=None, primary_key=True)
+    requirement_id: int = Field(foreign_key="nutritionalrequirement.id", index=True)
+    nutrient: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+
+class NutrientRatio(SQLModel, table=True):
+    # minimum <= numerator / denominator <= maximum in the mix, e.g. Ca:P
+    id: Optional[int] = Field(default=None, primary_key=True)
+    requirement_id: int = Field(foreign_key="nutritionalrequirement.id", index=True)
+    numerator: str
+    denominator: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+
+
 class AdditiveRequirement(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     ingredient_id: int = Field(foreign_key="ingredient.id")
@@ -85,3 +154,53 @@ class AdditiveRequirement(SQLModel, table=True):
     updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
 
     ingredient: Optional[Ingredient] = Relationship(back_populates="additive_requirements")
+
+
+class Formulation(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: Optional[str] = None
+    category: str
+    age: int
+    amount: Optional[float] = None  # kg of feed to mix
+    # Materialized from the composition and current prices; kept current by
+    # formulations.recost_formulations when a price changes.
+    cost_per_kg: float
+    # Set when a price left the range over which the stored mix was proven optimal.
+    possibly_suboptimal: bool = False
+    created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
+
+    ingredients: List["FormulationIngredient"] = Relationship(back_populates="formulation")
+
+
+class FormulationIngredient(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    formulation_id: int = Field(foreign_key="formulation.id", index=True)
+    ingredient_id: int = Field(foreign_key="ingredient.id", index=True)
+    fraction: float  # share of the mix, 0 for inputs the solver left out
+    # The mix stays optimal while this ingredient's price is within [price_low, price_high]; None is unbounded.
+    price_low: Optional[float] = None
+    price_high: Optional[float] = None
+
+    formulation: Optional[Formulation] = Relationship(back_populates="ingredients")
+
+
+class OptimizationRun(SQLModel, table=True):
+    # Append-only audit log of optimizer calls, written in batches by run_log.
+    __tablename__ = "optimization_run"
+    __table_args__ = (Index("ix_optimization_run_route_backend_created_at", "route", "backend", "created_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    route: str
+    backend: str  # solver that produced the result, e.g. "highs", "dense", "cbc", "precomputed"
+    status: str  # solver status, or "HTTP <code>" for failed requests
+    category: Optional[str] = None
+    age: Optional[int] = None
+    inputs: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    cost_per_kg: Optional[float] = None
+    solve_ms: Optional[float] = None  # None when the result was shared with a concurrent identical request
+    total_ms: float
+    user_id: Optional[int] = None
+    user_email: Optional[str] = None
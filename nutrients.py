@@ -0,0 +1,150 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import delete, tuple_
+from sqlmodel import Session, select
+
+from catalog_cache import bump_version
+from db import get_read_session, get_session
+from models import NutrientBound, NutrientDeviation, NutrientRatio, NutrientValue, NutritionalRequirement
+from serialization import fast_rows_response
+
+router = APIRouter()
+
+
+def _check_requirement(session: Session, requirement_id: int):
+    if session.get(NutritionalRequirement, requirement_id) is None:
+        raise HTTPException(status_code=404, detail="Nutritional requirement not found")
+
+
+# 🔹 GET sparse nutrient values, optionally for one ingredient or nutrient
+@router.get("/nutrient-values/", response_model=List[NutrientValue])
+def get_nutrient_values(
+    ingredient_id: Optional[int] = None,
+    nutrient: Optional[str] = None,
+    session: Session = Depends(get_read_session),
+):
+    statement = select(NutrientValue)
+    if ingredient_id is not None:
+        statement = statement.where(NutrientValue.ingredient_id == ingredient_id)
+    if nutrient is not None:
+        statement = statement.where(NutrientValue.nutrient == nutrient)
+    return fast_rows_response(session.exec(statement.order_by(NutrientValue.id)).all())
+
+
+# 🔹 UPSERT sparse nutrient values in bulk; a value of 0 removes the entry
+@router.post("/nutrient-values/")
+def upsert_nutrient_values(values: List[NutrientValue], session: Session = Depends(get_session)):
+    latest = {(v.ingredient_id, v.nutrient): v.value for v in values}
+    if latest:
+        session.exec(
+            delete(NutrientValue).where(tuple_(NutrientValue.ingredient_id, NutrientValue.nutrient).in_(list(latest)))
+        )
+    session.add_all([
+        NutrientValue(ingredient_id=ingredient_id, nutrient=nutrient, value=value)
+        for (ingredient_id, nutrient), value in latest.items() if value != 0
+    ])
+    session.commit()
+    bump_version(NutrientValue)
+    stored = sum(1 for value in latest.values() if value != 0)
+    return {"stored": stored, "removed": len(latest) - stored}
+
+
+# 🔹 GET composition standard deviations, optionally for one ingredient or nutrient
+@router.get("/nutrient-deviations/", response_model=List[NutrientDeviation])
+def get_nutrient_deviations(
+    ingredient_id: Optional[int] = None,
+    nutrient: Optional[str] = None,
+    session: Session = Depends(get_read_session),
+):
+    statement = select(NutrientDeviation)
+    if ingredient_id is not None:
+        statement = statement.where(NutrientDeviation.ingredient_id == ingredient_id)
+    if nutrient is not None:
+        statement = statement.where(NutrientDeviation.nutrient == nutrient)
+    return fast_rows_response(session.exec(statement.order_by(NutrientDeviation.id)).all())
+
+
+# 🔹 UPSERT composition standard deviations in bulk; an sd of 0 removes the entry
+@router.post("/nutrient-deviations/")
+def upsert_nutrient_deviations(deviations: List[NutrientDeviation], session: Session = Depends(get_session)):
+    latest = {(d.ingredient_id, d.nutrient): d.sd for d in deviations}
+    if any(sd < 0 for sd in latest.values()):
+        raise HTTPException(status_code=400, detail="Standard deviations cannot be negative")
+    if latest:
+        session.exec(
+            delete(NutrientDeviation)
+            .where(tuple_(NutrientDeviation.ingredient_id, NutrientDeviation.nutrient).in_(list(latest)))
+        )
+    session.add_all([
+        NutrientDeviation(ingredient_id=ingredient_id, nutrient=nutrient, sd=sd)
+        for (ingredient_id, nutrient), sd in latest.items() if sd != 0
+    ])
+    session.commit()
+    bump_version(NutrientDeviation)
+    stored = sum(1 for sd in latest.values() if sd != 0)
+    return {"stored": stored, "removed": len(latest) - stored}
+
+
+# 🔹 GET the extra min/max bounds of a requirement row
+@router.get("/nutrient-bounds/", response_model=List[NutrientBound])
+def get_nutrient_bounds(requirement_id: int = Query(...), session: Session = Depends(get_read_session)):
+    return session.exec(select(NutrientBound).where(NutrientBound.requirement_id == requirement_id)).all()
+
+
+# 🔹 CREATE a min/max bound on a nutrient
+@router.post("/nutrient-bounds/", response_model=NutrientBound)
+def create_nutrient_bound(bound: NutrientBound, session: Session = Depends(get_session)):
+    _check_requirement(session, bound.requirement_id)
+    if bound.minimum is None and bound.maximum is None:
+        raise HTTPException(status_code=400, detail="A bound needs a minimum, a maximum or both")
+    session.add(bound)
+    session.commit()
+    bump_version(NutrientBound)
+    session.refresh(bound)
+    return bound
+
+
+# 🔹 DELETE a nutrient bound
+@router.delete("/nutrient-bounds/{bound_id}")
+def delete_nutrient_bound(bound_id: int, session: Session = Depends(get_session)):
+    bound = session.get(NutrientBound, bound_id)
+    if not bound:
+        raise HTTPException(status_code=404, detail="Nutrient bound not found")
+    session.delete(bound)
+    session.commit()
+    bump_version(NutrientBound)
+    return {"message": "Nutrient bound deleted successfully"}
+
+
+# 🔹 GET the ratio constraints of a requirement row
+@router.get("/nutrient-ratios/", response_model=List[NutrientRatio])
+def get_nutrient_ratios(requirement_id: int = Query(...), session: Session = Depends(get_read_session)):
+    return session.exec(select(NutrientRatio).where(NutrientRatio.requirement_id == requirement_id)).all()
+
+
+# 🔹 CREATE a ratio constraint, e.g. 1.5 <= Ca / P <= 2.5
+@router.post("/nutrient-ratios/", response_model=NutrientRatio)
+def create_nutrient_ratio(ratio: NutrientRatio, session: Session = Depends(get_session)):
+    _check_requirement(session, ratio.requirement_id)
+    if ratio.minimum is None and ratio.maximum is None:
+        raise HTTPException(status_code=400, detail="A ratio needs a minimum, a maximum or both")
+    if ratio.numerator == ratio.denominator:
+        raise HTTPException(status_code=400, detail="Numerator and denominator must differ")
+    session.add(ratio)
+    session.commit()
+    bump_version(NutrientRatio)
+    session.refresh(ratio)
+    return ratio
+
+
+# 🔹 DELETE a ratio constraint
+@router.delete("/nutrient-ratios/{ratio_id}")
+def delete_nutrient_ratio(ratio_id: int, session: Session = Depends(get_session)):
+    ratio = session.get(NutrientRatio, ratio_id)
+    if not ratio:
+        raise HTTPException(status_code=404, detail="Nutrient ratio not found")
+    session.delete(ratio)
+    session.commit()
+    bump_version(NutrientRatio)
+    return {"message": "Nutrient ratio deleted successfully"}
@@ -1,12 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-import scipy.optimize as opt
+from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi.responses import ORJSONResponse
 import numpy as np
 from sqlmodel import Session, select
-from db import get_session
+from catalog_cache import table_version
+from db import get_read_session
 from models import NutritionalRequirement
+from run_log import logged_run
+from single_flight import group
 
 router = APIRouter()
 
+feed_solves = group("optimize-feed")
+
+nutrient_names = ["DM", "ME", "CP", "Ca", "P", "Mg", "Na", "K"]
+
 ingredient_names = [
     "Maize Bran", "White Maize", "Wheat Bran", "Rice Bran", "Millet", 
     "Sorghum", "Soya Full Fat", "Soy Cake", "Sunflower", 
@@ -33,13 +40,28 @@ nutrient_matrix = data[:, 1:].T
 
 def objective(x):
     return np.dot(prices, x)
-@router.get("/optimize-feed")
+@router.get("/optimize-feed", response_class=ORJSONResponse)
 def optimize_feed(
+    request: Request,
     category: str = Query(..., description="Category of chicken (Layers or Broilers)"),
     age: int = Query(..., description="Age of the chicken in weeks"),
     ingredient_ids: list[int] = Query(..., description="List of ingredient IDs to use in the optimization process"),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
+    # Requests for the same ingredient set, in any order, arriving while this one
+    # solves share its result; the set is solved in ID order so the result fits all of them.
+    ids = sorted(set(ingredient_ids))
+    key = (category, age, tuple(ids), table_version(NutritionalRequirement))
+    with logged_run(request, "/optimize-feed", "slsqp", category, age, ingredient_ids=ingredient_ids) as run:
+        result = feed_solves.do(key, lambda: run.timed(_optimize, session, category, age, ids))
+        if result["success"]:
+            run.result = {"feed": result["feed"], "total_cost_mwk": result["total_cost_mwk"]}
+        else:
+            run.status = "Failed"
+    return ORJSONResponse(result)
+
+
+def _optimize(session: Session, category: str, age: int, ingredient_ids: list[int]) -> dict:
     nutrient_query = session.exec(
         select(NutritionalRequirement).where(
             NutritionalRequirement.category == category,
@@ -95,6 +117,8 @@ def optimize_feed(
     initial_guess = np.random.rand(len(selected_data))
     initial_guess = initial_guess / np.sum(initial_guess) * 100
 
+    import scipy.optimize as opt  # imported on first solve to keep cold starts fast
+
     result = opt.minimize(objective, initial_guess, bounds=bounds, constraints=constraints, method="SLSQP")
 
     if result.success:
@@ -109,10 +133,13 @@ def optimize_feed(
         total_cost = round(result.fun, 2)
         final_nutrients = np.dot(selected_nutrient_matrix, result.x)
 
+        # Arrays go to orjson as-is; ORJSONResponse serializes them natively.
         return {
             "success": True,
             "feed": feed_result,
             "total_cost_mwk": total_cost,
+            "nutrients": nutrient_names,
+            "nutrient_values": final_nutrients.round(2),
         }
     else:
         return {"success": False, "message": "Optimization failed."}
\ No newline at end of file
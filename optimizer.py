@@ -1,9 +1,35 @@
-from typing import Dict, List, Optional
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from fastapi import HTTPException
 from pydantic import BaseModel
 from sqlmodel import Session, select
-from models import NutritionalRequirement, NutrientComposition, Ingredient
-import pulp
+from models import (
+    NutritionalRequirement, NutrientComposition, Ingredient, NutrientValue, NutrientBound, NutrientRatio
+)
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy.sparse import csr_matrix
+
+NUTRIENTS = ['ME', 'CP', 'Ca', 'P', 'Mg', 'Na', 'K']
+
+# Nutrients stored as NutrientComposition columns; all others live in NutrientValue
+COMPOSITION_COLUMNS = ['DM', 'ME', 'CP', 'Ca', 'P', 'Mg', 'Na', 'K']
+
+# Define fixed values for additives (as per LP guide.docx)
+ADDITIVE_REQUIREMENTS = {
+    "Premix": 0.25,  # 0.25%
+    "Toxicin": 0.10,  # 0.10%
+    "Lysine": 0.10,   # 0.10%
+    "Methionine": 0.10,  # 0.10%
+    "Threonine": 0.10,  # 0.10%
+    "Salt": 0.25,    # 0.25%
+    "Tyrosine": 0.10,  # 0.10%
+    "MCP": 0.50,     # 0.50%
+    "Lime": 2.50     # 2.50%
+}
 
 class OptimizationResult(BaseModel):
     status: str
@@ -12,20 +38,98 @@ class OptimizationResult(BaseModel):
     nutrient_values: Dict[str, float]
     cost_per_kg: float
 
-def optimize_feed(
-    session: Session, 
-    feed_type: str,  # 'layers' or 'broilers'
-    age: int, 
-    ingredient_ids: List[int],
-    amount: Optional[float] = None  # total amount of feed to mix in kg (optional)
-) -> OptimizationResult:
+@dataclass
+class FeedProblem:
     """
-    Optimizes feed composition using a Stigler Diet-like approach.
-    
-    This function finds the minimum-cost combination of ingredients that satisfies
-    all nutritional requirements for a specific type of animal at a specific age.
+    A least-cost feed LP in array form:
+
+        minimize    prices @ x
+        subject to  sum(x) == 1
+                    minimums <= matrix @ x <= maximums
+                    ratios @ x >= 0
+                    lower <= x <= upper
+
+    `x` is the share of each ingredient in the mix (columns follow `ingredient_ids`).
+    `matrix` is a sparse CSR nutrients x ingredients matrix, and each row of
+    `ratios` is one side of a ratio constraint, e.g. Ca - 1.5 * P >= 0.
     """
-    
+    ingredient_ids: List[int]
+    names: List[str]
+    prices: np.ndarray
+    nutrients: List[str]
+    matrix: "csr_matrix"  # nutrients x ingredients
+    minimums: np.ndarray  # -np.inf where unconstrained
+    maximums: np.ndarray  # np.inf where unconstrained
+    lower: np.ndarray
+    upper: np.ndarray  # np.inf where unbounded
+    ratios: Optional["csr_matrix"] = None  # rows r with r @ x >= 0
+
+    def inequalities(self) -> Tuple["csr_matrix", np.ndarray]:
+        """Every nutrient constraint as `G @ x >= h`, with G sparse."""
+        from scipy import sparse
+
+        has_min = np.isfinite(self.minimums)
+        has_max = np.isfinite(self.maximums)
+        blocks = [self.matrix[has_min], -self.matrix[has_max]]
+        rhs = [self.minimums[has_min], -self.maximums[has_max]]
+        if self.ratios is not None and self.ratios.shape[0]:
+            blocks.append(self.ratios)
+            rhs.append(np.zeros(self.ratios.shape[0]))
+        return sparse.vstack(blocks, format="csr"), np.concatenate(rhs)
+
+
+def ratio_rows(matrix, numerators: np.ndarray, denominators: np.ndarray, minimums: np.ndarray, maximums: np.ndarray):
+    """
+    Linearize `minimums <= (matrix[num] @ x) / (matrix[den] @ x) <= maximums`.
+
+    Each finite bound gives one sparse row: num - min * den >= 0 and
+    max * den - num >= 0, built with sparse row arithmetic.
+    """
+    from scipy import sparse
+
+    num, den = matrix[numerators], matrix[denominators]
+    has_min, has_max = np.isfinite(minimums), np.isfinite(maximums)
+    low = num[has_min] - sparse.diags(minimums[has_min]) @ den[has_min]
+    high = sparse.diags(maximums[has_max]) @ den[has_max] - num[has_max]
+    return sparse.vstack([low, high], format="csr")
+
+
+def requirement_constraints(session: Session, requirement: NutritionalRequirement):
+    """(minimums, maximums, ratios) of a requirement row: its own columns plus NutrientBound/NutrientRatio rows."""
+    bounds = session.exec(select(NutrientBound).where(NutrientBound.requirement_id == requirement.id)).all()
+    ratios = session.exec(select(NutrientRatio).where(NutrientRatio.requirement_id == requirement.id)).all()
+
+    minimums = {n: getattr(requirement, n) for n in NUTRIENTS if getattr(requirement, n, None) is not None}
+    maximums = {}
+    for bound in bounds:
+        if bound.minimum is not None:
+            minimums[bound.nutrient] = bound.minimum
+        if bound.maximum is not None:
+            maximums[bound.nutrient] = bound.maximum
+    return minimums, maximums, list(ratios)
+
+
+def constrained_nutrients(minimums: dict, maximums: dict, ratios: list) -> List[str]:
+    """The requirement's own minimums first, then any extra bounds and ratio terms."""
+    return list(dict.fromkeys(
+        list(minimums) + list(maximums) + [n for r in ratios for n in (r.numerator, r.denominator)]
+    ))
+
+
+def _first_missing(ingredient_ids: List[int], found) -> Optional[int]:
+    return next((i for i in ingredient_ids if i not in found), None)
+
+
+def load_problem(session: Session, feed_type: str, age: int, ingredient_ids: List[int]) -> FeedProblem:
+    """
+    Build the LP for `feed_type` at `age` from the database.
+
+    The fixed composition columns and the sparse NutrientValue rows of the
+    constrained nutrients go straight into one CSR matrix, in a fixed number
+    of queries whatever the number of ingredients.
+    """
+    from scipy import sparse
+
     # Fetch nutritional requirements based on feed type and age
     statement = select(NutritionalRequirement).where(
         (NutritionalRequirement.category == feed_type) & (NutritionalRequirement.age == age)
@@ -35,161 +139,321 @@ def optimize_feed(
     if not requirement:
         raise HTTPException(status_code=404, detail=f"No nutritional requirements found for {feed_type} at {age} weeks.")
 
-    # Extract nutrient requirements (exclude additives and non-nutrient fields)
-    nutrient_requirements = {}
-    for nutrient in ['ME', 'CP', 'Ca', 'P', 'Mg', 'Na', 'K']:
-        if hasattr(requirement, nutrient) and getattr(requirement, nutrient) is not None:
-            nutrient_requirements[nutrient] = getattr(requirement, nutrient)
-    
-    # Create maximum requirements (1.1 times minimum values)
-    max_nutrient_requirements = {k: v * 1.1 for k, v in nutrient_requirements.items()}
-
-    # Define fixed values for additives (as per LP guide.docx)
-    additive_requirements = {
-        "Premix": 0.25,  # 0.25%
-        "Toxicin": 0.10,  # 0.10%
-        "Lysine": 0.10,   # 0.10%
-        "Methionine": 0.10,  # 0.10%
-        "Threonine": 0.10,  # 0.10%
-        "Salt": 0.25,    # 0.25%
-        "Tyrosine": 0.10,  # 0.10%
-        "MCP": 0.50,     # 0.50%
-        "Lime": 2.50     # 2.50%
-    }
+    minimums, maximums, ratios = requirement_constraints(session, requirement)
+    nutrients = constrained_nutrients(minimums, maximums, ratios)
+    row_of = {n: i for i, n in enumerate(nutrients)}
 
-    # Step 1: Gather all ingredients data
-    ingredients_data = []
-    
+    unique_ids = np.unique(np.asarray(ingredient_ids, dtype=np.int64))
+    ingredients = {i.id: i for i in session.exec(select(Ingredient).where(Ingredient.id.in_(unique_ids.tolist()))).all()}
+    missing = _first_missing(ingredient_ids, ingredients)
+    if missing is not None:
+        raise HTTPException(status_code=404, detail=f"Ingredient with ID {missing} not found")
+
+    # Fixed composition columns, first composition row per ingredient
+    fixed = [n for n in nutrients if n in COMPOSITION_COLUMNS]
+    composition_rows = session.exec(
+        select(NutrientComposition.ingredient_id, *[getattr(NutrientComposition, n) for n in fixed])
+        .where(NutrientComposition.ingredient_id.in_(unique_ids.tolist()))
+        .order_by(NutrientComposition.id)
+    ).all()
+    compositions = {}
+    for row in composition_rows:
+        compositions.setdefault(row[0], row[1:])
+    missing = _first_missing(ingredient_ids, compositions)
+    if missing is not None:
+        raise HTTPException(status_code=404, detail=f"Nutrient composition for ingredient ID {missing} not found")
+
+    # Sparse (nutrient, ingredient, value) triplets over the unique ingredients
+    rows, cols, values = [], [], []
+    if fixed:
+        block = np.array([compositions[i] for i in unique_ids.tolist()], dtype=np.float64).reshape(len(unique_ids), len(fixed))
+        block = np.nan_to_num(block)
+        ing, col = np.nonzero(block)
+        rows.append(np.array([row_of[n] for n in fixed])[col])
+        cols.append(ing)
+        values.append(block[ing, col])
+    extended = [n for n in nutrients if n not in COMPOSITION_COLUMNS]
+    if extended:
+        stored = session.exec(
+            select(NutrientValue.ingredient_id, NutrientValue.nutrient, NutrientValue.value)
+            .where(NutrientValue.ingredient_id.in_(unique_ids.tolist()), NutrientValue.nutrient.in_(extended))
+        ).all()
+        if stored:
+            ids, names, amounts = zip(*stored)
+            rows.append(np.array([row_of[n] for n in names]))
+            cols.append(np.searchsorted(unique_ids, np.asarray(ids, dtype=np.int64)))
+            values.append(np.asarray(amounts, dtype=np.float64))
+    unique_matrix = sparse.csr_matrix(
+        (np.concatenate(values) if values else np.zeros(0),
+         (np.concatenate(rows) if rows else np.zeros(0, dtype=int), np.concatenate(cols) if cols else np.zeros(0, dtype=int))),
+        shape=(len(nutrients), len(unique_ids)),
+    )
+    # Columns in request order (repeated IDs become repeated columns)
+    matrix = unique_matrix[:, np.searchsorted(unique_ids, np.asarray(ingredient_ids, dtype=np.int64))].tocsr()
+
+    ratio_matrix = None
+    if ratios:
+        ratio_matrix = ratio_rows(
+            matrix,
+            np.array([row_of[r.numerator] for r in ratios]),
+            np.array([row_of[r.denominator] for r in ratios]),
+            np.array([-np.inf if r.minimum is None else r.minimum for r in ratios], dtype=np.float64),
+            np.array([np.inf if r.maximum is None else r.maximum for r in ratios], dtype=np.float64),
+        )
+
+    names, prices, lower, upper = [], [], [], []
     for ingredient_id in ingredient_ids:
-        # Get basic ingredient info
-        ingredient = session.get(Ingredient, ingredient_id)
-        if not ingredient:
-            raise HTTPException(status_code=404, detail=f"Ingredient with ID {ingredient_id} not found")
-        
-        # Get nutrient composition
-        composition = session.exec(
-            select(NutrientComposition).where(NutrientComposition.ingredient_id == ingredient_id)
-        ).first()
-        
-        if not composition:
-            raise HTTPException(status_code=404, detail=f"Nutrient composition for ingredient ID {ingredient_id} not found")
-        
-        # Create ingredient data structure
-        ingredient_data = {
-            'id': ingredient_id,
-            'name': ingredient.name,
-            'category': ingredient.category,
-            'price': ingredient.price,
-            'nutrients': {}
-        }
-        
-        # Add nutrient values
-        for nutrient in nutrient_requirements.keys():
-            if hasattr(composition, nutrient):
-                ingredient_data['nutrients'][nutrient] = getattr(composition, nutrient)
-            else:
-                ingredient_data['nutrients'][nutrient] = 0
-                
-        ingredients_data.append(ingredient_data)
-
-    # Step 2: Create the optimization model
-    model = pulp.LpProblem("Feed_Optimization", pulp.LpMinimize)
-    
-    # Step 3: Define variables - percentage of each ingredient in the mix
-    ingredient_vars = {}
-    
-    for ingredient in ingredients_data:
+        ingredient = ingredients[ingredient_id]
+        names.append(ingredient.name)
+        prices.append(ingredient.price)
+
         # Set appropriate bounds based on ingredient type
-        if ingredient['name'] == "Maize bran":
-            ingredient_vars[ingredient['name']] = pulp.LpVariable(
-                f"ingr_{ingredient['name'].replace(' ', '_')}", 
-                lowBound=0, 
-                #upBound=0.05  # Max 5%
-            )
-        elif ingredient['name'] == "Fish meal":
-            ingredient_vars[ingredient['name']] = pulp.LpVariable(
-                f"ingr_{ingredient['name'].replace(' ', '_')}", 
-                lowBound=0, 
-                #upBound=0.05  # Max 5%
-            )
-        elif ingredient['name'] in additive_requirements:
+        if ingredient.name in ("Maize bran", "Fish meal"):
+            lower.append(0)
+            upper.append(np.inf)  # Max 5% cap currently disabled
+        elif ingredient.name in ADDITIVE_REQUIREMENTS:
             # Fixed percentage for additives
-            fixed_value = additive_requirements[ingredient['name']] / 100  # Convert to decimal
-            ingredient_vars[ingredient['name']] = pulp.LpVariable(
-                f"ingr_{ingredient['name'].replace(' ', '_')}", 
-                lowBound=fixed_value, 
-                #upBound=fixed_value
-            )
+            lower.append(ADDITIVE_REQUIREMENTS[ingredient.name] / 100)  # Convert to decimal
+            upper.append(np.inf)
         else:
             # Regular ingredients can be 0-100%
-            ingredient_vars[ingredient['name']] = pulp.LpVariable(
-                f"ingr_{ingredient['name'].replace(' ', '_')}", 
-                lowBound=0, 
-                upBound=1
-            )
-    
-    # Step 4: Define the objective function - minimize cost
-    model += pulp.lpSum([
-        ingredient_vars[ingredient['name']] * ingredient['price'] 
-        for ingredient in ingredients_data
-    ]), "Total_Cost"
-    
-    # Step 5: Define constraints
-    
-    # Constraint: Sum of all ingredients must equal 100%
-    model += pulp.lpSum([ingredient_vars[ingredient['name']] for ingredient in ingredients_data]) == 1, "Total_Percentage"
-    
-    # Nutrient minimum constraints
-    for nutrient, min_value in nutrient_requirements.items():
-        model += pulp.lpSum([
-            ingredient_vars[ingredient['name']] * ingredient['nutrients'].get(nutrient, 0)
-            for ingredient in ingredients_data
-        ]) >= min_value, f"Min_{nutrient}"
-    
-    # Nutrient maximum constraints
-    # for nutrient, max_value in max_nutrient_requirements.items():
-    #     model += pulp.lpSum([
-    #         ingredient_vars[ingredient['name']] * ingredient['nutrients'].get(nutrient, 0)
-    #         for ingredient in ingredients_data
-    #     ]) <= max_value, f"Max_{nutrient}"
-    
-    # Step 6: Solve the model
-    solver = pulp.PULP_CBC_CMD(msg=False)
-    print("Solving model...")
-    print(model)
-    status = model.solve(solver)
+            lower.append(0)
+            upper.append(1)
+
+    return FeedProblem(
+        ingredient_ids=list(ingredient_ids),
+        names=names,
+        prices=np.asarray(prices, dtype=np.float64),
+        nutrients=nutrients,
+        matrix=matrix,
+        minimums=np.array([minimums.get(n, -np.inf) for n in nutrients], dtype=np.float64),
+        maximums=np.array([maximums.get(n, np.inf) for n in nutrients], dtype=np.float64),
+        lower=np.asarray(lower, dtype=np.float64),
+        upper=np.asarray(upper, dtype=np.float64),
+        ratios=ratio_matrix,
+    )
+
+
+# Problems up to this many ingredients go through the batched dense simplex in solve_problems
+DENSE_MAX_INGREDIENTS = int(os.getenv("DENSE_MAX_INGREDIENTS", "40"))
+
+# scipy.optimize.linprog status codes, named like PuLP's statuses
+LINPROG_STATUS = {0: "Optimal", 1: "Not Solved", 2: "Infeasible", 3: "Unbounded", 4: "Undefined"}
+
+
+def solve_problem(problem: FeedProblem) -> Tuple[str, Optional[np.ndarray]]:
+    """
+    Solve with HiGHS dual simplex; returns the status and the optimal shares (None unless optimal).
+
+    The sparse constraint matrix is handed to the solver as is, and the
+    simplex returns a vertex, which cost_ranges relies on.
+    """
+    from scipy import sparse
+    from scipy.optimize import linprog  # imported on first solve to keep cold starts fast
+
+    G, h = problem.inequalities()
+    n = len(problem.ingredient_ids)
+    result = linprog(
+        problem.prices,
+        A_ub=-G,
+        b_ub=-h,
+        A_eq=sparse.csr_matrix(np.ones((1, n))),
+        b_eq=[1.0],
+        bounds=np.column_stack([problem.lower, problem.upper]),
+        method="highs-ds",
+    )
+    status = LINPROG_STATUS.get(result.status, "Undefined")
+    if status != 'Optimal':
+        return status, None
+    return status, np.asarray(result.x)
+
+
+def solve_problems(problems: List[FeedProblem]) -> List[Tuple[str, Optional[np.ndarray]]]:
+    """
+    Solve many problems, like solve_problem on each.
+
+    Small problems with the same number of ingredients and constraint rows
+    are stacked and solved in one call to the batched dense simplex; the rest
+    go to HiGHS one by one.
+    """
+    from dense_simplex import solve_batch
+
+    results: List[Optional[Tuple[str, Optional[np.ndarray]]]] = [None] * len(problems)
+    stacks = defaultdict(list)
+    for k, problem in enumerate(problems):
+        if len(problem.ingredient_ids) <= DENSE_MAX_INGREDIENTS and (problem.lower >= 0).all():
+            G, h = problem.inequalities()
+            stacks[G.shape].append((k, G.toarray(), h))
+        else:
+            results[k] = solve_problem(problem)
+    for members in stacks.values():
+        index = [k for k, _, _ in members]
+        statuses, X = solve_batch(
+            np.stack([problems[k].prices for k in index]),
+            np.stack([G for _, G, _ in members]),
+            np.stack([h for _, _, h in members]),
+            np.stack([problems[k].lower for k in index]),
+            np.stack([problems[k].upper for k in index]),
+        )
+        for k, code, x in zip(index, statuses, X):
+            status = LINPROG_STATUS.get(int(code), "Undefined")
+            results[k] = (status, x if status == "Optimal" else None)
+    return results
+
+
+@dataclass
+class StandardForm:
+    """
+    A FeedProblem as `A @ v == b`, `lower <= v <= upper`, minimizing `c @ v`.
+
+    v is the shares x followed by one surplus per row of G (G @ x - s = h,
+    s >= 0); the last row of A is sum(x) = 1.
+    """
+    A: np.ndarray
+    b: np.ndarray
+    c: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+
+
+def standard_form(problem: FeedProblem) -> StandardForm:
+    G, h = problem.inequalities()
+    G = G.toarray()  # one basis factorization per request; small enough to go dense
+    m, n = G.shape
+    A = np.zeros((m + 1, n + m))
+    A[:m, :n] = G
+    A[:m, n:] = -np.eye(m)
+    A[m, :n] = 1
+    return StandardForm(
+        A=A,
+        b=np.concatenate([h, [1.0]]),
+        c=np.concatenate([problem.prices, np.zeros(m)]),
+        lower=np.concatenate([problem.lower, np.zeros(m)]),
+        upper=np.concatenate([problem.upper, np.full(m, np.inf)]),
+    )
+
+
+def vertex_basis(form: StandardForm, values: np.ndarray, n: int, tol: float = 1e-6) -> Optional[List[int]]:
+    """
+    Basic columns of the vertex `values`, or None if it is not a vertex.
+
+    Degenerate vertices get a completed basis: the columns furthest from
+    their bounds (slacks win ties), skipping any that would make it singular.
+    """
+    rows, columns = form.A.shape
+    distance = np.minimum(values - form.lower, form.upper - values)
+    order = sorted(range(columns), key=lambda j: (-distance[j], j < n))
+    basic = []
+    for j in order:
+        if len(basic) == rows:
+            break
+        if distance[j] <= tol and j < n and form.lower[j] == form.upper[j]:
+            continue
+        if np.linalg.matrix_rank(form.A[:, basic + [j]]) == len(basic) + 1:
+            basic.append(j)
+    if any(distance[j] > tol for j in set(range(columns)) - set(basic)):
+        return None
+    return basic
+
+
+def cost_ranges(problem: FeedProblem, x: np.ndarray, tol: float = 1e-6) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Price range per ingredient over which the optimal basis of `x` stays optimal.
+
+    Outside [low, high] the same mix may no longer be the cheapest. Degenerate
+    solutions get a completed basis, which can only make the ranges narrower.
+    """
+    form = standard_form(problem)
+    A, c, lower, upper = form.A, form.c, form.lower, form.upper
+    n, m = len(x), A.shape[0] - 1
+    values = np.concatenate([x, A[:m, :n] @ x - form.b[:m]])
+    basic = vertex_basis(form, values, n, tol)
+    if basic is None:
+        return problem.prices.copy(), problem.prices.copy()  # not a vertex solution
+    at_upper = upper - values < values - lower
+
+    try:
+        B_inv_A = np.linalg.solve(A[:, basic], A)
+        y = np.linalg.solve(A[:, basic].T, c[basic])
+    except np.linalg.LinAlgError:
+        return problem.prices.copy(), problem.prices.copy()
+    reduced = c - A.T @ y
+
+    nonbasic = np.ones(n + m, dtype=bool)
+    nonbasic[basic] = False
+    fixed = lower == upper
+    # Reduced costs must stay >= 0 at a lower bound and <= 0 at an upper bound.
+    sign = np.where(at_upper, -1.0, 1.0)
+    slack = reduced * sign
+    movable = nonbasic & ~fixed
+
+    low = np.full(n, -np.inf)
+    high = np.full(n, np.inf)
+    for j in range(n):
+        if j in basic:
+            # Raising c_j by d changes every nonbasic reduced cost by -d * alpha.
+            alpha = B_inv_A[basic.index(j)] * sign
+            ratios = np.divide(slack, alpha, out=np.zeros_like(slack), where=alpha != 0)
+            up = movable & (alpha > tol)
+            down = movable & (alpha < -tol)
+            if up.any():
+                high[j] = ratios[up].min()
+            if down.any():
+                low[j] = ratios[down].max()
+        elif fixed[j]:
+            continue
+        elif sign[j] > 0:
+            low[j] = -reduced[j]
+        else:
+            high[j] = -reduced[j]
+    return problem.prices + low, problem.prices + high
+
+
+def optimize_feed(
+    session: Session, 
+    feed_type: str,  # 'layers' or 'broilers'
+    age: int, 
+    ingredient_ids: List[int],
+    amount: Optional[float] = None  # total amount of feed to mix in kg (optional)
+) -> OptimizationResult:
+    """
+    Optimizes feed composition using a Stigler Diet-like approach.
     
-    # Step 7: Check results and prepare output
-    if pulp.LpStatus[status] != 'Optimal':
+    This function finds the minimum-cost combination of ingredients that satisfies
+    all nutritional requirements for a specific type of animal at a specific age.
+    """
+    problem = load_problem(session, feed_type, age, ingredient_ids)
+    status, x = solve_problem(problem)
+
+    # Check results and prepare output
+    if x is None:
         raise HTTPException(
             status_code=400, 
-            detail=f"Could not find optimal solution. Status: {pulp.LpStatus[status]}"
+            detail=f"Could not find optimal solution. Status: {status}"
         )
-    
-    # Step 8: Gather the results
+    return format_result(problem, status, x, amount)
+
+
+def format_result(problem: FeedProblem, status: str, x: np.ndarray, amount: Optional[float] = None) -> OptimizationResult:
+    # Gather the results
     composition = {}
     total_cost = 0
     
-    for ingredient in ingredients_data:
-        value = ingredient_vars[ingredient['name']].value()
-        if value is not None and value > 0.0001:  # Filter out very small values
-            composition[ingredient['name']] = round(value * 100, 2)  # Convert to percentage
-            total_cost += value * ingredient['price']
+    for name, value, price in zip(problem.names, x, problem.prices):
+        if value > 0.0001:  # Filter out very small values
+            composition[name] = round(value * 100, 2)  # Convert to percentage
+            total_cost += value * price
     
     # Calculate nutrient values in the final mix
-    nutrient_values = {}
-    for nutrient in nutrient_requirements.keys():
-        value = sum(
-            ingredient_vars[ingredient['name']].value() * ingredient['nutrients'].get(nutrient, 0)
-            for ingredient in ingredients_data
-            if ingredient_vars[ingredient['name']].value() is not None
-        )
-        nutrient_values[nutrient] = round(value, 2)
+    nutrient_values = {
+        nutrient: round(float(value), 2)
+        for nutrient, value in zip(problem.nutrients, problem.matrix @ x)
+    }
     
     # Add additive values to nutrient values
-    for ingredient in ingredients_data:
-        if ingredient['name'] in additive_requirements:
-            nutrient_values[ingredient['name']] = additive_requirements[ingredient['name']]
+    for name in problem.names:
+        if name in ADDITIVE_REQUIREMENTS:
+            nutrient_values[name] = ADDITIVE_REQUIREMENTS[name]
     
     # Validate the solution
     total_percentage = sum(composition.values())
@@ -200,15 +464,15 @@ def optimize_feed(
         )
     
     # Calculate final cost based on amount if provided
-    cost_per_kg = round(total_cost, 2)
+    cost_per_kg = round(float(total_cost), 2)
     final_cost = cost_per_kg
     if amount:
         final_cost = round(cost_per_kg * amount, 2)
     
     return OptimizationResult(
-        status=pulp.LpStatus[status],
+        status=status,
         composition=composition,
         total_cost=final_cost,
         nutrient_values=nutrient_values,
         cost_per_kg=cost_per_kg
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,150 @@
+import asyncio
+import itertools
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+
+from db import engine
+from optimizer import optimize_feed
+from serialization import dumps
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15
+MAX_PENDING_EVENTS = 32
+
+
+class Profile(NamedTuple):
+    category: str
+    age: int
+    ingredient_ids: Tuple[int, ...]
+
+
+def parse_profile(value: str) -> Profile:
+    """Parse `category:age:id,id,...`, e.g. `Layers:20:1,2,8,11`."""
+    try:
+        category, age, ids = value.split(":")
+        ingredient_ids = tuple(sorted({int(i) for i in ids.split(",") if i}))
+        profile = Profile(category, int(age), ingredient_ids)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid profile '{value}', expected category:age:id,id,...")
+    if not profile.ingredient_ids:
+        raise HTTPException(status_code=400, detail=f"Profile '{value}' has no ingredients")
+    return profile
+
+
+class Listener:
+    def __init__(self, profiles: List[Profile], loop: asyncio.AbstractEventLoop):
+        self.profiles = profiles
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+
+    def push(self, message: bytes):
+        # Runs on the listener's event loop. A client that stopped reading
+        # loses its oldest events rather than holding memory forever.
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+
+class PriceEventHub:
+    """
+    Fans out ingredient price changes to SSE listeners.
+
+    Each affected profile is re-solved once per change on a single background
+    thread, and the result is shared by every listener subscribed to it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners: Dict[Profile, Set[Listener]] = defaultdict(set)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="price-events")
+        self._event_ids = itertools.count(1)
+
+    def subscribe(self, profiles: List[Profile], loop: asyncio.AbstractEventLoop) -> Listener:
+        listener = Listener(profiles, loop)
+        with self._lock:
+            for profile in profiles:
+                self._listeners[profile].add(listener)
+        return listener
+
+    def unsubscribe(self, listener: Listener):
+        with self._lock:
+            for profile in listener.profiles:
+                listeners = self._listeners.get(profile)
+                if listeners is not None:
+                    listeners.discard(listener)
+                    if not listeners:
+                        del self._listeners[profile]
+
+    def publish_price_change(self, ingredient_id: int, price: float):
+        """Call after the new price is committed; returns without waiting for the solves."""
+        with self._lock:
+            affected = [p for p in self._listeners if ingredient_id in p.ingredient_ids]
+        if affected:
+            self._executor.submit(self._recompute, ingredient_id, price, affected)
+
+    def _recompute(self, ingredient_id: int, price: float, profiles: List[Profile]):
+        with Session(engine) as session:
+            for profile in profiles:
+                event = {
+                    "ingredient_id": ingredient_id,
+                    "price": price,
+                    "profile": profile._asdict(),
+                }
+                try:
+                    event["result"] = optimize_feed(
+                        session, profile.category, profile.age, list(profile.ingredient_ids)
+                    ).dict()
+                except HTTPException as e:
+                    event["error"] = e.detail
+                except Exception:
+                    # One failing profile must not cost the others their events.
+                    logger.exception("Recomputing %s after a price change of ingredient %d failed", profile, ingredient_id)
+                    session.rollback()
+                    event["error"] = "Could not recompute the formulation"
+                self._fan_out(profile, event)
+
+    def _fan_out(self, profile: Profile, event: dict):
+        message = b"id: %d\nevent: price-change\ndata: %s\n\n" % (next(self._event_ids), dumps(event))
+        with self._lock:
+            listeners = list(self._listeners.get(profile, ()))
+        for listener in listeners:
+            listener.loop.call_soon_threadsafe(listener.push, message)
+
+
+hub = PriceEventHub()
+
+
+# 🔹 Stream price changes and the recomputed least-cost formulation per profile
+@router.get("/events/prices")
+async def stream_price_events(
+    request: Request,
+    profile: List[str] = Query(..., description="Subscribed profiles as category:age:id,id,..."),
+):
+    profiles = [parse_profile(p) for p in profile]
+
+    async def events():
+        listener = hub.subscribe(profiles, asyncio.get_running_loop())
+        try:
+            yield b"retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(listener.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            hub.unsubscribe(listener)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,182 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlmodel import Session, select
+
+from db import get_read_session, get_session
+from models import Ingredient, IngredientCost
+
+router = APIRouter()
+
+
+def record_price(session: Session, ingredient_id: int, cost: float, date: Optional[datetime] = None):
+    """Append a price point to the ingredient's history (the caller commits)."""
+    entry = IngredientCost(ingredient_id=ingredient_id, cost=cost, date=date or datetime.utcnow())
+    session.add(entry)
+    return entry
+
+
+def backfill_prices(session: Session, date: Optional[datetime] = None) -> int:
+    """
+    Start the history of every priced ingredient that has none at its current
+    `Ingredient.price`, dated `date` (now). Returns the rows added.
+    """
+    date = date or datetime.utcnow()
+    priced = select(Ingredient.id, Ingredient.price).where(
+        Ingredient.price.is_not(None),
+        ~select(IngredientCost.id).where(IngredientCost.ingredient_id == Ingredient.id).exists(),
+    )
+    rows = session.exec(priced).all()
+    for ingredient_id, price in rows:
+        record_price(session, ingredient_id, price, date)
+    session.commit()
+    return len(rows)
+
+
+def _to_seconds(dates) -> np.ndarray:
+    return np.asarray(dates, dtype="datetime64[s]").astype(np.int64)
+
+
+class PriceHistory:
+    """
+    Column-oriented snapshot of the ingredient cost history.
+
+    Rows are kept sorted by (ingredient_id, date), the same order as the
+    composite index, so an as-of lookup for any number of (ingredient, date)
+    pairs is a single `np.searchsorted` over a combined integer key.
+    """
+
+    def __init__(self, ingredient_ids: Sequence[int], dates: Sequence[datetime], costs: Sequence[float]):
+        ingredient_ids = np.asarray(ingredient_ids, dtype=np.int64)
+        seconds = _to_seconds(dates) if len(dates) else np.empty(0, dtype=np.int64)
+        order = np.lexsort((seconds, ingredient_ids))
+
+        self.ingredient_ids = ingredient_ids[order]
+        self.seconds = seconds[order]
+        self.costs = np.asarray(costs, dtype=np.float64)[order]
+
+        self._known_ids = np.unique(self.ingredient_ids)
+        self._origin = int(self.seconds.min()) if len(self.seconds) else 0
+        span = int(self.seconds.max()) - self._origin if len(self.seconds) else 0
+        # Offsets are shifted by one so that dates before the first price point
+        # still sort before every key of the same ingredient.
+        self._stride = span + 2
+        self._keys = self._key(np.searchsorted(self._known_ids, self.ingredient_ids), self.seconds)
+
+    @classmethod
+    def load(cls, session: Session, ingredient_ids: Optional[Sequence[int]] = None, until: Optional[datetime] = None):
+        statement = select(IngredientCost.ingredient_id, IngredientCost.date, IngredientCost.cost)
+        if ingredient_ids is not None:
+            statement = statement.where(IngredientCost.ingredient_id.in_(list(ingredient_ids)))
+        if until is not None:
+            statement = statement.where(IngredientCost.date <= until)
+        rows = session.exec(statement.order_by(IngredientCost.ingredient_id, IngredientCost.date)).all()
+        return cls([r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows])
+
+    def _key(self, ranks: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+        offsets = np.clip(seconds - self._origin, -1, self._stride - 2) + 1
+        return ranks * self._stride + offsets
+
+    def as_of(self, dates: Sequence[datetime], ingredient_ids: Sequence[int]) -> np.ndarray:
+        """
+        Price of every ingredient on every date, shape (len(dates), len(ingredient_ids)).
+
+        Entries are NaN where the ingredient has no price recorded on or before the date.
+        """
+        ids = np.asarray(ingredient_ids, dtype=np.int64)
+        when = _to_seconds(dates)
+        prices = np.full((len(when), len(ids)), np.nan)
+        if not len(self.costs) or not len(ids) or not len(when):
+            return prices
+
+        ranks = np.searchsorted(self._known_ids, ids)
+        known = (ranks < len(self._known_ids)) & (self._known_ids[np.minimum(ranks, len(self._known_ids) - 1)] == ids)
+
+        query = self._key(ranks[None, :], when[:, None])
+        positions = np.searchsorted(self._keys, query, side="right") - 1
+        clipped = np.maximum(positions, 0)
+        hit = (positions >= 0) & known[None, :] & (self.ingredient_ids[clipped] == ids[None, :])
+        prices[hit] = self.costs[clipped[hit]]
+        return prices
+
+    def change_dates(self, ingredient_ids: Sequence[int], start: datetime, end: datetime) -> List[datetime]:
+        """Distinct dates in (start, end] on which any of the ingredients changed price."""
+        lo, hi = _to_seconds([start, end])
+        mask = np.isin(self.ingredient_ids, np.asarray(ingredient_ids, dtype=np.int64))
+        mask &= (self.seconds > lo) & (self.seconds <= hi)
+        return np.unique(self.seconds[mask]).astype("datetime64[s]").tolist()
+
+
+def recost(history: PriceHistory, composition: Dict[int, float], start: datetime, end: datetime):
+    """
+    Cost per kg of a fixed composition (ingredient_id -> % of the mix) at `start`
+    and at every price change up to `end`, as one (dates x ingredients) @ (ingredients,) product.
+    """
+    ids = list(composition.keys())
+    fractions = np.asarray([composition[i] for i in ids], dtype=np.float64) / 100
+    dates = [start] + history.change_dates(ids, start, end)
+    costs = history.as_of(dates, ids) @ fractions
+    return dates, costs
+
+
+class PricePoint(BaseModel):
+    ingredient_id: int
+    price: Optional[float]
+
+
+class RecostRequest(BaseModel):
+    composition: Dict[int, float]  # ingredient_id -> percentage of the mix
+    start: datetime
+    end: datetime
+
+
+class RecostResult(BaseModel):
+    dates: List[datetime]
+    cost_per_kg: List[Optional[float]]
+
+
+# 🔹 GET the price of every ingredient as of a date
+@router.get("/ingredient-prices/", response_model=List[PricePoint])
+def get_prices_as_of(
+    as_of: Optional[datetime] = Query(None, description="Date to look prices up at (defaults to now)"),
+    session: Session = Depends(get_read_session),
+):
+    as_of = as_of or datetime.utcnow()
+    ids = session.exec(select(Ingredient.id).order_by(Ingredient.id)).all()
+    history = PriceHistory.load(session, until=as_of)
+    prices = history.as_of([as_of], ids)[0]
+    return [
+        PricePoint(ingredient_id=i, price=None if np.isnan(p) else round(float(p), 2))
+        for i, p in zip(ids, prices)
+    ]
+
+
+# 🔹 GET the price history of one ingredient
+@router.get("/ingredient-prices/{ingredient_id}", response_model=List[IngredientCost])
+def get_price_history(ingredient_id: int, session: Session = Depends(get_read_session)):
+    if not session.get(Ingredient, ingredient_id):
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+    return session.exec(
+        select(IngredientCost)
+        .where(IngredientCost.ingredient_id == ingredient_id)
+        .order_by(IngredientCost.date)
+    ).all()
+
+
+# 🔹 Re-cost a formulation at every price change in a date range
+@router.post("/ingredient-prices/recost", response_model=RecostResult)
+def recost_formulation(request: RecostRequest, session: Session = Depends(get_session)):
+    if not request.composition:
+        raise HTTPException(status_code=400, detail="Composition is empty")
+    if request.end < request.start:
+        raise HTTPException(status_code=400, detail="End date is before start date")
+
+    history = PriceHistory.load(session, ingredient_ids=request.composition.keys(), until=request.end)
+    dates, costs = recost(history, request.composition, request.start, request.end)
+    return RecostResult(
+        dates=dates,
+        cost_per_kg=[None if np.isnan(c) else round(float(c), 2) for c in costs],
+    )
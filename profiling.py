@@ -0,0 +1,265 @@
+"""
+Opt-in profiling of single requests.
+
+An admin adds `X-Profile: 1` (or `?_profile=1`) to a request. Its sync
+handler then runs under a deterministic stack profiler, its SQL statements are
+counted and timed from engine events, and the result is stored as JSON
+under PROFILE_DIR. The response carries `X-Profile-Id` and a `Server-Timing`
+summary; `GET /profiles/{id}` returns the profile, or with `?format=folded`
+the collapsed stacks that flamegraph.pl and speedscope read.
+
+Without the flag a request costs one header scan in the middleware and one
+context variable read in the handler wrapper. The engine listeners are only
+attached once the first profile is taken.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlmodel import Session
+
+from auth.auth import TokenData, decode_access_token
+from auth.auth_endpoints import is_admin, require_admin
+from db import engine, replica_engines
+
+router = APIRouter()
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "optifeed-profiles"))
+
+_active: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+_listeners_lock = threading.Lock()
+_listeners_attached = False
+
+
+class StackProfiler:
+    """Self time per call stack, from sys.setprofile events on the calling thread."""
+
+    def __init__(self):
+        self.stack: List[str] = []
+        self.self_time: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self._last = time.perf_counter()
+
+    def __call__(self, frame, event_name, arg):
+        now = time.perf_counter()
+        if self.stack:
+            self.self_time[tuple(self.stack)] += now - self._last
+        if event_name == "call":
+            code = frame.f_code
+            self.stack.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+        elif event_name == "c_call":
+            self.stack.append(f"{getattr(arg, '__module__', None) or 'builtins'}.{getattr(arg, '__qualname__', arg)}")
+        elif self.stack:  # return, c_return, c_exception
+            self.stack.pop()
+        self._last = time.perf_counter()
+
+    def run(self, fn, *args, **kwargs):
+        sys.setprofile(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sys.setprofile(None)
+
+    def folded(self) -> List[str]:
+        """`frame;frame;frame microseconds` lines, heaviest first."""
+        lines = sorted(self.self_time.items(), key=lambda item: -item[1])
+        return [f"{';'.join(stack)} {round(seconds * 1e6)}" for stack, seconds in lines if seconds >= 1e-6]
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, query: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.query = query
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.statements: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])  # sql -> [count, seconds]
+        self.stacks: Optional[StackProfiler] = None
+
+    def record_statement(self, statement: str, seconds: float):
+        with self.lock:
+            entry = self.statements[statement]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def sql_totals(self) -> Tuple[int, float]:
+        with self.lock:
+            return sum(c for c, _ in self.statements.values()), sum(s for _, s in self.statements.values())
+
+    def to_dict(self, status: Optional[int], wall: float) -> dict:
+        count, seconds = self.sql_totals()
+        statements = sorted(self.statements.items(), key=lambda item: -item[1][1])
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "query": self.query,
+            "status": status,
+            "wall_ms": round(wall * 1000, 3),
+            "sql": {
+                "count": count,
+                "total_ms": round(seconds * 1000, 3),
+                "statements": [
+                    {"statement": sql, "count": c, "total_ms": round(s * 1000, 3)} for sql, (c, s) in statements
+                ],
+            },
+            "folded": self.stacks.folded() if self.stacks is not None else [],
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    started = conn.info.get("profile_started")
+    if profile is not None and started:
+        profile.record_statement(statement, time.perf_counter() - started.pop())
+
+
+def _attach_listeners():
+    global _listeners_attached
+    with _listeners_lock:
+        if not _listeners_attached:
+            for bind in (engine, *replica_engines):
+                event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+                event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+            _listeners_attached = True
+
+
+def _requested(scope) -> bool:
+    query = scope.get("query_string", b"")
+    if b"_profile=1" in query and parse_qs(query.decode("latin-1")).get("_profile") == ["1"]:
+        return True
+    return any(name == b"x-profile" and value == b"1" for name, value in scope["headers"])
+
+
+def _is_admin(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                with Session(engine) as session:
+                    return is_admin(session, decode_access_token(token))
+    return False
+
+
+async def _send_json(send, status: int, body: dict):
+    payload = json.dumps(body).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, so unflagged requests pay no per-request wrapping."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            return await self.app(scope, receive, send)
+        if not await run_in_threadpool(_is_admin, scope):
+            return await _send_json(send, 403, {"detail": "Profiling is restricted to admins"})
+
+        _attach_listeners()
+        profile = RequestProfile(scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"))
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                count, sql_seconds = profile.sql_totals()
+                wall_ms = (time.perf_counter() - profile.started) * 1000
+                timing = f'app;dur={wall_ms:.1f}, sql;dur={sql_seconds * 1000:.1f};desc="{count} queries"'
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode()),
+                    (b"server-timing", timing.encode()),
+                ]
+                _save(profile.to_dict(message["status"], time.perf_counter() - profile.started))
+            await send(message)
+
+        token = _active.set(profile)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _active.reset(token)
+
+
+def _profiled(call):
+    @wraps(call)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return call(*args, **kwargs)
+        profile.stacks = StackProfiler()
+        return profile.stacks.run(call, *args, **kwargs)
+
+    return wrapper
+
+
+def install(app):
+    """
+    Add the middleware and wrap every sync endpoint registered so far.
+
+    Sync handlers run on a threadpool thread, so the stack profiler only sees
+    that request's calls. Async handlers share the event loop thread with
+    other requests and get SQL statistics only.
+    """
+    app.add_middleware(ProfilingMiddleware)
+    for route in app.routes:
+        if isinstance(route, APIRoute) and not asyncio.iscoroutinefunction(route.dependant.call):
+            route.dependant.call = _profiled(route.dependant.call)
+
+
+def _path(profile_id: str) -> str:
+    if not re.fullmatch(r"[0-9a-f]{16}", profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def _save(data: dict):
+    # Profiles go to disk so any worker on the host can serve them.
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = _path(data["id"])
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+# 🔹 GET a stored request profile (JSON, or collapsed stacks for flamegraphs)
+@router.get("/profiles/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|folded)$"),
+    admin: TokenData = Depends(require_admin),
+):
+    try:
+        with open(_path(profile_id)) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse("\n".join(data["folded"]) + "\n")
+    return data
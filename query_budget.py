@@ -0,0 +1,161 @@
+"""
+SQL query count and time per request, and query budgets per route.
+
+Engine events count and time every statement a request runs, on the
+primary and on the read replicas. Each request is logged at DEBUG level
+with its totals; with DEBUG=1 the response also carries `X-SQL-Queries`
+and `X-SQL-Time-Ms`. A request that runs more statements than its route's
+entry in QUERY_BUDGETS is logged as a warning.
+
+`assert_max_queries(n)` fails a block of code (direct calls, or requests
+made through a TestClient) that runs more than n statements, listing them;
+`benchmarks/check_query_budgets.py` runs every budgeted route with it, so a
+per-row query added to a handler is caught before it ships.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from db import engine, replica_engines
+
+logger = logging.getLogger(__name__)
+
+DEBUG = os.getenv("DEBUG", "0") == "1"  # SQL totals in response headers
+
+# Most statements a single request may run, by (method, route path). The
+# counts do not depend on how many ingredients or rows a request touches.
+QUERY_BUDGETS: Dict[Tuple[str, str], int] = {
+    ("GET", "/categories/"): 1,
+    ("GET", "/categories/{category_id}"): 1,
+    ("GET", "/ingredients/"): 1,
+    ("GET", "/ingredients/full"): 2,
+    ("GET", "/ingredients/{ingredient_id}"): 1,
+    ("GET", "/nutritional-requirements/"): 1,
+    ("GET", "/nutritional-requirements/{category}/{age}"): 1,
+    ("GET", "/nutrient-compositions/"): 1,
+    ("GET", "/nutrient-compositions/{ingredient_id}"): 1,
+    ("GET", "/additive-requirements/"): 1,
+    ("GET", "/optimizer/"): 5,
+    ("GET", "/optimize-robust"): 6,
+    ("GET", "/cost-frontier"): 5,
+    ("GET", "/optimization-runs/"): 2,  # the list, and the stored role of the admin
+    ("POST", "/auth/token"): 1,
+}
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+_recorders: List["QueryStats"] = []  # open assert_max_queries blocks, which also see whole requests
+
+
+class QueryStats:
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Optional[List[str]] = [] if keep_statements else None
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            if self.statements is not None:
+                self.statements.append(statement)
+
+    def add(self, other: "QueryStats", label: str):
+        with self._lock:
+            self.count += other.count
+            self.seconds += other.seconds
+            if self.statements is not None:
+                self.statements.extend(f"{label}: {s}" for s in other.statements or [f"{other.count} statements"])
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is not None and started:
+        stats.record(statement, time.perf_counter() - started.pop())
+
+
+for _bind in (engine, *replica_engines):
+    event.listen(_bind, "before_cursor_execute", _before_cursor_execute)
+    event.listen(_bind, "after_cursor_execute", _after_cursor_execute)
+
+
+def route_key(scope) -> Tuple[str, str]:
+    route = scope.get("route")
+    return scope["method"], getattr(route, "path", scope["path"])
+
+
+class QueryBudgetMiddleware:
+    """Pure ASGI middleware; per request it costs one object and a context variable."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = QueryStats(keep_statements=bool(_recorders))
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and DEBUG:
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-sql-queries", str(stats.count).encode()),
+                    (b"x-sql-time-ms", f"{stats.seconds * 1000:.1f}".encode()),
+                ]
+            await send(message)
+
+        token = _current.set(stats)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            _finished(route_key(scope), stats)
+
+
+def _finished(key: Tuple[str, str], stats: QueryStats):
+    method, path = key
+    budget = QUERY_BUDGETS.get(key)
+    if budget is not None and stats.count > budget:
+        logger.warning("%s %s ran %d SQL statements, budget is %d", method, path, stats.count, budget)
+    else:
+        logger.debug("%s %s ran %d SQL statements in %.1f ms", method, path, stats.count, stats.seconds * 1000)
+    for recorder in list(_recorders):
+        recorder.add(stats, f"{method} {path}")
+
+
+@contextmanager
+def count_queries():
+    """Statements run inside the block, by this context and by requests that finish in it."""
+    stats = QueryStats(keep_statements=True)
+    token = _current.set(stats)
+    _recorders.append(stats)
+    try:
+        yield stats
+    finally:
+        _recorders.remove(stats)
+        _current.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_queries: int, label: str = "block"):
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        listing = "\n  ".join(stats.statements)
+        raise AssertionError(f"{label} ran {stats.count} SQL statements, budget is {max_queries}:\n  {listing}")
+
+
+def install(app):
+    app.add_middleware(QueryBudgetMiddleware)
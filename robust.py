@@ -0,0 +1,184 @@
+"""
+Chance-constrained least-cost formulation.
+
+Nutrient levels vary from batch to batch. With each ingredient's level of a
+nutrient normal with mean `matrix[i, j]` and standard deviation
+`sd[i, j]` (NutrientDeviation), independent across ingredients, the mix
+meets a minimum with probability at least p when
+
+    matrix[i] @ x - z * sqrt(variances[i] @ x**2) >= minimum[i],   z = Phi^-1(p)
+
+and a maximum likewise with + z. For p >= 0.5 these are convex (second
+order cone) constraints. They are solved as LPs by cutting planes: start
+from the nominal optimum, add the tangent cut of every violated constraint
+at the current mix, re-solve with HiGHS, and stop once all of them hold.
+Tangent cuts only remove mixes that violate the constraint, so an
+infeasible LP means no mix reaches p. The spreads and cuts of all nutrients
+are computed at once from the sparse variance matrix.
+
+Ratio constraints are kept at their nominal values.
+"""
+import os
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlmodel import Session, select
+
+from db import get_read_session
+from models import NutrientDeviation
+from optimizer import FeedProblem, OptimizationResult, format_result, load_problem, solve_problem
+from run_log import logged_run
+
+router = APIRouter()
+
+ROBUST_MAX_ROUNDS = int(os.getenv("ROBUST_MAX_ROUNDS", "50"))
+
+
+class RobustResult(OptimizationResult):
+    probability: float
+    nominal_cost_per_kg: float
+    cost_premium: float  # per kg, over the nominal least-cost mix
+    cost_premium_percent: float
+    # Probability that each constrained nutrient is within its bounds in the returned mix
+    nutrient_probabilities: Dict[str, float]
+    rounds: int  # LPs solved after the nominal one
+
+
+def load_variances(session: Session, problem: FeedProblem):
+    """Sparse nutrients x ingredients matrix of sd**2, columns as in the problem."""
+    from scipy import sparse
+
+    unique_ids = np.unique(np.asarray(problem.ingredient_ids, dtype=np.int64))
+    stored = session.exec(
+        select(NutrientDeviation.ingredient_id, NutrientDeviation.nutrient, NutrientDeviation.sd)
+        .where(NutrientDeviation.ingredient_id.in_(unique_ids.tolist()), NutrientDeviation.nutrient.in_(problem.nutrients))
+    ).all()
+    row_of = {n: i for i, n in enumerate(problem.nutrients)}
+    if stored:
+        ids, names, sds = zip(*stored)
+        rows = np.array([row_of[n] for n in names])
+        cols = np.searchsorted(unique_ids, np.asarray(ids, dtype=np.int64))
+        values = np.square(np.asarray(sds, dtype=np.float64))
+    else:
+        rows, cols, values = np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0)
+    unique_matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(problem.nutrients), len(unique_ids)))
+    return unique_matrix[:, np.searchsorted(unique_ids, np.asarray(problem.ingredient_ids, dtype=np.int64))].tocsr()
+
+
+def _margins(problem: FeedProblem, variances, x: np.ndarray, z: float):
+    """Mean level, spread (sd of the mix) and the robust slack of each min and max side."""
+    mean = problem.matrix @ x
+    spread = np.sqrt(variances @ (x * x))
+    return mean, spread, mean - z * spread - problem.minimums, problem.maximums - mean - z * spread
+
+
+def _cuts(problem: FeedProblem, variances, x: np.ndarray, z: float, low: np.ndarray, high: np.ndarray, spread: np.ndarray):
+    """
+    Tangent cuts at x of the violated sides `low` (minimums) and `high` (maximums).
+
+    The spread is 1-homogeneous, so its tangent at x is (variances * x / spread) @ y.
+    Every cut c @ y >= b is returned as (c - b) @ y >= 0, using sum(y) == 1,
+    which is the form of FeedProblem.ratios rows.
+    """
+    from scipy import sparse
+
+    blocks = []
+    for rows, sign, bounds in ((low, 1.0, problem.minimums), (high, -1.0, problem.maximums)):
+        if not len(rows):
+            continue
+        gradient = sparse.diags(z / spread[rows]) @ variances[rows].multiply(x[None, :])
+        cut = sign * problem.matrix[rows] - gradient
+        blocks.append(sparse.csr_matrix(cut.toarray() - sign * bounds[rows][:, None]))
+    return sparse.vstack(blocks, format="csr")
+
+
+def solve_chance_constrained(
+    problem: FeedProblem, variances, probability: float, max_rounds: int = ROBUST_MAX_ROUNDS, tol: float = 1e-7
+) -> Tuple[str, Optional[np.ndarray], Optional[np.ndarray], int]:
+    """
+    Least-cost mix meeting every nutrient bound with `probability`.
+
+    Returns (status, x, nominal x, rounds); x is None unless the status is
+    "Optimal". "Not Solved" means the cuts did not converge in max_rounds.
+    """
+    from scipy import sparse
+    from scipy.special import ndtri
+
+    z = float(ndtri(probability))
+    status, nominal = solve_problem(problem)
+    if nominal is None:
+        return status, None, None, 0
+    x, current = nominal, problem
+    scale = tol * (1 + np.abs(np.where(np.isfinite(problem.minimums), problem.minimums, 0)))
+    scale_high = tol * (1 + np.abs(np.where(np.isfinite(problem.maximums), problem.maximums, 0)))
+    for rounds in range(max_rounds + 1):
+        _, spread, low_slack, high_slack = _margins(problem, variances, x, z)
+        low = np.flatnonzero(low_slack < -scale)
+        high = np.flatnonzero(high_slack < -scale_high)
+        if not len(low) and not len(high):
+            return "Optimal", x, nominal, rounds
+        if rounds == max_rounds:
+            break
+        cuts = _cuts(problem, variances, x, z, low, high, spread)
+        ratios = cuts if current.ratios is None else sparse.vstack([current.ratios, cuts], format="csr")
+        current = replace(current, ratios=ratios)
+        status, x = solve_problem(current)
+        if x is None:
+            return status, None, nominal, rounds + 1
+    return "Not Solved", None, nominal, max_rounds
+
+
+def nutrient_probabilities(problem: FeedProblem, variances, x: np.ndarray) -> Dict[str, float]:
+    """Probability that each nutrient with a bound is within it, under the same normal model."""
+    from scipy.special import ndtr
+
+    mean = problem.matrix @ x
+    spread = np.sqrt(variances @ (x * x))
+    inside = np.ones(len(problem.nutrients))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for gap in (mean - problem.minimums, problem.maximums - mean):
+            bounded = np.isfinite(gap)
+            p = np.where(spread > 0, ndtr(gap / spread), (gap >= -1e-9).astype(float))
+            inside = np.where(bounded, np.minimum(inside, p), inside)
+    bounded = np.isfinite(problem.minimums) | np.isfinite(problem.maximums)
+    return {n: round(float(p), 4) for n, p, b in zip(problem.nutrients, inside, bounded) if b}
+
+
+# 🔹 Least-cost mix that meets the requirements with a target probability despite composition variability
+@router.get("/optimize-robust", response_model=RobustResult)
+def optimize_robust(
+    request: Request,
+    category: str = Query(..., description="Category of chicken (Layers or Broilers)"),
+    age: int = Query(..., description="Age of the chicken in weeks"),
+    ingredient_ids: List[int] = Query(..., description="List of ingredient IDs to use in the optimization process"),
+    probability: float = Query(0.95, ge=0.5, lt=1, description="Chance that each nutrient bound is met"),
+    amount: Optional[float] = Query(None, gt=0, description="kg of feed to mix"),
+    session: Session = Depends(get_read_session),
+):
+    with logged_run(
+        request, "/optimize-robust", "highs", category, age, ingredient_ids=ingredient_ids, probability=probability
+    ) as run:
+        problem = load_problem(session, category, age, ingredient_ids)
+        variances = load_variances(session, problem)
+        status, x, nominal, rounds = run.timed(solve_chance_constrained, problem, variances, probability)
+        run.status = status
+        if x is None:
+            detail = "No mix meets the requirements at this probability" if nominal is not None else "Could not find optimal solution"
+            raise HTTPException(status_code=400, detail=f"{detail}. Status: {status}")
+
+        result = format_result(problem, status, x, amount)
+        nominal_cost = float(problem.prices @ nominal)
+        premium = float(problem.prices @ x) - nominal_cost
+        run.cost_per_kg = result.cost_per_kg
+        run.result = {"composition": result.composition, "cost_premium": premium}
+        return RobustResult(
+            **result.dict(),
+            probability=probability,
+            nominal_cost_per_kg=round(nominal_cost, 2),
+            cost_premium=round(premium, 2),
+            cost_premium_percent=round(100 * premium / nominal_cost, 2) if nominal_cost else 0.0,
+            nutrient_probabilities=nutrient_probabilities(problem, variances, x),
+            rounds=rounds,
+        )
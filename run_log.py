@@ -0,0 +1,279 @@
+"""
+Write-behind audit log of optimization runs.
+
+Optimizer routes describe each run with `logged_run(...)`. Finished runs go
+into a bounded in-process buffer, and a background thread writes them to
+`optimization_run` with one multi-row INSERT and one commit per batch. A
+batch is written once RUN_LOG_BATCH runs are waiting or RUN_LOG_FLUSH_SECONDS
+have passed. The request path never waits on the database. When the buffer
+is full, a run waits up to RUN_LOG_MAX_WAIT_MS for space and is then dropped
+and counted. The buffer is drained on application shutdown and at interpreter
+exit.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from auth.auth import TokenData
+from auth.auth_endpoints import require_admin
+from db import engine, get_read_session
+from models import OptimizationRun
+from serialization import dumps, fast_rows_response
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+RUN_LOG_ENABLED = os.getenv("RUN_LOG", "1") == "1"
+RUN_LOG_BUFFER = int(os.getenv("RUN_LOG_BUFFER", "10000"))
+RUN_LOG_BATCH = int(os.getenv("RUN_LOG_BATCH", "500"))
+RUN_LOG_FLUSH_SECONDS = float(os.getenv("RUN_LOG_FLUSH_SECONDS", "2"))
+RUN_LOG_MAX_WAIT_MS = float(os.getenv("RUN_LOG_MAX_WAIT_MS", "0"))
+
+
+class RunLog:
+    def __init__(self, capacity: int = RUN_LOG_BUFFER, batch: int = RUN_LOG_BATCH):
+        self.capacity = capacity
+        self.batch = batch
+        self._cond = threading.Condition()
+        self._buffer: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self.counters = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    def record(self, run: dict) -> bool:
+        """Queue a run; False if it was dropped because the buffer stayed full."""
+        with self._cond:
+            if self._closed:
+                self.counters["dropped"] += 1
+                return False
+            if len(self._buffer) >= self.capacity and RUN_LOG_MAX_WAIT_MS > 0:
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: len(self._buffer) < self.capacity, RUN_LOG_MAX_WAIT_MS / 1000)
+            if len(self._buffer) >= self.capacity:
+                self.counters["dropped"] += 1
+                return False
+            self._buffer.append(run)
+            self.counters["recorded"] += 1
+            if len(self._buffer) >= self.batch:
+                self._cond.notify_all()
+            if self._thread is None:
+                self._start()
+        return True
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="run-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _take(self) -> List[dict]:
+        batch = [self._buffer.popleft() for _ in range(min(self.batch, len(self._buffer)))]
+        self._cond.notify_all()  # room for writers waiting on a full buffer
+        return batch
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closed or len(self._buffer) >= self.batch, RUN_LOG_FLUSH_SECONDS)
+                if self._closed:
+                    return
+                batch = self._take()
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[dict]):
+        rows = [{**run, "inputs": _plain(run["inputs"]), "result": _plain(run["result"])} for run in batch]
+        try:
+            with Session(engine) as session:
+                session.execute(insert(OptimizationRun), rows)
+                session.commit()
+        except Exception:
+            logger.exception("could not write %d optimization runs", len(rows))
+            with self._cond:
+                self.counters["failed"] += len(rows)
+            return
+        with self._cond:
+            self.counters["written"] += len(rows)
+            self.counters["batches"] += 1
+
+    def flush(self):
+        """Write everything buffered so far on the calling thread."""
+        while True:
+            with self._cond:
+                batch = self._take()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self, timeout: float = 10):
+        """Stop the writer thread and drain the buffer."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self.counters, "pending": len(self._buffer), "capacity": self.capacity}
+
+
+def _plain(value):
+    # NumPy values and non-string keys become plain JSON for the JSON column.
+    return None if value is None else orjson.loads(dumps(value))
+
+
+runs = RunLog()
+
+
+def request_user(request: Optional[Request]) -> Optional[TokenData]:
+    """The bearer token's user, if the request carries a valid one; optimizer routes do not require login."""
+    if request is None:
+        return None
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    from auth.auth import decode_access_token
+
+    return decode_access_token(token)
+
+
+class Run:
+    def __init__(self, route: str, backend: str, inputs: dict):
+        self.route = route
+        self.backend = backend
+        self.inputs = inputs
+        self.status: Optional[str] = None  # "Optimal" once the block finishes, unless a handler set it
+        self.result: Optional[dict] = None
+        self.cost_per_kg: Optional[float] = None
+        self.solve_ms: Optional[float] = None
+
+    def timed(self, fn, *args, **kwargs):
+        """Call the solver and record its time as solve_ms."""
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.solve_ms = (time.perf_counter() - start) * 1000
+
+
+def record_run(user: Optional[TokenData], route: str, backend: str, status: str, total_ms: float,
+               category: Optional[str] = None, age: Optional[int] = None, inputs: Optional[dict] = None,
+               result: Optional[dict] = None, cost_per_kg: Optional[float] = None, solve_ms: Optional[float] = None):
+    if not RUN_LOG_ENABLED:
+        return
+    runs.record({
+        "created_at": datetime.utcnow(),
+        "route": route,
+        "backend": backend,
+        "status": status,
+        "category": category,
+        "age": age,
+        "inputs": inputs or {},
+        "result": result,
+        "cost_per_kg": cost_per_kg,
+        "solve_ms": round(solve_ms, 3) if solve_ms is not None else None,
+        "total_ms": round(total_ms, 3),
+        "user_id": user.id if user else None,
+        "user_email": user.email if user else None,
+    })
+
+
+@contextmanager
+def logged_run(request: Optional[Request], route: str, backend: str, category: Optional[str] = None,
+               age: Optional[int] = None, **inputs):
+    """Time the block and queue its run; an exception is recorded as the run's status."""
+    run = Run(route, backend, inputs)
+    start = time.perf_counter()
+    try:
+        yield run
+        if run.status is None:
+            run.status = "Optimal"
+    except HTTPException as e:
+        run.status, run.result = f"HTTP {e.status_code}", {"detail": e.detail}
+        raise
+    except Exception as e:
+        run.status, run.result = "Error", {"detail": repr(e)}
+        raise
+    finally:
+        record_run(
+            request_user(request) if RUN_LOG_ENABLED else None, run.route, run.backend, run.status,
+            (time.perf_counter() - start) * 1000, category, age, run.inputs, run.result, run.cost_per_kg, run.solve_ms,
+        )
+
+
+def _percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(np.asarray(values, dtype=np.float64), [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+# 🔹 Solve and request time percentiles of logged runs, per route and backend
+@router.get("/metrics/optimization-runs")
+def get_run_percentiles(
+    hours: float = Query(24, gt=0, description="Look back this many hours"),
+    route: Optional[str] = None,
+    backend: Optional[str] = None,
+    session: Session = Depends(get_read_session),
+):
+    statement = select(OptimizationRun.route, OptimizationRun.backend, OptimizationRun.solve_ms, OptimizationRun.total_ms)
+    statement = statement.where(OptimizationRun.created_at >= datetime.utcnow() - timedelta(hours=hours))
+    if route is not None:
+        statement = statement.where(OptimizationRun.route == route)
+    if backend is not None:
+        statement = statement.where(OptimizationRun.backend == backend)
+
+    groups: Dict[tuple, tuple] = {}
+    for row_route, row_backend, solve_ms, total_ms in session.exec(statement).all():
+        solve, total = groups.setdefault((row_route, row_backend), ([], []))
+        if solve_ms is not None:
+            solve.append(solve_ms)
+        total.append(total_ms)
+    return {
+        "hours": hours,
+        "groups": [
+            {
+                "route": group_route,
+                "backend": group_backend,
+                "runs": len(total),
+                "solve_ms": _percentiles(solve),
+                "total_ms": _percentiles(total),
+            }
+            for (group_route, group_backend), (solve, total) in sorted(groups.items())
+        ],
+        "buffer": runs.stats(),  # runs still pending are not in the percentiles yet
+    }
+
+
+# 🔹 GET the most recent logged runs (admins only: inputs and users are included)
+@router.get("/optimization-runs/", response_model=List[OptimizationRun])
+def get_runs(
+    route: Optional[str] = None,
+    backend: Optional[str] = None,
+    user_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_read_session),
+    admin: TokenData = Depends(require_admin),
+):
+    statement = select(OptimizationRun)
+    if route is not None:
+        statement = statement.where(OptimizationRun.route == route)
+    if backend is not None:
+        statement = statement.where(OptimizationRun.backend == backend)
+    if user_id is not None:
+        statement = statement.where(OptimizationRun.user_id == user_id)
+    return fast_rows_response(session.exec(statement.order_by(OptimizationRun.id.desc()).limit(limit)).all())
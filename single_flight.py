@@ -0,0 +1,87 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from fastapi import APIRouter
+
+router = APIRouter()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Shares one in-flight computation among concurrent callers with the same key.
+
+    The first caller runs `fn`; callers arriving before it finishes wait and get
+    its result (or its exception). Nothing is cached once the call completes,
+    so keys should include whatever version the result depends on.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.requests = 0
+        self.executions = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests, executions, in_flight = self.requests, self.executions, len(self._calls)
+        coalesced = requests - executions
+        return {
+            "requests": requests,
+            "executions": executions,
+            "coalesced": coalesced,
+            "coalescing_ratio": round(coalesced / requests, 4) if requests else 0.0,
+            "in_flight": in_flight,
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def group(name: str) -> SingleFlight:
+    with _groups_lock:
+        if name not in _groups:
+            _groups[name] = SingleFlight(name)
+        return _groups[name]
+
+
+# 🔹 Coalescing counters of the optimizer routes since the process started
+@router.get("/metrics/coalescing")
+def get_coalescing_metrics():
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {g.name: g.stats() for g in groups}
@@ -0,0 +1,34 @@
+import importlib
+import os
+import time
+
+# Modules that are otherwise imported on first use, by short name.
+WARMUP_MODULES = {
+    "pulp": "pulp",
+    "scipy": "scipy.optimize",
+    "jose": "jose.jwt",
+    "passlib": "passlib.context",
+}
+
+
+def warm_up(names=None):
+    """
+    Import the configured solver/crypto modules ahead of the first request.
+
+    Nothing is loaded unless WARMUP_IMPORTS (e.g. "pulp,passlib") is set, so
+    serverless cold starts stay lean; long-running servers can opt in.
+    """
+    if names is None:
+        names = [n.strip() for n in os.getenv("WARMUP_IMPORTS", "").split(",") if n.strip()]
+    timings = {}
+    for name in names:
+        if name not in WARMUP_MODULES:
+            raise ValueError(f"Unknown warm-up module '{name}', expected one of {sorted(WARMUP_MODULES)}")
+        start = time.perf_counter()
+        importlib.import_module(WARMUP_MODULES[name])
+        timings[name] = time.perf_counter() - start
+    if "passlib" in timings:
+        from auth.auth import get_pwd_context
+
+        get_pwd_context()
+    return timings